@@ -0,0 +1,297 @@
+# coding: utf-8
+"""
+This module provides a vectorized buy box gap analysis over the results
+of the Amazon MWS Products API pricing lookups. The seller's prices, the
+competitive prices and the lowest offer listings are loaded into NumPy
+arrays aligned by SKU so that the gaps, target prices and eligibility of
+any number of SKUs are computed without per-SKU Python arithmetic.
+
+.. NOTE:: This module requires NumPy.
+"""
+
+__created__ = "2026-10-19"
+__modified__ = "2026-10-19"
+
+import six # Python2/Python3 compatibility library.
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+#: The CompetitivePriceId of the New buy box price.
+BUY_BOX_PRICE_ID = '1'
+
+#: The smallest price change which is considered a change.
+PRICE_PRECISION = 0.005
+
+
+class BuyBoxAnalyzer(object):
+	"""
+	The ``BuyBoxAnalyzer`` class computes the buy box gaps and target
+	prices of SKUs from the results of *MWSProducts.get_my_price_bulk()*,
+	*MWSProducts.get_competitive_pricing_bulk()* and
+	*MWSProducts.get_lowest_listings_bulk()*. The last target price of
+	each SKU is remembered so that only the SKUs whose target price
+	changed are output.
+
+	The target landed price of an eligible SKU is the buy box landed price
+	(or the lowest offer landed price when there is no buy box) less the
+	undercut. The target price is the target landed price less the
+	seller's shipping, limited to the minimum and maximum price of the
+	SKU. A SKU is eligible when it has an offer, a competing price, is
+	not already at or below the buy box, and its target price is not
+	below its minimum price.
+	"""
+
+	def __init__(self, undercut=None, min_prices=None, max_prices=None):
+		"""
+		Initializes the ``BuyBoxAnalyzer`` instance.
+
+		*undercut* (``float``) is the amount the target landed price is
+		below the competing landed price. Default is ``None`` for 0.01.
+
+		*min_prices* (``dict``) optionally maps the SKU (``str``) to the
+		minimum price (``float``) of each SKU. Default is ``None`` for no
+		minimum prices.
+
+		*max_prices* (``dict``) optionally maps the SKU (``str``) to the
+		maximum price (``float``) of each SKU. Default is ``None`` for no
+		maximum prices.
+		"""
+		if numpy is None:
+			raise ImportError("BuyBoxAnalyzer requires numpy to be installed.")
+
+		if undercut is None:
+			undercut = 0.01
+		elif not isinstance(undercut, (float,) + six.integer_types):
+			raise TypeError("undercut:{!r} is not a number.".format(undercut))
+
+		if min_prices is not None and not isinstance(min_prices, dict):
+			raise TypeError("min_prices:{!r} is not a dict.".format(min_prices))
+
+		if max_prices is not None and not isinstance(max_prices, dict):
+			raise TypeError("max_prices:{!r} is not a dict.".format(max_prices))
+
+		self.max_prices = max_prices if max_prices is not None else {}
+		"""
+		*max_prices* (``dict``) maps the SKU (``str``) to the maximum price
+		(``float``) of each SKU.
+		"""
+
+		self.min_prices = min_prices if min_prices is not None else {}
+		"""
+		*min_prices* (``dict``) maps the SKU (``str``) to the minimum price
+		(``float``) of each SKU.
+		"""
+
+		self.undercut = undercut
+		"""
+		*undercut* (``float``) is the amount the target landed price is
+		below the competing landed price.
+		"""
+
+		self._targets = {}
+		"""
+		*_targets* (``dict``) maps the SKU (``str``) to the last target price
+		(``float``) output for each SKU.
+		"""
+
+	def analyze(self, my_prices, competitive_prices, lowest_listings, skus=None):
+		"""
+		Computes the buy box gaps and target prices of the SKUs.
+
+		*my_prices* (``dict``) maps each SKU (``str``) to its result from
+		*MWSProducts.get_my_price_bulk()*.
+
+		*competitive_prices* (``dict``) maps each SKU (``str``) to its result
+		from *MWSProducts.get_competitive_pricing_bulk()*.
+
+		*lowest_listings* (``dict``) maps each SKU (``str``) to its result
+		from *MWSProducts.get_lowest_listings_bulk()*.
+
+		*skus* (**sequence**) contains each SKU (``str``) to analyze. Default
+		is ``None`` for all of the SKUs in *my_prices*.
+
+		Missing prices, and SKUs whose result is ``None`` or an error, are
+		``NaN`` in the arrays.
+
+		Returns the analysis (``dict``) containing: "skus" (``list``) of each
+		SKU (``str``), and the ``numpy.ndarray`` aligned with "skus" of each:
+		"listing_price", "shipping", "landed_price" (the seller's prices),
+		"buy_box_price", "lowest_price" (the competing landed prices),
+		"buy_box_gap", "lowest_gap" (the seller's landed price less the
+		competing landed price), "target_price", "winning" (``bool``), and
+		"eligible" (``bool``). The "target_price" of a SKU which is not
+		eligible is its current listing price.
+		"""
+		if skus is None:
+			skus = sorted(my_prices)
+		elif isinstance(skus, six.string_types):
+			raise TypeError("skus:{!r} is not a sequence.".format(skus))
+		else:
+			skus = list(skus)
+
+		offers = [_my_offer(my_prices.get(sku)) for sku in skus]
+		listing_price = numpy.array([_amount(offer, 'ListingPrice') for offer in offers], dtype=float)
+		shipping = numpy.array([_amount(offer, 'Shipping') for offer in offers], dtype=float)
+		landed_price = numpy.array([_amount(offer, 'LandedPrice') for offer in offers], dtype=float)
+		buy_box_price = numpy.array([_buy_box_price(competitive_prices.get(sku)) for sku in skus], dtype=float)
+		lowest_price = numpy.array([_lowest_price(lowest_listings.get(sku)) for sku in skus], dtype=float)
+		min_price = numpy.array([self.min_prices.get(sku, numpy.nan) for sku in skus], dtype=float)
+		max_price = numpy.array([self.max_prices.get(sku, numpy.nan) for sku in skus], dtype=float)
+
+		# Amazon omits the landed price of offers without shipping.
+		shipping = numpy.where(numpy.isnan(shipping), 0.0, shipping)
+		landed_price = numpy.where(numpy.isnan(landed_price), listing_price + shipping, landed_price)
+
+		with numpy.errstate(invalid='ignore'):
+			competing_price = numpy.where(numpy.isnan(buy_box_price), lowest_price, buy_box_price)
+			buy_box_gap = landed_price - buy_box_price
+			lowest_gap = landed_price - lowest_price
+			winning = buy_box_gap <= 0
+
+			target_price = numpy.round(competing_price - self.undercut - shipping, 2)
+			eligible = numpy.isfinite(listing_price) & numpy.isfinite(target_price) & ~winning & ~(target_price < min_price)
+
+			# fmax() and fmin() ignore NaN so missing limits do not apply.
+			target_price = numpy.fmin(numpy.fmax(target_price, min_price), max_price)
+			target_price = numpy.where(eligible, target_price, listing_price)
+
+		return {
+			'skus': skus,
+			'listing_price': listing_price,
+			'shipping': shipping,
+			'landed_price': landed_price,
+			'buy_box_price': buy_box_price,
+			'lowest_price': lowest_price,
+			'buy_box_gap': buy_box_gap,
+			'lowest_gap': lowest_gap,
+			'target_price': target_price,
+			'winning': winning,
+			'eligible': eligible,
+		}
+
+	def changes(self, analysis):
+		"""
+		Gets the SKUs whose target price changed, and remembers their new
+		target price. A target price is compared with the last target price
+		output for the SKU, or its current listing price if there is none.
+
+		*analysis* (``dict``) is the analysis from *analyze()*.
+
+		Returns a ``dict`` mapping the SKU (``str``) of each eligible SKU
+		whose target price changed to its target price (``float``).
+		"""
+		skus = analysis['skus']
+		target_price = analysis['target_price']
+		previous = numpy.array([self._targets.get(sku, numpy.nan) for sku in skus], dtype=float)
+		previous = numpy.where(numpy.isnan(previous), analysis['listing_price'], previous)
+
+		with numpy.errstate(invalid='ignore'):
+			changed = analysis['eligible'] & ~(numpy.abs(target_price - previous) < PRICE_PRECISION)
+
+		result = {skus[i]: float(target_price[i]) for i in numpy.flatnonzero(changed)}
+		self._targets.update(result)
+		return result
+
+	def clear(self):
+		"""
+		Forgets the last target price of every SKU.
+		"""
+		self._targets.clear()
+
+
+def _amount(value, field):
+	"""
+	Gets the amount of a price field.
+
+	*value* (``dict``) is the element containing the price field, or
+	``None``.
+
+	*field* (``str``) is the price field (e.g., "LandedPrice").
+
+	Returns the amount (``float``), or ``NaN`` if it is missing.
+	"""
+	if not isinstance(value, dict):
+		return numpy.nan
+	price = value.get(field)
+	if not isinstance(price, dict) or not price.get('Amount'):
+		return numpy.nan
+	return float(price['Amount'])
+
+def _buy_box_price(result):
+	"""
+	Gets the New buy box landed price of a competitive pricing result.
+
+	*result* (``dict``) is the result, or ``None`` or an ``Exception``.
+
+	Returns the landed price (``float``), or ``NaN`` if there is none.
+	"""
+	for price in _path_list(result, 'Product', 'CompetitivePricing', 'CompetitivePrices', 'CompetitivePrice'):
+		if price.get('CompetitivePriceId') == BUY_BOX_PRICE_ID:
+			return _landed(price.get('Price'))
+	return numpy.nan
+
+def _landed(price):
+	"""
+	Gets the landed price of a price element.
+
+	*price* (``dict``) is the price element containing "LandedPrice",
+	"ListingPrice" and "Shipping".
+
+	Returns the landed price (``float``), or ``NaN`` if it is missing.
+	"""
+	landed = _amount(price, 'LandedPrice')
+	if numpy.isnan(landed):
+		shipping = _amount(price, 'Shipping')
+		landed = _amount(price, 'ListingPrice') + (0.0 if numpy.isnan(shipping) else shipping)
+	return landed
+
+def _lowest_price(result):
+	"""
+	Gets the lowest landed price of a lowest offer listings result.
+
+	*result* (``dict``) is the result, or ``None`` or an ``Exception``.
+
+	Returns the lowest landed price (``float``), or ``NaN`` if there are
+	no listings.
+	"""
+	prices = [_landed(listing.get('Price')) for listing in _path_list(result, 'Product', 'LowestOfferListings', 'LowestOfferListing')]
+	prices = [price for price in prices if not numpy.isnan(price)]
+	return min(prices) if prices else numpy.nan
+
+def _my_offer(result):
+	"""
+	Gets the buying price of the seller's first offer from a my price
+	result.
+
+	*result* (``dict``) is the result, or ``None`` or an ``Exception``.
+
+	Returns the buying price (``dict``) containing "LandedPrice",
+	"ListingPrice" and "Shipping", or ``None`` if there is no offer.
+	"""
+	for offer in _path_list(result, 'Product', 'Offers', 'Offer'):
+		return offer.get('BuyingPrice')
+	return None
+
+def _path_list(value, *path):
+	"""
+	Gets the repeatable element at the path.
+
+	*value* (``dict``) is the converted element (see
+	*amazonmws.util.element_to_dict()*), or any other value.
+
+	*path* (``str``) contains each tag of the path.
+
+	Returns the ``list`` of each element (``dict``) at the path.
+	"""
+	for tag in path:
+		if not isinstance(value, dict):
+			return []
+		value = value.get(tag)
+	if isinstance(value, dict):
+		return [value]
+	elif isinstance(value, list):
+		return [item for item in value if isinstance(item, dict)]
+	return []
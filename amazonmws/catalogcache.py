@@ -0,0 +1,490 @@
+# coding: utf-8
+"""
+This module provides a persistent SQLite cache of the catalog data
+returned by the Amazon MWS Products API (GetMatchingProduct and
+GetMatchingProductForId) so that products already fetched are not
+fetched again after a restart, and a cached resolver of barcodes (UPC,
+EAN, ISBN, JAN) to ASINs.
+"""
+
+__created__ = "2026-10-19"
+__modified__ = "2026-10-19"
+
+import six # Python2/Python3 compatibility library.
+import hashlib
+import json
+import time
+from amazonmws.mws import MWSError
+from amazonmws.products import ID_TYPES, MWSProducts
+from amazonmws.util import SQLiteStore
+
+#: The SQL statements used to create the cache tables.
+SCHEMA = (
+	"""
+	CREATE TABLE IF NOT EXISTS catalog_products (
+		marketplace_id TEXT NOT NULL,
+		asin TEXT NOT NULL,
+		fetched REAL NOT NULL,
+		content_hash TEXT NOT NULL,
+		data TEXT NOT NULL,
+		PRIMARY KEY (marketplace_id, asin)
+	)
+	""",
+	"CREATE INDEX IF NOT EXISTS catalog_products_fetched ON catalog_products (fetched)",
+	"""
+	CREATE TABLE IF NOT EXISTS catalog_barcodes (
+		marketplace_id TEXT NOT NULL,
+		id_type TEXT NOT NULL,
+		id TEXT NOT NULL,
+		asins TEXT NOT NULL,
+		fetched REAL NOT NULL,
+		PRIMARY KEY (marketplace_id, id_type, id)
+	)
+	""",
+)
+
+#: The error codes Amazon returns for an ID which does not match any
+#: product.
+NOT_FOUND_CODES = ('InvalidParameterValue', 'InvalidValue')
+
+
+class BarcodeResolver(SQLiteStore):
+	"""
+	The ``BarcodeResolver`` class resolves barcodes (UPC, EAN, ISBN, JAN)
+	to ASINs. Barcodes are grouped by ID type and resolved in batched
+	GetMatchingProductForId calls. Both matches and "not found" results
+	are cached in SQLite with separate TTLs so that known invalid codes
+	are not looked up again.
+	"""
+
+	def __init__(self, products, marketplace_id, path=None, ttl=None, negative_ttl=None, catalog=None, workers=None):
+		"""
+		Initializes the ``BarcodeResolver`` instance.
+
+		*products* (``MWSProducts``) is the Products API.
+
+		*marketplace_id* (``str``) is the ID of the Amazon Marketplace.
+
+		*path* (``str``) is the path of the SQLite database file. Default is
+		``None`` for ":memory:" to not persist the cache.
+
+		*ttl* (``int`` or ``float``) is the number of seconds a match is
+		cached for. Default is ``None`` for 2592000 (30 days).
+
+		*negative_ttl* (``int`` or ``float``) is the number of seconds a "not
+		found" result is cached for. Default is ``None`` for 86400 (1 day).
+
+		*catalog* (``CatalogCache``) optionally is the catalog cache the
+		matching products are also cached in. Default is ``None``.
+
+		*workers* (``int``) is the number of calls sent concurrently. Default
+		is ``None`` for the GetMatchingProductForId quota.
+		"""
+		if not isinstance(products, MWSProducts):
+			raise TypeError("products:{!r} is not an MWSProducts.".format(products))
+
+		if not isinstance(marketplace_id, six.string_types):
+			raise TypeError("marketplace_id:{!r} is not a string.".format(marketplace_id))
+
+		if ttl is None:
+			ttl = 2592000
+		elif not isinstance(ttl, (float,) + six.integer_types):
+			raise TypeError("ttl:{!r} is not a number.".format(ttl))
+
+		if negative_ttl is None:
+			negative_ttl = 86400
+		elif not isinstance(negative_ttl, (float,) + six.integer_types):
+			raise TypeError("negative_ttl:{!r} is not a number.".format(negative_ttl))
+
+		if catalog is not None and not isinstance(catalog, CatalogCache):
+			raise TypeError("catalog:{!r} is not a CatalogCache.".format(catalog))
+
+		self.catalog = catalog
+		"""
+		*catalog* (``CatalogCache``) is the catalog cache the matching
+		products are also cached in, or ``None``.
+		"""
+
+		self.marketplace_id = marketplace_id
+		"""
+		*marketplace_id* (``str``) is the ID of the Amazon Marketplace.
+		"""
+
+		self.negative_ttl = negative_ttl
+		"""
+		*negative_ttl* (``int`` or ``float``) is the number of seconds a "not
+		found" result is cached for.
+		"""
+
+		self.products = products
+		"""
+		*products* (``MWSProducts``) is the Products API.
+		"""
+
+		self.ttl = ttl
+		"""
+		*ttl* (``int`` or ``float``) is the number of seconds a match is
+		cached for.
+		"""
+
+		self.workers = workers
+		"""
+		*workers* (``int``) is the number of calls sent concurrently.
+		"""
+
+		SQLiteStore.__init__(self, path, SCHEMA)
+
+	def iter_resolve(self, codes, batch_size=None):
+		"""
+		Resolves a stream of barcodes in batches.
+
+		*codes* (**iterable**) contains each barcode. See *resolve()*. This
+		is consumed lazily.
+
+		*batch_size* (``int``) is the number of barcodes resolved together.
+		Default is ``None`` for 1000.
+
+		Returns an iterator yielding a ``tuple`` containing: the barcode
+		(``tuple``) as an ID type and ID, and its result. See *resolve()*.
+		"""
+		if batch_size is None:
+			batch_size = 1000
+		elif not isinstance(batch_size, six.integer_types):
+			raise TypeError("batch_size:{!r} is not an integer.".format(batch_size))
+		elif batch_size < 1:
+			raise ValueError("batch_size:{!r} cannot be less than 1.".format(batch_size))
+
+		batch = []
+		for code in codes:
+			batch.append(code)
+			if len(batch) >= batch_size:
+				for item in six.iteritems(self.resolve(batch)):
+					yield item
+				batch = []
+		if batch:
+			for item in six.iteritems(self.resolve(batch)):
+				yield item
+
+	def resolve(self, codes):
+		"""
+		Resolves the specified barcodes to ASINs.
+
+		*codes* (**iterable**) contains each barcode. This can be either a
+		``tuple`` containing the ID type (``str``) from ``ID_TYPES`` and the
+		ID (``str``), or the ID (``str``) whose type is detected using
+		*barcode_type()*.
+
+		Returns a ``dict`` mapping each barcode (``tuple``) as an ID type and
+		ID to either the ``list`` of each matching ASIN (``str``), which is
+		empty if no product matched, or the error (``Exception``) raised
+		while resolving it. Errors are not cached.
+		"""
+		groups = {}
+		for code in codes:
+			if isinstance(code, six.string_types):
+				id_type, id_ = barcode_type(code), code
+			else:
+				id_type, id_ = code
+				id_type = ID_TYPES.get(id_type, id_type)
+			groups.setdefault(id_type, set()).add(id_)
+
+		results = {}
+		for id_type, ids in six.iteritems(groups):
+			found = self._lookup(id_type, ids)
+			for id_, asins in six.iteritems(found):
+				results[(id_type, id_)] = asins
+
+			missing = [id_ for id_ in ids if id_ not in found]
+			if not missing:
+				continue
+
+			if id_type is None:
+				# The type of these barcodes could not be detected.
+				for id_ in missing:
+					results[(id_type, id_)] = ValueError("id:{!r} is not a valid barcode.".format(id_))
+				continue
+
+			if self.catalog is not None:
+				fetched = self.catalog.get_for_id(self.marketplace_id, id_type, missing)
+			else:
+				fetched = {}
+				for id_, result in six.iteritems(self.products.get_products_bulk(self.marketplace_id, id_type, missing, workers=self.workers)):
+					if isinstance(result, dict):
+						matches = (result.get('Products') or {}).get('Product') or []
+						result = [matches] if isinstance(matches, dict) else matches
+					fetched[id_] = result
+
+			rows = []
+			now = time.time()
+			for id_ in missing:
+				result = fetched.get(id_)
+				if isinstance(result, MWSError) and result.code in NOT_FOUND_CODES:
+					result = []
+				elif result is None:
+					result = []
+				elif not isinstance(result, Exception):
+					result = [asin for asin in (product_asin(product) for product in result) if asin]
+
+				if not isinstance(result, Exception):
+					rows.append((self.marketplace_id, id_type, id_, json.dumps(result), now))
+				results[(id_type, id_)] = result
+
+			with self._lock, self._db:
+				self._db.executemany("INSERT OR REPLACE INTO catalog_barcodes (marketplace_id, id_type, id, asins, fetched) VALUES (?, ?, ?, ?, ?)", rows)
+
+		return results
+
+	def _lookup(self, id_type, ids):
+		"""
+		Looks up the cached results of the barcodes.
+
+		*id_type* (``str``) is the ID type.
+
+		*ids* (**iterable**) contains each ID (``str``).
+
+		Returns a ``dict`` mapping each ID (``str``) found to the ``list`` of
+		each matching ASIN (``str``).
+		"""
+		now = time.time()
+		results = {}
+		ids = list(ids)
+		# Stay within SQLite's default limit of 999 parameters.
+		for i in six.moves.range(0, len(ids), 900):
+			chunk = ids[i:i + 900]
+			sql = "SELECT id, asins, fetched FROM catalog_barcodes WHERE marketplace_id = ? AND id_type = ? AND id IN ({})".format(", ".join("?" * len(chunk)))
+			with self._lock:
+				rows = self._db.execute(sql, [self.marketplace_id, id_type] + chunk).fetchall()
+			for id_, asins, fetched in rows:
+				asins = json.loads(asins)
+				if now - fetched <= (self.ttl if asins else self.negative_ttl):
+					results[id_] = asins
+		return results
+
+
+class CatalogCache(SQLiteStore):
+	"""
+	The ``CatalogCache`` class caches catalog products in SQLite keyed by
+	marketplace and ASIN. Products are fetched in batched calls only when
+	they are missing or older than the TTL. A refreshed product whose
+	content has not changed only has its fetch time updated.
+	"""
+
+	def __init__(self, products, path=None, ttl=None, workers=None):
+		"""
+		Initializes the ``CatalogCache`` instance.
+
+		*products* (``MWSProducts``) is the Products API.
+
+		*path* (``str``) is the path of the SQLite database file. Default is
+		``None`` for ":memory:" to not persist the cache.
+
+		*ttl* (``int`` or ``float``) is the number of seconds a product is
+		fresh for. Default is ``None`` for 604800 (7 days).
+
+		*workers* (``int``) is the number of calls sent concurrently when
+		fetching. Default is ``None`` for the quota of the action.
+		"""
+		if not isinstance(products, MWSProducts):
+			raise TypeError("products:{!r} is not an MWSProducts.".format(products))
+
+		if ttl is None:
+			ttl = 604800
+		elif not isinstance(ttl, (float,) + six.integer_types):
+			raise TypeError("ttl:{!r} is not a number.".format(ttl))
+
+		self.products = products
+		"""
+		*products* (``MWSProducts``) is the Products API.
+		"""
+
+		self.ttl = ttl
+		"""
+		*ttl* (``int`` or ``float``) is the number of seconds a product is
+		fresh for.
+		"""
+
+		self.workers = workers
+		"""
+		*workers* (``int``) is the number of calls sent concurrently when
+		fetching.
+		"""
+
+		SQLiteStore.__init__(self, path, SCHEMA)
+
+	def get(self, marketplace_id, asins, refresh=None):
+		"""
+		Gets the catalog products of the specified ASINs. Missing and
+		expired products are fetched using *MWSProducts.get_products_bulk()*.
+
+		*marketplace_id* (``str``) is the ID of the Amazon Marketplace.
+
+		*asins* (**iterable**) contains each ASIN (``str``).
+
+		*refresh* (``bool``) is whether all of the products should be
+		fetched regardless of their age. Default is ``None`` for ``False``.
+
+		Returns a ``dict`` mapping each ASIN (``str``) to either its product
+		(``dict``), ``None`` if Amazon did not return it, or the error
+		(``Exception``) returned for it. Errors are not cached.
+		"""
+		asins = list(asins)
+		results = {} if refresh else self.lookup(marketplace_id, asins)
+		missing = [asin for asin in asins if asin not in results]
+		if missing:
+			fetched = self.products.get_products_bulk(marketplace_id, 'ASIN', missing, workers=self.workers)
+			products = []
+			for asin, result in six.iteritems(fetched):
+				if isinstance(result, dict):
+					result = result.get('Product')
+					if result is not None:
+						products.append(result)
+				results[asin] = result
+			self.update(marketplace_id, products)
+		return results
+
+	def get_for_id(self, marketplace_id, id_type, ids):
+		"""
+		Fetches the catalog products matching the specified IDs using
+		*MWSProducts.get_products_bulk()* (GetMatchingProductForId), and
+		caches each matching product by its ASIN.
+
+		*marketplace_id* (``str``) is the ID of the Amazon Marketplace.
+
+		*id_type* (``str``) is the type of ID used (e.g., "UPC" or "EAN").
+
+		*ids* (**iterable**) contains each ID (``str``).
+
+		Returns a ``dict`` mapping each ID (``str``) to either the ``list`` of
+		each matching product (``dict``), ``None`` if Amazon did not return
+		it, or the error (``Exception``) returned for it.
+		"""
+		fetched = self.products.get_products_bulk(marketplace_id, id_type, ids, workers=self.workers)
+		results = {}
+		products = []
+		for id_, result in six.iteritems(fetched):
+			if isinstance(result, dict):
+				matches = (result.get('Products') or {}).get('Product') or []
+				if isinstance(matches, dict):
+					matches = [matches]
+				products.extend(matches)
+				result = matches
+			results[id_] = result
+		self.update(marketplace_id, products)
+		return results
+
+	def lookup(self, marketplace_id, asins, max_age=None):
+		"""
+		Looks up the cached products without fetching any.
+
+		*marketplace_id* (``str``) is the ID of the Amazon Marketplace.
+
+		*asins* (**sequence**) contains each ASIN (``str``).
+
+		*max_age* (``int`` or ``float``) is the maximum age of the products
+		in seconds. Default is ``None`` for *ttl*.
+
+		Returns a ``dict`` mapping each ASIN (``str``) found to its product
+		(``dict``).
+		"""
+		if max_age is None:
+			max_age = self.ttl
+
+		cutoff = time.time() - max_age
+		results = {}
+		asins = list(asins)
+		# Stay within SQLite's default limit of 999 parameters.
+		for i in six.moves.range(0, len(asins), 900):
+			chunk = asins[i:i + 900]
+			sql = "SELECT asin, data FROM catalog_products WHERE marketplace_id = ? AND fetched >= ? AND asin IN ({})".format(", ".join("?" * len(chunk)))
+			with self._lock:
+				rows = self._db.execute(sql, [marketplace_id, cutoff] + chunk).fetchall()
+			for asin, data in rows:
+				results[asin] = json.loads(data)
+		return results
+
+	def purge(self, max_age=None):
+		"""
+		Removes the products older than the maximum age.
+
+		*max_age* (``int`` or ``float``) is the maximum age of the products
+		to keep in seconds. Default is ``None`` for *ttl*.
+
+		Returns the number of products removed (``int``).
+		"""
+		if max_age is None:
+			max_age = self.ttl
+		with self._lock, self._db:
+			return self._db.execute("DELETE FROM catalog_products WHERE fetched < ?", (time.time() - max_age,)).rowcount
+
+	def update(self, marketplace_id, products):
+		"""
+		Caches the specified products. A product whose content has not
+		changed only has its fetch time updated.
+
+		*marketplace_id* (``str``) is the ID of the Amazon Marketplace.
+
+		*products* (**iterable**) contains each product (``dict``) as
+		returned within *amazonmws.products.parse_product_results()*.
+
+		Returns the number of products cached (``int``).
+		"""
+		now = time.time()
+		rows = []
+		for product in products:
+			asin = product_asin(product)
+			if not asin:
+				continue
+			data = json.dumps(product, sort_keys=True)
+			rows.append((marketplace_id, asin, now, hashlib.sha1(data.encode('utf8')).hexdigest(), data))
+
+		if rows:
+			with self._lock, self._db:
+				# Unchanged products only have their fetch time updated.
+				self._db.executemany("UPDATE catalog_products SET fetched = ? WHERE marketplace_id = ? AND asin = ? AND content_hash = ?", [(now, marketplace_id, asin, content_hash) for marketplace_id, asin, _now, content_hash, _data in rows])
+				self._db.executemany("INSERT OR REPLACE INTO catalog_products (marketplace_id, asin, fetched, content_hash, data) SELECT ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM catalog_products WHERE marketplace_id = ? AND asin = ? AND content_hash = ?)", [row + (row[0], row[1], row[3]) for row in rows])
+
+		return len(rows)
+
+
+def barcode_type(code):
+	"""
+	Detects the type of a barcode from its length and prefix.
+
+	*code* (``str``) is the barcode.
+
+	Returns the ID type (``str``) from ``ID_TYPES``: "ISBN" for 10 digit
+	codes (the last may be "X") and 13 digit codes starting with "978" or
+	"979"; "JAN" for other 13 digit codes starting with "45" or "49";
+	"EAN" for other 13 digit codes; "UPC" for 12 digit codes; otherwise,
+	``None``.
+	"""
+	length = len(code)
+	if length == 10 and code[:9].isdigit() and (code[9].isdigit() or code[9] in 'Xx'):
+		return ID_TYPES['isbn']
+	elif not code.isdigit():
+		return None
+	elif length == 12:
+		return ID_TYPES['upc']
+	elif length == 13:
+		if code[:3] in ('978', '979'):
+			return ID_TYPES['isbn']
+		elif code[:2] in ('45', '49'):
+			return ID_TYPES['jan']
+		return ID_TYPES['ean']
+	return None
+
+def product_asin(product):
+	"""
+	Gets the ASIN of a catalog product.
+
+	*product* (``dict``) is the product.
+
+	Returns the ASIN (``str``) if found; otherwise, ``None``.
+	"""
+	identifiers = product.get('Identifiers')
+	if not isinstance(identifiers, dict):
+		return None
+	marketplace_asin = identifiers.get('MarketplaceASIN')
+	if not isinstance(marketplace_asin, dict):
+		return None
+	return marketplace_asin.get('ASIN') or None
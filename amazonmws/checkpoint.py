@@ -0,0 +1,244 @@
+# coding: utf-8
+"""
+This module provides resumable pagination for the Amazon MWS APIs. The
+current NextToken and the number of records already emitted are
+checkpointed to a durable store after each page so that a restarted job
+resumes where it stopped instead of starting over from the first page.
+"""
+
+__created__ = "2026-10-19"
+__modified__ = "2026-10-19"
+
+import six # Python2/Python3 compatibility library.
+import time
+from amazonmws.feeds import Feeds, parse_feed_submissions
+from amazonmws.orders import Orders, parse_orders
+from amazonmws.reports import MWSReports, parse_reports
+from amazonmws.util import SQLiteStore
+
+#: The SQL statements used to create the checkpoint tables.
+SCHEMA = (
+	"""
+	CREATE TABLE IF NOT EXISTS checkpoints (
+		name TEXT PRIMARY KEY,
+		next_token TEXT NOT NULL,
+		emitted INTEGER NOT NULL,
+		updated REAL NOT NULL
+	)
+	""",
+)
+
+
+class CheckpointStore(SQLiteStore):
+	"""
+	The ``CheckpointStore`` class persists pagination checkpoints in
+	SQLite. Each checkpoint is identified by a name chosen by the job, and
+	expires once its NextToken is no longer expected to be valid.
+	"""
+
+	def __init__(self, path=None, max_age=None):
+		"""
+		Initializes the ``CheckpointStore`` instance.
+
+		*path* (``str``) is the path of the SQLite database file. Default is
+		``None`` for ":memory:" to not persist the checkpoints.
+
+		*max_age* (``int`` or ``float``) is the number of seconds a
+		checkpoint is valid for. This should not exceed the validity period
+		of the NextTokens being checkpointed. Default is ``None`` for 86400
+		(1 day).
+		"""
+		if max_age is None:
+			max_age = 86400
+		elif not isinstance(max_age, (float,) + six.integer_types):
+			raise TypeError("max_age:{!r} is not a number.".format(max_age))
+
+		self.max_age = max_age
+		"""
+		*max_age* (``int`` or ``float``) is the number of seconds a
+		checkpoint is valid for.
+		"""
+
+		SQLiteStore.__init__(self, path, SCHEMA)
+
+	def clear(self, name):
+		"""
+		Removes the checkpoint.
+
+		*name* (``str``) is the name of the checkpoint.
+		"""
+		with self._lock, self._db:
+			self._db.execute("DELETE FROM checkpoints WHERE name = ?", (name,))
+
+	def get(self, name):
+		"""
+		Gets the checkpoint.
+
+		*name* (``str``) is the name of the checkpoint.
+
+		Returns a ``tuple`` containing: the NextToken (``str``), and the
+		number of records emitted (``int``) before it; or ``None`` if there
+		is no checkpoint or it has expired.
+		"""
+		with self._lock:
+			row = self._db.execute("SELECT next_token, emitted, updated FROM checkpoints WHERE name = ?", (name,)).fetchone()
+		if row is None or time.time() - row[2] > self.max_age:
+			return None
+		return row[0], row[1]
+
+	def set(self, name, next_token, emitted):
+		"""
+		Sets the checkpoint.
+
+		*name* (``str``) is the name of the checkpoint.
+
+		*next_token* (``str``) is the NextToken of the next page.
+
+		*emitted* (``int``) is the number of records emitted before the next
+		page.
+		"""
+		with self._lock, self._db:
+			self._db.execute("INSERT OR REPLACE INTO checkpoints (name, next_token, emitted, updated) VALUES (?, ?, ?, ?)", (name, next_token, emitted, time.time()))
+
+
+def paginate(store, name, first_page, next_page, parse, throttles=None):
+	"""
+	Pages through a listing, checkpointing the NextToken after each page.
+	If a valid checkpoint exists, the listing is resumed from it instead of
+	requesting the first page. The checkpoint is removed once the last
+	page has been emitted.
+
+	A page is checkpointed once all of its records have been consumed, so
+	a page may be emitted again if the job stops part way through it.
+
+	*store* (``CheckpointStore``) persists the checkpoint.
+
+	*name* (``str``) is the name of the checkpoint. This must be unique
+	to the listing (e.g., include the query).
+
+	*first_page* (**callable**) is called to request the first page. It
+	returns the response XML (``str``).
+
+	*next_page* (**callable**) is called with the NextToken (``str``) to
+	request the next page. It returns the response XML (``str``).
+
+	*parse* (**callable**) is called with the response XML (``str``), and
+	returns a ``tuple`` containing: the **sequence** of each record, and
+	the NextToken (``str``) or ``None``.
+
+	*throttles* (**sequence**) optionally contains the throttle
+	(``amazonmws.throttle.Throttle``) of the first page and of the next
+	pages. Default is ``None`` to not throttle the pages.
+
+	Returns an iterator yielding a ``tuple`` containing: the index of the
+	record (``int``) counting from the first page, and the record.
+	"""
+	if not isinstance(store, CheckpointStore):
+		raise TypeError("store:{!r} is not a CheckpointStore.".format(store))
+	if not isinstance(name, six.string_types):
+		raise TypeError("name:{!r} is not a string.".format(name))
+	if throttles is None:
+		first_throttle = next_throttle = None
+	else:
+		first_throttle, next_throttle = throttles
+
+	def fetch(throttle, request, *args):
+		if throttle is None:
+			return parse(request(*args))
+		return throttle.call(lambda: parse(request(*args)))
+
+	checkpoint = store.get(name)
+	if checkpoint is not None:
+		next_token, emitted = checkpoint
+		records, next_token = fetch(next_throttle, next_page, next_token)
+	else:
+		emitted = 0
+		records, next_token = fetch(first_throttle, first_page)
+
+	while True:
+		for record in records:
+			yield emitted, record
+			emitted += 1
+
+		if not next_token:
+			store.clear(name)
+			break
+
+		store.set(name, next_token, emitted)
+		records, next_token = fetch(next_throttle, next_page, next_token)
+
+def paginate_feed_submissions(feeds, store, name, **kwargs):
+	"""
+	Lists the Feed Submissions that match the criteria with resumable
+	pagination within the GetFeedSubmissionList quotas. See *paginate()*.
+
+	*feeds* (``Feeds``) is the Feeds API.
+
+	*store* (``CheckpointStore``) persists the checkpoint.
+
+	*name* (``str``) is the name of the checkpoint.
+
+	*kwargs* contains the arguments for *Feeds.GetFeedSubmissionList()*.
+
+	Returns an iterator yielding a ``tuple`` containing: the index of the
+	Feed Submission (``int``), and the Feed Submission (``dict``). See
+	*amazonmws.feeds.parse_feed_submissions()*.
+	"""
+	if not isinstance(feeds, Feeds):
+		raise TypeError("feeds:{!r} is not a Feeds.".format(feeds))
+
+	throttles = [feeds.get_throttle(action) for action in ('GetFeedSubmissionList', 'GetFeedSubmissionListByNextToken')]
+	return paginate(store, name, lambda: feeds.GetFeedSubmissionList(**kwargs), feeds.GetFeedSubmissionListByNextToken, parse_feed_submissions, throttles=throttles)
+
+def paginate_orders(orders, store, name, **kwargs):
+	"""
+	Lists the Orders that match the criteria with resumable pagination
+	within the ListOrders quota. See *paginate()*.
+
+	*orders* (``Orders``) is the Orders API.
+
+	*store* (``CheckpointStore``) persists the checkpoint.
+
+	*name* (``str``) is the name of the checkpoint.
+
+	*kwargs* contains the ListOrders arguments (e.g., "CreatedAfter",
+	"LastUpdatedAfter", "OrderStatus").
+
+	Returns an iterator yielding a ``tuple`` containing: the index of the
+	Order (``int``), and the Order (``dict``). See
+	*amazonmws.orders.parse_orders()*.
+	"""
+	if not isinstance(orders, Orders):
+		raise TypeError("orders:{!r} is not an Orders.".format(orders))
+
+	def parse(response):
+		records, next_token, _last_updated_before = parse_orders(response)
+		return records, next_token
+
+	# A ListOrdersByNextToken request shares the ListOrders throttle.
+	throttle = orders.get_throttle('ListOrders')
+	return paginate(store, name, lambda: orders.ListOrders(**kwargs), lambda next_token: orders.ListOrdersByNextToken(NextToken=next_token), parse, throttles=(throttle, throttle))
+
+def paginate_reports(reports, store, name, **kwargs):
+	"""
+	Lists the Reports that match the criteria with resumable pagination
+	within the GetReportList quotas. See *paginate()*.
+
+	*reports* (``MWSReports``) is the Reports API.
+
+	*store* (``CheckpointStore``) persists the checkpoint.
+
+	*name* (``str``) is the name of the checkpoint.
+
+	*kwargs* contains the arguments for *MWSReports.get_report_list()*.
+
+	Returns an iterator yielding a ``tuple`` containing: the index of the
+	Report (``int``), and the Report (``dict``). See
+	*amazonmws.reports.parse_reports()*.
+	"""
+	if not isinstance(reports, MWSReports):
+		raise TypeError("reports:{!r} is not an MWSReports.".format(reports))
+
+	throttles = [reports.get_throttle(action) for action in ('GetReportList', 'GetReportListByNextToken')]
+	debug = kwargs.get('debug')
+	return paginate(store, name, lambda: reports.get_report_list(**kwargs), lambda next_token: reports.get_report_list_next(next_token, debug=debug), parse_reports, throttles=throttles)
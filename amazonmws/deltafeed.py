@@ -0,0 +1,369 @@
+# coding: utf-8
+"""
+This module provides delta price and inventory feeds for the Amazon MWS
+Feeds API. A compact on-disk index records a hash of the price or
+quantity last submitted for each SKU, so each snapshot is diffed against
+it and only the changed SKUs are submitted. The index is only updated
+once the Feed Processing Report confirms the messages succeeded.
+"""
+
+__created__ = "2026-10-19"
+__modified__ = "2026-10-19"
+
+import six # Python2/Python3 compatibility library.
+import hashlib
+import xml.etree.ElementTree as ElementTree
+from amazonmws.feeds import FEED_TYPES, Feeds, parse_processing_report
+from amazonmws.mws import MESSAGE_TYPES, OPERATION_TYPES, parse_response
+from amazonmws.util import SQLiteStore
+
+#: The feed types supported by ``DeltaFeedBuilder``. Maps each key from
+#: ``FEED_TYPES`` to the envelope message type from ``MESSAGE_TYPES``.
+DELTA_FEED_TYPES = {
+	'product_inventory': MESSAGE_TYPES['inventory'],
+	'product_pricing': MESSAGE_TYPES['price'],
+}
+
+#: The SQL statements used to create the index tables.
+SCHEMA = (
+	"""
+	CREATE TABLE IF NOT EXISTS feed_index (
+		feed_type TEXT NOT NULL,
+		sku TEXT NOT NULL,
+		content_hash TEXT NOT NULL,
+		seq INTEGER NOT NULL,
+		PRIMARY KEY (feed_type, sku)
+	)
+	""",
+	"""
+	CREATE TABLE IF NOT EXISTS feed_pending (
+		seq INTEGER PRIMARY KEY AUTOINCREMENT,
+		submission_id TEXT NOT NULL,
+		message_id INTEGER NOT NULL,
+		feed_type TEXT NOT NULL,
+		sku TEXT NOT NULL,
+		content_hash TEXT NOT NULL,
+		UNIQUE (submission_id, message_id)
+	)
+	""",
+)
+
+#: The SQL statement used to record a confirmed message in the index. The
+#: entry is only replaced if it was not recorded from a newer submission.
+_UPSERT_INDEX = """
+	INSERT OR REPLACE INTO feed_index (feed_type, sku, content_hash, seq)
+	SELECT ?, ?, ?, ?
+	WHERE NOT EXISTS (SELECT 1 FROM feed_index WHERE feed_type = ? AND sku = ? AND seq > ?)
+"""
+
+
+class DeltaFeedBuilder(SQLiteStore):
+	"""
+	The ``DeltaFeedBuilder`` class builds and submits price and inventory
+	feeds containing only the SKUs which changed since they were last
+	successfully submitted.
+
+	The messages of a submitted feed are kept pending until *confirm()*
+	processes its Feed Processing Report. A pending SKU is not submitted
+	again unless its value changes. Only the messages without an error
+	are then recorded in the index, so failed SKUs are submitted again
+	with the next snapshot.
+	"""
+
+	def __init__(self, merchant_id, path=None, currency=None):
+		"""
+		Initializes the ``DeltaFeedBuilder`` instance.
+
+		*merchant_id* (``str``) is the Merchant ID used as the
+		MerchantIdentifier of the feeds.
+
+		*path* (``str``) is the path of the SQLite database file used to
+		persist the index. Default is ``None`` for ":memory:" to not
+		persist it.
+
+		*currency* (``str``) is the currency of the prices (e.g., "USD").
+		Default is ``None`` for "USD".
+		"""
+		if not isinstance(merchant_id, six.string_types):
+			raise TypeError("merchant_id:{!r} is not a string.".format(merchant_id))
+		elif not merchant_id:
+			raise ValueError("merchant_id:{!r} cannot be empty.".format(merchant_id))
+
+		if currency is None:
+			currency = 'USD'
+		elif not isinstance(currency, six.string_types):
+			raise TypeError("currency:{!r} is not a string.".format(currency))
+
+		self.currency = currency
+		"""
+		*currency* (``str``) is the currency of the prices.
+		"""
+
+		self.merchant_id = merchant_id
+		"""
+		*merchant_id* (``str``) is the Merchant ID used as the
+		MerchantIdentifier of the feeds.
+		"""
+
+		SQLiteStore.__init__(self, path, SCHEMA)
+
+	def build(self, feed_type, snapshot):
+		"""
+		Builds the feed of the SKUs which changed in the snapshot.
+
+		*feed_type* (``str``) is the key or value from ``FEED_TYPES`` of a
+		feed type from ``DELTA_FEED_TYPES``.
+
+		*snapshot* (``dict``) maps each SKU (``str``) to its current value.
+		See *diff()*.
+
+		Returns a ``tuple`` containing: the feed XML (``bytes``) or ``None``
+		if no SKUs changed, and the ``list`` of each message ``tuple``
+		containing: the MessageID (``int``), the SKU (``str``), and the
+		content hash (``str``).
+		"""
+		feed_key = _feed_key(feed_type)
+		changes = self.diff(feed_key, snapshot)
+		if not changes:
+			return None, []
+
+		message_type = DELTA_FEED_TYPES[feed_key]
+		envelope = ElementTree.Element('AmazonEnvelope', {
+			'xmlns:xsi': "http://www.w3.org/2001/XMLSchema-instance",
+			'xsi:noNamespaceSchemaLocation': "amzn-envelope.xsd",
+		})
+		header = ElementTree.SubElement(envelope, 'Header')
+		ElementTree.SubElement(header, 'DocumentVersion').text = "1.01"
+		ElementTree.SubElement(header, 'MerchantIdentifier').text = self.merchant_id
+		ElementTree.SubElement(envelope, 'MessageType').text = message_type
+
+		messages = []
+		for message_id, (sku, text, content_hash) in enumerate(changes, 1):
+			message = ElementTree.SubElement(envelope, 'Message')
+			ElementTree.SubElement(message, 'MessageID').text = str(message_id)
+			if message_type == MESSAGE_TYPES['inventory']:
+				ElementTree.SubElement(message, 'OperationType').text = OPERATION_TYPES['update']
+				body = ElementTree.SubElement(message, message_type)
+				ElementTree.SubElement(body, 'SKU').text = sku
+				ElementTree.SubElement(body, 'Quantity').text = text
+			else:
+				body = ElementTree.SubElement(message, message_type)
+				ElementTree.SubElement(body, 'SKU').text = sku
+				ElementTree.SubElement(body, 'StandardPrice', {'currency': self.currency}).text = text
+			messages.append((message_id, sku, content_hash))
+
+		return ElementTree.tostring(envelope, encoding='utf-8'), messages
+
+	def confirm(self, feeds, submission_id):
+		"""
+		Gets the Feed Processing Report of a submitted feed, and records the
+		messages which succeeded in the index. See *confirm_report()*.
+
+		*feeds* (``Feeds``) is the Feeds API.
+
+		*submission_id* (``str``) is the ID of the Feed Submission.
+
+		Returns the Feed Processing Report (``dict``).
+		"""
+		if not isinstance(feeds, Feeds):
+			raise TypeError("feeds:{!r} is not a Feeds.".format(feeds))
+		return self.confirm_report(submission_id, feeds.GetFeedSubmissionResult(submission_id))
+
+	def confirm_report(self, submission_id, data):
+		"""
+		Records the messages of a submitted feed which succeeded in the
+		index. Nothing is recorded unless the report is complete, and no
+		messages are recorded if the report contains an error which is not
+		specific to a message. A SKU is not recorded if the index already
+		contains it from a newer submission. The pending messages of the
+		submission are removed once the report is complete.
+
+		*submission_id* (``str``) is the ID of the Feed Submission.
+
+		*data* (``str``) is the GetFeedSubmissionResult response XML.
+
+		Returns the Feed Processing Report (``dict``). See
+		*amazonmws.feeds.parse_processing_report()*. It additionally
+		contains: "confirmed" (``int``), the number of SKUs recorded; and
+		"failed" (``dict``) mapping the SKU (``str``) of each failed message
+		to the ResultDescription (``str``) of its error.
+		"""
+		report = parse_processing_report(data)
+		report['confirmed'] = 0
+		report['failed'] = {}
+		if report['status'] != 'Complete':
+			return report
+
+		with self._lock:
+			pending = {row[0]: row[1:] for row in self._db.execute("SELECT message_id, feed_type, sku, content_hash, seq FROM feed_pending WHERE submission_id = ?", (submission_id,))}
+
+		failed_ids = set()
+		failed_all = False
+		for result in report['results']:
+			if result.get('ResultCode') != 'Error':
+				continue
+			message_id = int(result.get('MessageID') or 0)
+			if message_id in pending:
+				failed_ids.add(message_id)
+				report['failed'][pending[message_id][1]] = result.get('ResultDescription')
+			else:
+				failed_all = True
+
+		if report['errors'] and not failed_ids:
+			# The errors could not be matched to messages.
+			failed_all = True
+
+		if failed_all:
+			for message_id, (_feed_type, sku, _content_hash, _seq) in six.iteritems(pending):
+				report['failed'].setdefault(sku, None)
+			rows = []
+		else:
+			rows = [row for message_id, row in six.iteritems(pending) if message_id not in failed_ids]
+
+		confirmed = 0
+		with self._lock, self._db:
+			for feed_type, sku, content_hash, seq in rows:
+				confirmed += self._db.execute(_UPSERT_INDEX, (feed_type, sku, content_hash, seq, feed_type, sku, seq)).rowcount
+			self._db.execute("DELETE FROM feed_pending WHERE submission_id = ?", (submission_id,))
+
+		report['confirmed'] = confirmed
+		return report
+
+	def diff(self, feed_type, snapshot):
+		"""
+		Diffs the snapshot against the index. The value of a SKU with
+		pending messages is compared with its most recently submitted
+		value instead.
+
+		*feed_type* (``str``) is the key or value from ``FEED_TYPES`` of a
+		feed type from ``DELTA_FEED_TYPES``.
+
+		*snapshot* (``dict``) maps each SKU (``str``) to its current value:
+		the price (``float``, ``decimal.Decimal`` or ``str``) for a pricing
+		feed, or the quantity (``int``) for an inventory feed.
+
+		Returns the ``list`` of each changed SKU ``tuple`` containing: the
+		SKU (``str``), its value formatted for the feed (``str``), and its
+		content hash (``str``); sorted by SKU.
+		"""
+		feed_key = _feed_key(feed_type)
+		if not isinstance(snapshot, dict):
+			raise TypeError("snapshot:{!r} is not a dict.".format(snapshot))
+
+		with self._lock:
+			index = dict(self._db.execute("SELECT sku, content_hash FROM feed_index WHERE feed_type = ?", (feed_key,)))
+			index.update(self._db.execute("SELECT sku, content_hash FROM feed_pending WHERE feed_type = ? ORDER BY seq", (feed_key,)))
+
+		changes = []
+		for sku in sorted(snapshot):
+			if not isinstance(sku, six.string_types):
+				raise TypeError("snapshot key:{!r} is not a string.".format(sku))
+			if DELTA_FEED_TYPES[feed_key] == MESSAGE_TYPES['inventory']:
+				text = _quantity_text(snapshot[sku], sku)
+				content = text
+			else:
+				text = _price_text(snapshot[sku], sku)
+				content = text + " " + self.currency
+			content_hash = hashlib.sha1(content.encode('utf8')).hexdigest()
+			if index.get(sku) != content_hash:
+				changes.append((sku, text, content_hash))
+
+		return changes
+
+	def pending(self):
+		"""
+		Gets the submissions awaiting confirmation.
+
+		Returns a ``dict`` mapping the ID (``str``) of each Feed Submission
+		to the number of pending messages (``int``).
+		"""
+		with self._lock:
+			return dict(self._db.execute("SELECT submission_id, COUNT(*) FROM feed_pending GROUP BY submission_id"))
+
+	def submit(self, feeds, feed_type, snapshot, marketplaces=None, debug=None):
+		"""
+		Builds the feed of the SKUs which changed in the snapshot, submits
+		it, and keeps its messages pending until *confirm()*.
+
+		*feeds* (``Feeds``) is the Feeds API.
+
+		*feed_type* (``str``) is the key or value from ``FEED_TYPES`` of a
+		feed type from ``DELTA_FEED_TYPES``.
+
+		*snapshot* (``dict``) maps each SKU (``str``) to its current value.
+		See *diff()*.
+
+		*marketplaces* (**sequence**) optionally contains the ID (``str``)
+		of each Amazon Marketplace to apply the feed to. Default is ``None``
+		for all Amazon Marketplaces.
+
+		Returns the ID (``str``) of the Feed Submission, or ``None`` if no
+		SKUs changed and no feed was submitted.
+		"""
+		if not isinstance(feeds, Feeds):
+			raise TypeError("feeds:{!r} is not a Feeds.".format(feeds))
+
+		feed_key = _feed_key(feed_type)
+		data, messages = self.build(feed_key, snapshot)
+		if data is None:
+			return None
+
+		response = feeds.SubmitFeed(feed_key, data, 'text/xml', marketplaces=marketplaces, debug=debug)
+		submission_id = parse_response(response).findtext('.//FeedSubmissionId')
+		if not submission_id:
+			raise ValueError("SubmitFeed response does not contain a FeedSubmissionId.")
+
+		with self._lock, self._db:
+			self._db.executemany("INSERT OR REPLACE INTO feed_pending (submission_id, message_id, feed_type, sku, content_hash) VALUES (?, ?, ?, ?, ?)", [
+				(submission_id, message_id, feed_key, sku, content_hash) for message_id, sku, content_hash in messages
+			])
+
+		return submission_id
+
+
+def _feed_key(feed_type):
+	"""
+	Gets the key of a delta feed type.
+
+	*feed_type* (``str``) is the key or value from ``FEED_TYPES``.
+
+	Returns the key (``str``) from ``DELTA_FEED_TYPES``.
+	"""
+	for key in DELTA_FEED_TYPES:
+		if feed_type == key or feed_type == FEED_TYPES[key]:
+			return key
+	raise ValueError("feed_type:{!r} is not a delta feed type.".format(feed_type))
+
+def _price_text(value, sku):
+	"""
+	Formats a price for a feed.
+
+	*value* (``float``, ``decimal.Decimal`` or ``str``) is the price.
+
+	*sku* (``str``) is the SKU used when an error occurs.
+
+	Returns the price (``str``) with 2 decimal places.
+	"""
+	try:
+		price = float(value)
+	except (TypeError, ValueError):
+		raise TypeError("snapshot[{!r}]:{!r} is not a price.".format(sku, value))
+	if price < 0:
+		raise ValueError("snapshot[{!r}]:{!r} cannot be negative.".format(sku, value))
+	return "{:.2f}".format(price)
+
+def _quantity_text(value, sku):
+	"""
+	Formats a quantity for a feed.
+
+	*value* (``int``) is the quantity.
+
+	*sku* (``str``) is the SKU used when an error occurs.
+
+	Returns the quantity (``str``).
+	"""
+	if not isinstance(value, six.integer_types) or isinstance(value, bool):
+		raise TypeError("snapshot[{!r}]:{!r} is not an integer.".format(sku, value))
+	elif value < 0:
+		raise ValueError("snapshot[{!r}]:{!r} cannot be negative.".format(sku, value))
+	return str(value)
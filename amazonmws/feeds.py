@@ -13,7 +13,9 @@ __modified_by___ = "Joshua D. Burns"
 import six # Python2/Python3 compatibility library.
 import datetime
 import amazonmws.mws
-from amazonmws.util import datetime_to_iso8601, encode_string, is_sequence, marketplace_args
+import amazonmws.throttle
+from amazonmws.mws import parse_response
+from amazonmws.util import datetime_to_iso8601, element_to_dict, encode_string, is_sequence, marketplace_args
 
 #: Feed types.
 FEED_TYPES = {
@@ -101,6 +103,26 @@ PROCESSING_STATUSES = {
 	'submitted': '_SUBMITTED_'
 }
 
+#: Maximum number of requests before being throttled.
+THROTTLE_MAX_REQUESTS = {
+	'CancelFeedSubmissions': 10,
+	'GetFeedSubmissionCount': 10,
+	'GetFeedSubmissionList': 10,
+	'GetFeedSubmissionListByNextToken': 30,
+	'GetFeedSubmissionResult': 15,
+	'SubmitFeed': 15,
+}
+
+#: The number of seconds it takes to restore 1 request from the quota.
+THROTTLE_RESTORE_RATES = {
+	'CancelFeedSubmissions': 45,
+	'GetFeedSubmissionCount': 45,
+	'GetFeedSubmissionList': 45,
+	'GetFeedSubmissionListByNextToken': 2,
+	'GetFeedSubmissionResult': 60,
+	'SubmitFeed': 120,
+}
+
 
 class Feeds(amazonmws.mws.MWS):
 	"""
@@ -120,6 +142,17 @@ class Feeds(amazonmws.mws.MWS):
 	implemented.
 	"""
 
+	def get_throttle(self, action):
+		"""
+		Gets the throttle shared by all requests for the specified action.
+
+		*action* (``str``) is the Feeds API action (e.g.,
+		"GetFeedSubmissionList") from ``THROTTLE_MAX_REQUESTS``.
+
+		Returns the throttle (``amazonmws.throttle.Throttle``).
+		"""
+		return amazonmws.throttle.get_throttle(self, action, THROTTLE_MAX_REQUESTS[action], THROTTLE_RESTORE_RATES[action])
+
 	def new_args(self):
 		"""
 		Returns a new ``dict`` of default arguments.
@@ -437,6 +470,54 @@ def feed_type_args(feed_types, name=None):
 
 	return args
 
+def parse_feed_submissions(data):
+	"""
+	Parses the Feed Submissions from a GetFeedSubmissionList or
+	GetFeedSubmissionListByNextToken response.
+
+	*data* (``str``) is the response XML.
+
+	Returns a ``tuple`` containing: the ``list`` of each Feed Submission
+	(``dict``) mapping each FeedSubmissionInfo field (e.g.,
+	"FeedSubmissionId", "FeedType", "SubmittedDate",
+	"FeedProcessingStatus") to its value (``str``), and the next token
+	(``str``) if there are more Feed Submissions; otherwise, ``None``.
+	"""
+	root = parse_response(data)
+	infos = [element_to_dict(elem) for elem in root.iter('FeedSubmissionInfo')]
+	next_token = root.findtext('.//NextToken') if root.findtext('.//HasNext') == 'true' else None
+	return infos, next_token or None
+
+def parse_processing_report(data):
+	"""
+	Parses the Feed Processing Report from a GetFeedSubmissionResult
+	response.
+
+	*data* (``str``) is the response XML.
+
+	Returns the report (``dict``) containing: "status" (``str``), the
+	StatusCode (e.g., "Complete"); "processed", "successful", "errors"
+	and "warnings" (``int``), the counts from the ProcessingSummary; and
+	"results" (``list``) of each Result (``dict``) mapping each field
+	(e.g., "MessageID", "ResultCode", "ResultDescription") to its value.
+	"""
+	root = parse_response(data)
+	report = root if root.tag == 'ProcessingReport' else root.find('.//ProcessingReport')
+	if report is None:
+		raise ValueError("data does not contain a ProcessingReport.")
+
+	def count(field):
+		return int(report.findtext('ProcessingSummary/' + field) or 0)
+
+	return {
+		'status': report.findtext('StatusCode'),
+		'processed': count('MessagesProcessed'),
+		'successful': count('MessagesSuccessful'),
+		'errors': count('MessagesWithError'),
+		'warnings': count('MessagesWithWarning'),
+		'results': [element_to_dict(elem) for elem in report.findall('Result')],
+	}
+
 def status_args(statuses, name=None):
 	"""
 	Converts the specified Feed Processing Statuses into their respective
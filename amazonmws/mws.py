@@ -21,7 +21,7 @@ import sys
 import urllib
 
 from amazonmws import __version__
-from amazonmws.util import is_sequence
+from amazonmws.util import is_sequence, parse_xml
 
 #: MWS API Endpoints
 ENDPOINTS = {
@@ -48,6 +48,25 @@ MARKETPLACE_IDS = {
 	'uk': 'A1F83G8C2ARO7P', # United Kingdom
 }
 
+#: Maps each marketplace (key from ``MARKETPLACE_IDS``) to its region
+#: (key from ``ENDPOINTS``).
+MARKETPLACE_REGIONS = {
+	'ca': 'ca',
+	'cn': 'cn',
+	'in': 'in',
+	'jp': 'jp',
+	'us': 'us',
+	# Europe
+	'de': 'eu',
+	'es': 'eu',
+	'fr': 'eu',
+	'it': 'eu',
+	'uk': 'eu',
+}
+
+#: Maps each Marketplace ID to its key from ``MARKETPLACE_IDS``.
+_MARKETPLACE_KEYS = {marketplace_id: key for key, marketplace_id in six.iteritems(MARKETPLACE_IDS)}
+
 #: Envelope message types.
 MESSAGE_TYPES = {
 	'cat_pil': 'CatPIL',
@@ -779,6 +798,95 @@ class MWSAgent(IMWSAgent):
 		#return [int(s) if s.isdigit() else s for s in self.sort_args_re.findall(key[0])] # Natural sort
 
 
+def group_marketplaces(marketplaces):
+	"""
+	Groups the specified marketplaces by their region.
+
+	*marketplaces* (**iterable**) contains each marketplace (``str``).
+	This can contain any keys or values from ``MARKETPLACE_IDS``.
+
+	Returns a ``dict`` mapping each region (``str``) from ``ENDPOINTS`` to
+	the ``list`` of each of its Marketplace IDs (``str``), in the order
+	they were specified.
+	"""
+	regions = {}
+	for marketplace in marketplaces:
+		if not isinstance(marketplace, six.string_types):
+			raise TypeError("marketplace:{!r} is not a string.".format(marketplace))
+		marketplace_id = MARKETPLACE_IDS.get(marketplace, marketplace)
+		region = MARKETPLACE_REGIONS.get(_MARKETPLACE_KEYS.get(marketplace_id))
+		if region is None:
+			raise ValueError("marketplace:{!r} is not a known marketplace.".format(marketplace))
+		region_ids = regions.setdefault(region, [])
+		if marketplace_id not in region_ids:
+			region_ids.append(marketplace_id)
+	return regions
+
+def parse_response(data):
+	"""
+	Parses the specified Amazon MWS response.
+
+	*data* (``str``) is the response XML.
+
+	Raises ``MWSError`` if the response is an error response.
+
+	Returns the root element (``xml.etree.ElementTree.Element``) with all
+	namespaces stripped from the element tags.
+	"""
+	root = parse_xml(data)
+	if root.tag == 'ErrorResponse':
+		error = root.find('Error')
+		raise MWSError(
+			error.findtext('Code') if error is not None else None,
+			error.findtext('Message') if error is not None else None,
+			type_=error.findtext('Type') if error is not None else None,
+			request_id=root.findtext('RequestID') or root.findtext('RequestId'),
+		)
+	return root
+
+
+class MWSError(Exception):
+	"""
+	The `MWSError` exception is raised when Amazon MWS responds with an
+	error.
+	"""
+
+	def __init__(self, code, message, type_=None, request_id=None):
+		"""
+		Initializes the ``MWSError`` instance.
+
+		*code* (``str``) is the error code (e.g., "RequestThrottled").
+
+		*message* (``str``) is the error message.
+
+		*type_* (``str``) optionally is the error type: "Sender" or
+		"Server".
+
+		*request_id* (``str``) optionally is the ID of the failed request.
+		"""
+		super(MWSError, self).__init__("{}: {}".format(code, message))
+
+		self.code = code
+		"""
+		*code* (``str``) is the error code.
+		"""
+
+		self.message = message
+		"""
+		*message* (``str``) is the error message.
+		"""
+
+		self.type = type_
+		"""
+		*type* (``str``) is the error type.
+		"""
+
+		self.request_id = request_id
+		"""
+		*request_id* (``str``) is the ID of the failed request.
+		"""
+
+
 class SignatureError(Exception):
 	"""
 	The `SignatureError` exception is raised when there is an error
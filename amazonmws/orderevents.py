@@ -0,0 +1,400 @@
+# coding: utf-8
+"""
+This module provides a change-data-capture stream for the Orders synced
+from the Amazon MWS Orders API. Each Order is diffed against its last
+known state using a per-Order content hash, and typed change events are
+emitted to a sink so that consumers only process the changes.
+"""
+
+__created__ = "2026-10-19"
+__modified__ = "2026-10-19"
+
+import six # Python2/Python3 compatibility library.
+import hashlib
+import json
+import threading
+from amazonmws.util import SQLiteStore
+
+#: The event emitted for an Order seen for the first time.
+ORDER_CREATED = 'order_created'
+
+#: The event emitted for an Order whose OrderStatus changed.
+STATUS_CHANGED = 'status_changed'
+
+#: The event emitted for an Order Item seen for the first time.
+ITEM_ADDED = 'item_added'
+
+#: The event emitted for an Order Item which changed.
+ITEM_UPDATED = 'item_updated'
+
+#: The event emitted for an Order whose shipment state changed.
+SHIPMENT_UPDATED = 'shipment_updated'
+
+#: The event emitted for an Order which changed in any other way.
+ORDER_UPDATED = 'order_updated'
+
+#: The Order fields which make up the shipment state of an Order.
+SHIPMENT_FIELDS = (
+	'EasyShipShipmentStatus',
+	'FulfillmentChannel',
+	'NumberOfItemsShipped',
+	'NumberOfItemsUnshipped',
+	'ShipServiceLevel',
+	'ShipmentServiceLevelCategory',
+	'TFMShipmentStatus',
+)
+
+#: The SQL statements used to create the state tables.
+SCHEMA = (
+	"""
+	CREATE TABLE IF NOT EXISTS order_states (
+		seller_id TEXT NOT NULL,
+		order_id TEXT NOT NULL,
+		content_hash TEXT NOT NULL,
+		order_status TEXT,
+		shipment_hash TEXT NOT NULL,
+		item_hashes TEXT,
+		PRIMARY KEY (seller_id, order_id)
+	)
+	""",
+)
+
+
+class IEventSink(object):
+	"""
+	The ``IEventSink`` class is the interface used to receive the change
+	events of Orders.
+	"""
+
+	def close(self):
+		"""
+		Releases any resources held by the sink.
+		"""
+		pass
+
+	def emit(self, events):
+		"""
+		Receives change events.
+
+		*events* (``list``) contains each event (``dict``). See
+		*OrderChangeTracker.diff()*.
+		"""
+		raise NotImplementedError("{}.{} must implement emit().".format(self.__class__.__module__, self.__class__.__name__))
+
+
+class CallbackSink(IEventSink):
+	"""
+	The ``CallbackSink`` class passes each change event to a callback.
+	"""
+
+	def __init__(self, callback):
+		"""
+		Initializes the ``CallbackSink`` instance.
+
+		*callback* (**callable**) is called with each event (``dict``).
+		"""
+		if not callable(callback):
+			raise TypeError("callback:{!r} is not callable.".format(callback))
+
+		self.callback = callback
+		"""
+		*callback* (**callable**) is called with each event.
+		"""
+
+	def emit(self, events):
+		"""
+		Passes each event to the callback.
+
+		*events* (``list``) contains each event (``dict``).
+		"""
+		for event in events:
+			self.callback(event)
+
+
+class NDJSONSink(IEventSink):
+	"""
+	The ``NDJSONSink`` class appends each change event as a line of JSON
+	to a file.
+	"""
+
+	def __init__(self, path):
+		"""
+		Initializes the ``NDJSONSink`` instance.
+
+		*path* (``str``) is the path of the file to append to.
+		"""
+		if not isinstance(path, six.string_types):
+			raise TypeError("path:{!r} is not a string.".format(path))
+
+		self.path = path
+		"""
+		*path* (``str``) is the path of the file appended to.
+		"""
+
+		self._file = open(path, 'a')
+		"""
+		*_file* (``file``) is the file appended to.
+		"""
+
+		self._lock = threading.Lock()
+		"""
+		*_lock* (``threading.Lock``) synchronizes writes to *_file*.
+		"""
+
+	def close(self):
+		"""
+		Closes the file.
+		"""
+		with self._lock:
+			self._file.close()
+
+	def emit(self, events):
+		"""
+		Appends each event to the file, and flushes it.
+
+		*events* (``list``) contains each event (``dict``).
+		"""
+		data = "".join(json.dumps(event, sort_keys=True) + "\n" for event in events)
+		with self._lock:
+			self._file.write(data)
+			self._file.flush()
+
+
+class QueueSink(IEventSink):
+	"""
+	The ``QueueSink`` class puts each change event onto a queue.
+	"""
+
+	def __init__(self, queue):
+		"""
+		Initializes the ``QueueSink`` instance.
+
+		*queue* (``queue.Queue``) is the queue to put events onto. Any
+		object with a ``put()`` method can be used.
+		"""
+		if not callable(getattr(queue, 'put', None)):
+			raise TypeError("queue:{!r} does not have a put() method.".format(queue))
+
+		self.queue = queue
+		"""
+		*queue* (``queue.Queue``) is the queue events are put onto.
+		"""
+
+	def emit(self, events):
+		"""
+		Puts each event onto the queue.
+
+		*events* (``list``) contains each event (``dict``).
+		"""
+		for event in events:
+			self.queue.put(event)
+
+
+class OrderChangeTracker(SQLiteStore):
+	"""
+	The ``OrderChangeTracker`` class diffs Orders against their last known
+	state and emits typed change events to a sink. The state of each Order
+	is persisted as content hashes so Orders which have not changed are
+	skipped with a single lookup.
+
+	Events are emitted before the new state is recorded, so an event may
+	be emitted again if the process stops in between (at-least-once).
+	"""
+
+	def __init__(self, seller_id, sink, path=None, batch_size=None):
+		"""
+		Initializes the ``OrderChangeTracker`` instance.
+
+		*seller_id* (``str``) is the Merchant ID of the Orders.
+
+		*sink* (``IEventSink``) receives the change events.
+
+		*path* (``str``) is the path of the SQLite database file used to
+		persist the Order states. Default is ``None`` for ":memory:" to not
+		persist them.
+
+		*batch_size* (``int``) is the number of Orders diffed and recorded
+		together by *process()*. Default is ``None`` for 100.
+		"""
+		if not isinstance(seller_id, six.string_types):
+			raise TypeError("seller_id:{!r} is not a string.".format(seller_id))
+
+		if not isinstance(sink, IEventSink):
+			raise TypeError("sink:{!r} is not an IEventSink.".format(sink))
+
+		if batch_size is None:
+			batch_size = 100
+		elif not isinstance(batch_size, six.integer_types):
+			raise TypeError("batch_size:{!r} is not an integer.".format(batch_size))
+		elif batch_size < 1:
+			raise ValueError("batch_size:{!r} cannot be less than 1.".format(batch_size))
+
+		self.batch_size = batch_size
+		"""
+		*batch_size* (``int``) is the number of Orders diffed and recorded
+		together.
+		"""
+
+		self.seller_id = seller_id
+		"""
+		*seller_id* (``str``) is the Merchant ID of the Orders.
+		"""
+
+		self.sink = sink
+		"""
+		*sink* (``IEventSink``) receives the change events.
+		"""
+
+		SQLiteStore.__init__(self, path, SCHEMA)
+
+	def diff(self, orders):
+		"""
+		Diffs the specified Orders against their last known state. The state
+		is not updated.
+
+		*orders* (**sequence**) contains each Order. This can be either the
+		Order (``dict``) as returned by *amazonmws.orders.parse_orders()*, or
+		a ``tuple`` containing: the Order (``dict``), and the **sequence** of
+		all of its Order Items (``dict``) as returned by
+		*amazonmws.orders.parse_order_items()*. Order Items are only diffed
+		when they are included.
+
+		Returns a ``tuple`` containing: the ``list`` of each event (``dict``),
+		and the ``list`` of each new state row (``tuple``) to record. Each
+		event contains: "type" (``str``), "seller_id" (``str``), "order_id"
+		(``str``), "last_update_date" (``str``), and either "order"
+		(``dict``), "item" (``dict``), "old_status" and "new_status"
+		(``str``), or "shipment" (``dict``) depending on the type.
+		"""
+		entries = []
+		for entry in orders:
+			if isinstance(entry, dict):
+				entries.append((entry, None))
+			else:
+				order, items = entry
+				entries.append((order, list(items) if items is not None else None))
+
+		if not entries:
+			return [], []
+
+		order_ids = [order['AmazonOrderId'] for order, _items in entries]
+		sql = "SELECT order_id, content_hash, order_status, shipment_hash, item_hashes FROM order_states WHERE seller_id = ? AND order_id IN ({})".format(", ".join("?" * len(order_ids)))
+		with self._lock:
+			states = {row[0]: row[1:] for row in self._db.execute(sql, [self.seller_id] + order_ids)}
+
+		events = []
+		rows = []
+		for order, items in entries:
+			order_id = order['AmazonOrderId']
+			state = states.get(order_id)
+			old_items = json.loads(state[3]) if state and state[3] else None
+			if items is not None:
+				item_hashes = {item['OrderItemId']: _hash(item) for item in items}
+			else:
+				item_hashes = old_items
+
+			content_hash = _hash([order, item_hashes])
+			if state and state[0] == content_hash:
+				continue
+
+			shipment = {field: order[field] for field in SHIPMENT_FIELDS if field in order}
+			shipment_hash = _hash(shipment)
+			order_status = order.get('OrderStatus') or None
+			rows.append((self.seller_id, order_id, content_hash, order_status, shipment_hash, json.dumps(item_hashes, sort_keys=True) if item_hashes is not None else None))
+			states[order_id] = rows[-1][2:]
+
+			base = {
+				'seller_id': self.seller_id,
+				'order_id': order_id,
+				'last_update_date': order.get('LastUpdateDate'),
+			}
+
+			def event(type_, **fields):
+				result = {'type': type_}
+				result.update(base)
+				result.update(fields)
+				events.append(result)
+
+			if not state:
+				event(ORDER_CREATED, order=order)
+				for item in items or ():
+					event(ITEM_ADDED, item=item)
+				continue
+
+			_content_hash, old_status, old_shipment_hash, _item_hashes = state
+			changed = False
+			if order_status != old_status:
+				event(STATUS_CHANGED, old_status=old_status, new_status=order_status, order=order)
+				changed = True
+
+			if items is not None:
+				for item in items:
+					item_id = item['OrderItemId']
+					old_hash = old_items.get(item_id) if old_items is not None else None
+					if old_hash is None:
+						event(ITEM_ADDED, item=item)
+						changed = True
+					elif old_hash != item_hashes[item_id]:
+						event(ITEM_UPDATED, item=item)
+						changed = True
+
+			if shipment_hash != old_shipment_hash:
+				event(SHIPMENT_UPDATED, shipment=shipment)
+				changed = True
+
+			if not changed:
+				event(ORDER_UPDATED, order=order)
+
+		return events, rows
+
+	def process(self, orders):
+		"""
+		Diffs the specified Orders in batches, emits the change events to the
+		sink, and records the new state of the Orders.
+
+		*orders* (**iterable**) contains each Order or ``tuple`` of Order and
+		Order Items. See *diff()*. This is consumed lazily, so the Orders
+		yielded by *amazonmws.ordersync.OrderSync.sync()* can be passed
+		directly.
+
+		Returns the number of events emitted (``int``).
+		"""
+		count = 0
+		batch = []
+		for entry in orders:
+			batch.append(entry)
+			if len(batch) >= self.batch_size:
+				count += self._process_batch(batch)
+				batch = []
+		if batch:
+			count += self._process_batch(batch)
+		return count
+
+	def _process_batch(self, orders):
+		"""
+		Diffs the batch of Orders, emits the change events, and records the
+		new state of the Orders.
+
+		*orders* (``list``) contains each Order or ``tuple`` of Order and
+		Order Items.
+
+		Returns the number of events emitted (``int``).
+		"""
+		events, rows = self.diff(orders)
+		if events:
+			self.sink.emit(events)
+		if rows:
+			with self._lock, self._db:
+				self._db.executemany("INSERT OR REPLACE INTO order_states (seller_id, order_id, content_hash, order_status, shipment_hash, item_hashes) VALUES (?, ?, ?, ?, ?, ?)", rows)
+		return len(events)
+
+
+def _hash(value):
+	"""
+	Hashes the specified value.
+
+	*value* is the JSON serializable value.
+
+	Returns the hash (``str``).
+	"""
+	return hashlib.sha1(json.dumps(value, sort_keys=True).encode('utf8')).hexdigest()
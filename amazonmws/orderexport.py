@@ -0,0 +1,392 @@
+# coding: utf-8
+"""
+This module provides a streaming export of Orders and Order Items from
+Amazon MWS Orders API responses to NDJSON or CSV files. Only the
+projected columns are extracted from each response page, and rows are
+written through buffered, optionally compressed, size rotated files so
+that no more than one page is held in memory.
+"""
+
+__created__ = "2026-10-19"
+__modified__ = "2026-10-19"
+
+import six # Python2/Python3 compatibility library.
+import csv
+import gzip
+import io
+import json
+import threading
+from amazonmws.mws import parse_response
+from amazonmws.orders import Orders
+from amazonmws.throttle import run_throttled
+
+#: Export formats.
+FORMATS = ('csv', 'ndjson')
+
+#: The default columns exported for each Order. Each column is the path
+#: of the field relative to the Order element.
+ORDER_COLUMNS = (
+	'AmazonOrderId',
+	'SellerOrderId',
+	'PurchaseDate',
+	'LastUpdateDate',
+	'OrderStatus',
+	'FulfillmentChannel',
+	'SalesChannel',
+	'MarketplaceId',
+	'OrderType',
+	'ShipServiceLevel',
+	'ShipmentServiceLevelCategory',
+	'NumberOfItemsShipped',
+	'NumberOfItemsUnshipped',
+	'PaymentMethod',
+	'OrderTotal/CurrencyCode',
+	'OrderTotal/Amount',
+	'ShippingAddress/City',
+	'ShippingAddress/StateOrRegion',
+	'ShippingAddress/PostalCode',
+	'ShippingAddress/CountryCode',
+	'IsPrime',
+	'IsBusinessOrder',
+)
+
+#: The default columns exported for each Order Item. Each column is the
+#: path of the field relative to the OrderItem element, or relative to
+#: the response when prefixed with "//".
+ORDER_ITEM_COLUMNS = (
+	'//AmazonOrderId',
+	'OrderItemId',
+	'ASIN',
+	'SellerSKU',
+	'Title',
+	'QuantityOrdered',
+	'QuantityShipped',
+	'ItemPrice/CurrencyCode',
+	'ItemPrice/Amount',
+	'ItemTax/Amount',
+	'ShippingPrice/Amount',
+	'ShippingTax/Amount',
+	'PromotionDiscount/Amount',
+	'ConditionId',
+)
+
+
+class ExportWriter(object):
+	"""
+	The ``ExportWriter`` class writes rows of a fixed set of columns to
+	NDJSON or CSV files. Writes are buffered, optionally gzip compressed,
+	and rotated to a new file once a file reaches its maximum size.
+	"""
+
+	def __init__(self, path, columns, file_format=None, compress=None, max_size=None, buffer_size=None):
+		"""
+		Initializes the ``ExportWriter`` instance.
+
+		*path* (``str``) is the path of the file to write. When *max_size*
+		is set, this must contain a "{}" placeholder which is formatted with
+		the file number (``int``) starting at 1 (e.g., "orders-{:04d}.csv").
+
+		*columns* (**sequence**) contains each column (``str``). The header
+		(CSV) and key (NDJSON) of a column is its path with any leading "/"
+		removed and "/" replaced by ".".
+
+		*file_format* (``str``) is the export format from ``FORMATS``.
+		Default is ``None`` for "ndjson".
+
+		*compress* (``bool``) is whether the files are gzip compressed.
+		Default is ``None`` for ``False``.
+
+		*max_size* (``int``) is the maximum number of (uncompressed) bytes
+		written to a file before rotating to the next file. Default is
+		``None`` to never rotate.
+
+		*buffer_size* (``int``) is the size of the write buffer in bytes.
+		Default is ``None`` for 65536 (64 KiB).
+		"""
+		if not isinstance(path, six.string_types):
+			raise TypeError("path:{!r} is not a string.".format(path))
+
+		if isinstance(columns, six.string_types):
+			raise TypeError("columns:{!r} is not a sequence.".format(columns))
+		columns = tuple(columns)
+		if not columns:
+			raise ValueError("columns:{!r} cannot be empty.".format(columns))
+
+		if file_format is None:
+			file_format = 'ndjson'
+		elif file_format not in FORMATS:
+			raise ValueError("file_format:{!r} is not one of {!r}.".format(file_format, FORMATS))
+
+		if max_size is not None:
+			if not isinstance(max_size, six.integer_types):
+				raise TypeError("max_size:{!r} is not an integer.".format(max_size))
+			elif max_size < 1:
+				raise ValueError("max_size:{!r} cannot be less than 1.".format(max_size))
+			elif path.format(1) == path:
+				raise ValueError("path:{!r} must contain a placeholder when rotating files.".format(path))
+
+		if buffer_size is None:
+			buffer_size = 65536
+		elif not isinstance(buffer_size, six.integer_types):
+			raise TypeError("buffer_size:{!r} is not an integer.".format(buffer_size))
+
+		self.buffer_size = buffer_size
+		"""
+		*buffer_size* (``int``) is the size of the write buffer in bytes.
+		"""
+
+		self.columns = columns
+		"""
+		*columns* (``tuple``) contains each column (``str``).
+		"""
+
+		self.compress = bool(compress)
+		"""
+		*compress* (``bool``) is whether the files are gzip compressed.
+		"""
+
+		self.file_format = file_format
+		"""
+		*file_format* (``str``) is the export format.
+		"""
+
+		self.max_size = max_size
+		"""
+		*max_size* (``int``) is the maximum number of bytes written to a file,
+		or ``None`` to never rotate.
+		"""
+
+		self.names = tuple(column.lstrip('/').replace('/', '.') for column in columns)
+		"""
+		*names* (``tuple``) contains the header or key (``str``) of each
+		column.
+		"""
+
+		self.path = path
+		"""
+		*path* (``str``) is the path of the file to write.
+		"""
+
+		self.paths = []
+		"""
+		*paths* (``list``) contains the path (``str``) of each file written.
+		"""
+
+		self.rows = 0
+		"""
+		*rows* (``int``) is the number of rows written.
+		"""
+
+		self._csv = None
+		"""
+		*_csv* (``csv.writer``) formats CSV rows into *_csv_buffer*.
+		"""
+
+		self._csv_buffer = None
+		"""
+		*_csv_buffer* (``StringIO``) receives each formatted CSV row.
+		"""
+
+		self._file = None
+		"""
+		*_file* (``file``) is the file currently being written.
+		"""
+
+		self._raw = None
+		"""
+		*_raw* (``file``) is the underlying file of *_file* when compressing.
+		"""
+
+		self._size = 0
+		"""
+		*_size* (``int``) is the number of bytes written to *_file*.
+		"""
+
+		if file_format == 'csv':
+			self._csv_buffer = six.StringIO()
+			self._csv = csv.writer(self._csv_buffer, lineterminator='\n')
+
+	def close(self):
+		"""
+		Flushes and closes the current file.
+		"""
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+		if self._raw is not None:
+			self._raw.close()
+			self._raw = None
+
+	def _encode_row(self, row):
+		"""
+		Formats the row.
+
+		*row* (**sequence**) contains the value of each column.
+
+		Returns the formatted row (``bytes``).
+		"""
+		if self._csv is not None:
+			self._csv_buffer.seek(0)
+			self._csv_buffer.truncate()
+			self._csv.writerow(['' if value is None else value for value in row])
+			data = self._csv_buffer.getvalue()
+		else:
+			data = json.dumps(dict(zip(self.names, row)), sort_keys=True) + "\n"
+
+		if isinstance(data, six.text_type):
+			data = data.encode('utf8')
+		return data
+
+	def _open(self):
+		"""
+		Opens the next file, and writes the CSV header.
+		"""
+		path = self.path.format(len(self.paths) + 1) if self.max_size is not None else self.path
+		self._file = io.open(path, 'wb', buffering=self.buffer_size)
+		if self.compress:
+			# GzipFile does not close the file it wraps.
+			self._raw = self._file
+			self._file = gzip.GzipFile(filename='', mode='wb', fileobj=self._raw)
+		self._size = 0
+		self.paths.append(path)
+
+		if self._csv is not None:
+			header = self._encode_row(self.names)
+			self._file.write(header)
+			self._size += len(header)
+
+	def write(self, row):
+		"""
+		Writes a row.
+
+		*row* (**sequence**) contains the value (``str`` or ``None``) of
+		each column.
+		"""
+		data = self._encode_row(row)
+		if self._file is None:
+			self._open()
+		elif self.max_size is not None and self._size + len(data) > self.max_size and self._size:
+			self.close()
+			self._open()
+
+		self._file.write(data)
+		self._size += len(data)
+		self.rows += 1
+
+
+def export_order_items(orders, order_ids, writer, workers=None):
+	"""
+	Exports the Order Items of the specified Orders. The Order Items are
+	listed concurrently within the ListOrderItems quota, and each page is
+	written as soon as it is received.
+
+	*orders* (``Orders``) is the Orders API used to list Order Items.
+
+	*order_ids* (**iterable**) contains each Amazon Order ID (``str``).
+	This is consumed lazily.
+
+	*writer* (``ExportWriter``) writes the rows. Its columns should be
+	relative to the OrderItem element (see ``ORDER_ITEM_COLUMNS``).
+
+	*workers* (``int``) is the number of Orders to list concurrently.
+	Default is ``None`` for the ListOrderItems quota.
+
+	Returns a ``dict`` mapping the Amazon Order ID (``str``) of each Order
+	whose Order Items could not be listed to the error (``Exception``).
+	The pages of an Order received before the error have been written.
+	"""
+	if not isinstance(orders, Orders):
+		raise TypeError("orders:{!r} is not an Orders.".format(orders))
+
+	throttle = orders.get_throttle('ListOrderItems')
+	writer_lock = threading.Lock()
+
+	def list_items(order_id):
+		# This is called within the throttled call of the first page.
+		root = parse_response(orders.ListOrderItems(AmazonOrderId=order_id))
+		while True:
+			with writer_lock:
+				_, next_token = _export_root(root, writer, 'OrderItem')
+			if not next_token:
+				break
+			root = throttle.call(lambda: parse_response(orders.ListOrderItemsByNextToken(NextToken=next_token)))
+
+	errors = {}
+	for order_id, _result, error in run_throttled(list_items, order_ids, throttle=throttle, workers=workers):
+		if error is not None:
+			errors[order_id] = error
+
+	return errors
+
+def export_orders(orders, writer, **kwargs):
+	"""
+	Lists the Orders that match the criteria, following the NextToken to
+	completion, and exports each page as it is received.
+
+	*orders* (``Orders``) is the Orders API used to list Orders.
+
+	*writer* (``ExportWriter``) writes the rows. Its columns should be
+	relative to the Order element (see ``ORDER_COLUMNS``).
+
+	*kwargs* contains the ListOrders arguments (e.g., "CreatedAfter",
+	"LastUpdatedAfter", "OrderStatus").
+
+	Returns the number of Orders exported (``int``).
+	"""
+	if not isinstance(orders, Orders):
+		raise TypeError("orders:{!r} is not an Orders.".format(orders))
+
+	throttle = orders.get_throttle('ListOrders')
+	root = throttle.call(lambda: parse_response(orders.ListOrders(**kwargs)))
+	count = 0
+	while True:
+		rows, next_token = _export_root(root, writer, 'Order')
+		count += rows
+		if not next_token:
+			break
+		root = throttle.call(lambda: parse_response(orders.ListOrdersByNextToken(NextToken=next_token)))
+
+	return count
+
+def export_response(data, writer, record):
+	"""
+	Exports the records of a response. The columns of the writer are
+	extracted directly from the response XML without converting each
+	record into a ``dict``.
+
+	*data* (``str``) is the response XML.
+
+	*writer* (``ExportWriter``) writes the rows.
+
+	*record* (``str``) is the tag of the record elements (e.g., "Order" or
+	"OrderItem").
+
+	Returns a ``tuple`` containing: the number of records exported
+	(``int``), and the next token (``str``) if there are more records or
+	``None``.
+	"""
+	return _export_root(parse_response(data), writer, record)
+
+def _export_root(root, writer, record):
+	"""
+	Exports the records of a parsed response.
+
+	*root* (``xml.etree.ElementTree.Element``) is the root element of the
+	response.
+
+	See *export_response()* for the other arguments and the return value.
+	"""
+	getters = []
+	for column in writer.columns:
+		if column.startswith('//'):
+			value = root.findtext('.' + column)
+			getters.append(lambda elem, value=value: value)
+		else:
+			getters.append(lambda elem, column=column: elem.findtext(column))
+
+	count = 0
+	for elem in root.iter(record):
+		writer.write([getter(elem) for getter in getters])
+		count += 1
+
+	return count, root.findtext('.//NextToken') or None
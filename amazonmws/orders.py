@@ -27,8 +27,9 @@ __modified__ = "2016-03-29"
 __modified_by___ = "Joshua D. Burns"
 
 import six # Python2/Python3 compatibility library.
-from amazonmws.mws import MWS, MARKETPLACE_IDS # The MWS connection logic
-from amazonmws.util import datetime_to_iso8601, is_sequence
+import amazonmws.throttle
+from amazonmws.mws import MWS, ENDPOINTS, MARKETPLACE_IDS, group_marketplaces, parse_response # The MWS connection logic
+from amazonmws.util import datetime_to_iso8601, element_to_dict, is_sequence
 import datetime
 import re
 
@@ -43,6 +44,116 @@ ORDER_STATUSES = {
 	'unshipped': 'Unshipped',
 }
 
+#: Maximum number of requests before being throttled.
+THROTTLE_MAX_REQUESTS = {
+	'GetOrder': 6,
+	'GetServiceStatus': 2,
+	'ListOrderItems': 30,
+	'ListOrders': 6,
+}
+
+#: The number of seconds it takes to restore 1 request from the quota.
+#: The "ByNextToken" actions share the quota of their base action.
+THROTTLE_RESTORE_RATES = {
+	'GetOrder': 60,
+	'GetServiceStatus': 300,
+	'ListOrderItems': 2,
+	'ListOrders': 60,
+}
+
+#: The arguments of each Orders API action. Each argument maps to its
+#: type: "str", "int", "date", or a ``tuple`` containing "list" and the
+#: item name used to flatten the list (e.g., "MarketplaceId" is sent as
+#: "MarketplaceId.Id.1", "MarketplaceId.Id.2", etc.).
+ACTION_ARGS = {
+	'GetOrder': {
+		'AmazonOrderId': ('list', 'Id'),
+	},
+	'GetServiceStatus': {},
+	'ListOrderItems': {
+		'AmazonOrderId': 'str',
+	},
+	'ListOrderItemsByNextToken': {
+		'NextToken': 'str',
+	},
+	'ListOrders': {
+		'BuyerEmail': 'str',
+		'CreatedAfter': 'date',
+		'CreatedBefore': 'date',
+		'EasyShipShipmentStatus': ('list', 'Status'),
+		'FulfillmentChannel': ('list', 'Channel'),
+		'LastUpdatedAfter': 'date',
+		'LastUpdatedBefore': 'date',
+		'MarketplaceId': ('list', 'Id'),
+		'MaxResultsPerPage': 'int',
+		'OrderStatus': ('list', 'Status'),
+		'PaymentMethod': ('list', 'Method'),
+		'SellerOrderId': 'str',
+		'TFMShipmentStatus': ('list', 'Status'),
+	},
+	'ListOrdersByNextToken': {
+		'NextToken': 'str',
+	},
+}
+
+#: The arguments common to every Orders API action.
+COMMON_ARGS = {
+	'AWSAccessKeyId': 'str',
+	'MWSAuthToken': 'str',
+	'SellerId': 'str',
+	'Timestamp': 'str',
+	'Version': 'str',
+}
+
+#: The maximum number of values a list argument can be flattened into
+#: using precomputed keys.
+MAX_LIST_ARGS = 100
+
+#: Maps each endpoint URL to its region key from ``ENDPOINTS``.
+_ENDPOINT_REGIONS = {endpoint: region for region, endpoint in six.iteritems(ENDPOINTS)}
+
+#: Compiled argument types.
+_DATE_ARG = 'date'
+_INT_ARG = 'int'
+_LIST_ARG = 'list'
+_STR_ARG = 'str'
+
+#: The base keys of generically flattened list arguments (see
+#: ``Orders._get_key()``).
+_list_keys = {}
+
+def _compile_schemas(action_args, common_args):
+	"""
+	Compiles the argument schema of each action.
+
+	*action_args* (``dict``) maps each action (``str``) to its arguments
+	(``dict``). See ``ACTION_ARGS``.
+
+	*common_args* (``dict``) contains the arguments common to every
+	action.
+
+	Returns a ``dict`` mapping each action (``str``) to its compiled
+	schema (``dict``) which maps each argument (``str``) to a ``tuple``
+	containing: the argument type (``str``), and for list arguments the
+	``list`` of each flattened key (``str``); otherwise, ``None``.
+	"""
+	schemas = {}
+	for action, args in six.iteritems(action_args):
+		schema = {}
+		for key, kind in list(six.iteritems(common_args)) + list(six.iteritems(args)):
+			if isinstance(kind, tuple):
+				item = kind[1]
+				schema[key] = (_LIST_ARG, ["{}.{}.{}".format(key, item, i) for i in six.moves.range(1, MAX_LIST_ARGS + 1)])
+			elif kind in (_DATE_ARG, _INT_ARG, _STR_ARG):
+				schema[key] = (kind, None)
+			else:
+				raise ValueError("{} {}:{!r} is not a valid argument type.".format(action, key, kind))
+		schemas[action] = schema
+	return schemas
+
+#: The compiled argument schema of each action in ``ACTION_ARGS``.
+_ACTION_SCHEMAS = _compile_schemas(ACTION_ARGS, COMMON_ARGS)
+
 # DEPRECATED. Remove in version 2.0.
 class UnsupportedActionError(Exception):
 	'''
@@ -92,17 +203,135 @@ class Orders( MWS ):
 	def __init__(self, *args, **kwargs):
 		MWS.__init__(self, *args, **kwargs)
 
+	def for_region(self, region):
+		"""
+		Creates an Orders API instance for a region using the same
+		credentials and agent.
+
+		*region* (``str``) is the region key from ``ENDPOINTS``.
+
+		Returns the Orders API instance (``Orders``).
+		"""
+		if region not in ENDPOINTS:
+			raise ValueError("region:{!r} is not a key from ENDPOINTS.".format(region))
+		return self.__class__(self.access_key, self.secret_key, self.merchant_id, region, agent=self.agent, user_agent=self.user_agent)
+
+	def get_throttle(self, action):
+		"""
+		Gets the throttle shared by all requests for the specified action.
+
+		*action* (``str``) is the Orders API action. A "ByNextToken" action
+		shares the throttle of its base action.
+
+		Returns the throttle (``amazonmws.throttle.Throttle``).
+		"""
+		if action.endswith('ByNextToken'):
+			action = action[:-len('ByNextToken')]
+		return amazonmws.throttle.get_throttle(self, action, THROTTLE_MAX_REQUESTS[action], THROTTLE_RESTORE_RATES[action])
+
+	def get_orders(self, order_ids, workers=None):
+		"""
+		Gets any number of Orders. The Order IDs are split into GetOrder
+		calls of 50 IDs which are sent concurrently within the GetOrder
+		quota.
+
+		*order_ids* (**iterable**) contains each Amazon Order ID (``str``).
+
+		*workers* (``int``) is the number of calls to send concurrently.
+		Default is ``None`` for the GetOrder quota.
+
+		Returns a ``dict`` mapping each Amazon Order ID (``str``) to either
+		the Order (``dict``), ``None`` if Amazon did not return the Order,
+		or the error (``Exception``) raised by the call containing the
+		Order. See *parse_orders()*.
+		"""
+		ids = []
+		seen = set()
+		for i, order_id in enumerate(order_ids):
+			if not isinstance(order_id, six.string_types):
+				raise TypeError("order_ids[{}]:{!r} is not a string.".format(i, order_id))
+			if order_id not in seen:
+				seen.add(order_id)
+				ids.append(order_id)
+
+		chunks = [ids[i:i + 50] for i in six.moves.range(0, len(ids), 50)]
+
+		def get_chunk(chunk):
+			return parse_orders(self.GetOrder(AmazonOrderId=chunk))[0]
+
+		results = {}
+		throttle = self.get_throttle('GetOrder')
+		for chunk, orders, error in amazonmws.throttle.run_throttled(get_chunk, chunks, throttle=throttle, workers=workers):
+			if error is not None:
+				for order_id in chunk:
+					results[order_id] = error
+			else:
+				found = {order['AmazonOrderId']: order for order in orders}
+				for order_id in chunk:
+					results[order_id] = found.get(order_id)
+
+		return results
+
+	def list_orders(self, marketplaces=None, buffer_size=None, **kwargs):
+		"""
+		Lists the Orders in any number of marketplaces. The marketplaces are
+		grouped by region, and each region is listed concurrently using its
+		own endpoint (following the NextToken to completion) with the
+		results merged into one stream.
+
+		*marketplaces* (**sequence**) optionally contains each marketplace
+		(``str``) to list. This can contain any keys or values from
+		``MARKETPLACE_IDS``, and can span regions. Default is ``None`` to
+		only list the default marketplace through this endpoint (see
+		*send_request()*).
+
+		*buffer_size* (``int``) is the maximum number of Orders buffered
+		from the regions. Default is ``None`` for 100.
+
+		*kwargs* contains any other ListOrders arguments (e.g.,
+		"CreatedAfter", "LastUpdatedAfter", "OrderStatus").
+
+		Returns an iterator yielding each Order (``dict``) as the pages of the
+		regions are received. See *parse_orders()*.
+		"""
+		if isinstance(marketplaces, six.string_types):
+			raise TypeError("marketplaces:{!r} is not a sequence.".format(marketplaces))
+
+		if 'MarketplaceId' in kwargs:
+			raise ValueError("MarketplaceId:{!r} cannot be set, use marketplaces.".format(kwargs['MarketplaceId']))
+
+		def list_region(region, marketplace_ids):
+			orders = self if region is None or _ENDPOINT_REGIONS.get(self.endpoint) == region else self.for_region(region)
+			throttle = orders.get_throttle('ListOrders')
+			args = dict(kwargs, MarketplaceId=marketplace_ids) if marketplace_ids is not None else kwargs
+
+			page, next_token, _last_updated_before = throttle.call(lambda: parse_orders(orders.ListOrders(**args)))
+			while True:
+				for order in page:
+					yield order
+				if not next_token:
+					break
+				page, next_token, _last_updated_before = throttle.call(lambda: parse_orders(orders.ListOrdersByNextToken(NextToken=next_token)))
+
+		if marketplaces is None:
+			return list_region(None, None)
+
+		streams = [list_region(region, marketplace_ids) for region, marketplace_ids in sorted(six.iteritems(group_marketplaces(marketplaces)))]
+		if len(streams) == 1:
+			return streams[0]
+		return amazonmws.throttle.merge_iterators(streams, buffer_size=buffer_size)
+
 	def new_args(self):
 		'''
 		Returns base query args for the Orders API--these
-		items are used by each class
+		items are used by each class. The default MarketplaceId is added by
+		send_request() to the actions which take it.
 		'''
 		return {
 			'AWSAccessKeyId': self.access_key,
 			'SellerId': self.merchant_id,
 			'Timestamp': datetime_to_iso8601(datetime.datetime.utcnow()),
 			'Version': self.mws_api_version,
-			'MarketplaceId': [ MARKETPLACE_IDS['us'], ]
 		}
 
 	def send_request(self, action, args_dict):
@@ -111,16 +340,60 @@ class Orders( MWS ):
 		Args:
 			action[str]: an Orders API supported action. UnsupportActionError is raises if this is an unknown action
 			args_dict[dict]: dictionary of arguments that follow the Orders API argument guidelines
+
+		The arguments of the actions in ``ACTION_ARGS`` are built using their
+		compiled schema: list arguments are flattened using precomputed keys,
+		dates are formatted, and arguments set to ``None`` are omitted. If
+		the action takes a MarketplaceId and none is set, the default
+		marketplaces are used. Any other action is built generically.
 		"""
-		args = self.new_args()
-		args['Action'] = action
+		schema = _ACTION_SCHEMAS.get(action)
+		if schema is None:
+			args = self.new_args()
+			args['MarketplaceId'] = [MARKETPLACE_IDS['us']]
+			args['Action'] = action
+
+			query = self._combine_dicts( args, args_dict )
+			new_query = {}
+			for key, value in six.iteritems(query):
+				self._update_query( new_query, key, value )
+
+			return MWS.send_request(self, new_query, path=self.path )
+
+		query = {'Action': action}
+		for key, value in six.iteritems(args_dict):
+			if value is None:
+				continue
+
+			arg = schema.get(key)
+			if arg is None:
+				# Unknown argument, build it generically.
+				self._update_query(query, key, value)
+				continue
+
+			kind, keys = arg
+			if kind == _LIST_ARG:
+				if isinstance(value, six.string_types):
+					value = (value,)
+				elif not is_sequence(value):
+					raise TypeError("{}:{!r} is not a sequence.".format(key, value))
+				if len(value) > MAX_LIST_ARGS:
+					raise ValueError("{} length {} cannot be greater than {}.".format(key, len(value), MAX_LIST_ARGS))
+				query.update(zip(keys, value))
+			elif kind == _DATE_ARG:
+				query[key] = value if isinstance(value, six.string_types) else datetime_to_iso8601(value, name=key)
+			elif kind == _INT_ARG:
+				try:
+					query[key] = int(value)
+				except (TypeError, ValueError):
+					raise TypeError("{}:{!r} is not an integer.".format(key, value))
+			else:
+				query[key] = value
 
-		query = self._combine_dicts( args, args_dict )
-		new_query = {}
-		for key, value in six.iteritems(query):
-			self._update_query( new_query, key, value )
+		if 'MarketplaceId' in schema and 'MarketplaceId' not in args_dict:
+			query.update(zip(schema['MarketplaceId'][1], [MARKETPLACE_IDS['us']]))
 
-		return MWS.send_request(self, new_query, path=self.path )
+		return MWS.send_request(self, query, path=self.path)
 
 	def _combine_dicts(self, dict1, dict2):
 		'''
@@ -174,12 +447,14 @@ class Orders( MWS ):
 			new key: 'MarketplaceId.Id.x
 			this function returns: 'MarketplaceId.Id.'
 		'''
-		item = None
-		for item in re.finditer( r"([A-Z][a-z])+([a-z]+)?", key):
-			pass
-		item = item.group(0)#Get the last re.MatchObject from the iterator
-
-		basekey = key + "." + item + "."
+		basekey = _list_keys.get(key)
+		if basekey is None:
+			item = None
+			for item in re.finditer( r"([A-Z][a-z])+([a-z]+)?", key):
+				pass
+			item = item.group(0)#Get the last re.MatchObject from the iterator
+
+			basekey = _list_keys[key] = key + "." + item + "."
 		return basekey
 
 	def __getattr__(self, api_call):
@@ -213,19 +488,6 @@ class Orders( MWS ):
 		# Merge args passed to function w/ default args.
 		args.update(kwargs)
 
-		# Ensure our dates are properly formatted.
-		if 'CreatedAfter' in kwargs and kwargs['CreatedAfter']:
-			args['CreatedAfter'] = datetime_to_iso8601(kwargs['CreatedAfter'], name='CreatedAfter')
-
-		if 'CreatedBefore' in kwargs and kwargs['CreatedBefore']:
-			args['CreatedBefore'] = datetime_to_iso8601(kwargs['CreatedBefore'], name='CreatedBefore')
-
-		if 'LastUpdatedAfter' in kwargs and kwargs['LastUpdatedAfter']:
-			args['LastUpdatedAfter'] = datetime_to_iso8601(kwargs['LastUpdatedAfter'], name='LastUpdatedAfter')
-
-		if 'LastUpdatedBefore' in kwargs and kwargs['LastUpdatedBefore']:
-			args['LastUpdatedBefore'] = datetime_to_iso8601(kwargs['LastUpdatedBefore'], name='LastUpdatedBefore')
-
 		return self.send_request('ListOrders', args)
 
 	def ListOrdersByNextToken(self, **kwargs):
@@ -244,3 +506,43 @@ class Orders( MWS ):
 		args.update(kwargs)
 
 		return self.send_request('ListOrdersByNextToken', args)
+
+
+def parse_order_items(data):
+	"""
+	Parses the Order Items from a ListOrderItems or
+	ListOrderItemsByNextToken response.
+
+	*data* (``str``) is the response XML.
+
+	Returns a ``tuple`` containing: the ``list`` of each Order Item
+	(``dict``) mapping each OrderItem field (e.g., "ASIN", "SellerSKU",
+	"OrderItemId", "QuantityOrdered") to its value (see
+	*amazonmws.util.element_to_dict()*), the next token (``str``) if there
+	are more Order Items or ``None``, and the Amazon Order ID (``str``).
+	"""
+	root = parse_response(data)
+	items = [element_to_dict(elem) for elem in root.iter('OrderItem')]
+	next_token = root.findtext('.//NextToken') or None
+	order_id = root.findtext('.//AmazonOrderId') or None
+	return items, next_token, order_id
+
+def parse_orders(data):
+	"""
+	Parses the Orders from a ListOrders, ListOrdersByNextToken or GetOrder
+	response.
+
+	*data* (``str``) is the response XML.
+
+	Returns a ``tuple`` containing: the ``list`` of each Order (``dict``)
+	mapping each Order field (e.g., "AmazonOrderId", "PurchaseDate",
+	"LastUpdateDate", "OrderStatus") to its value (see
+	*amazonmws.util.element_to_dict()*), the next token (``str``) if there
+	are more Orders or ``None``, and the LastUpdatedBefore date (``str``)
+	of the response or ``None``.
+	"""
+	root = parse_response(data)
+	orders = [element_to_dict(elem) for elem in root.iter('Order')]
+	next_token = root.findtext('.//NextToken') or None
+	last_updated_before = root.findtext('.//LastUpdatedBefore') or None
+	return orders, next_token, last_updated_before
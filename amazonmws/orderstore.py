@@ -0,0 +1,263 @@
+# coding: utf-8
+"""
+This module provides a local SQLite store of the Orders and Order Items
+fetched from the Amazon MWS Orders API so that they can be queried
+without re-parsing responses or sending requests.
+"""
+
+__created__ = "2026-10-19"
+__modified__ = "2026-10-19"
+
+import json
+from amazonmws.mws import parse_response
+from amazonmws.util import SQLiteStore, datetime_to_iso8601, element_to_dict, index_date
+
+#: The SQL statements used to create the store tables.
+SCHEMA = (
+	"""
+	CREATE TABLE IF NOT EXISTS orders (
+		order_id TEXT PRIMARY KEY,
+		order_status TEXT,
+		purchase_date TEXT,
+		last_update_date TEXT,
+		marketplace_id TEXT,
+		fulfillment_channel TEXT,
+		data TEXT NOT NULL
+	)
+	""",
+	"CREATE INDEX IF NOT EXISTS orders_status ON orders (order_status, purchase_date)",
+	"CREATE INDEX IF NOT EXISTS orders_purchase_date ON orders (purchase_date)",
+	"CREATE INDEX IF NOT EXISTS orders_marketplace ON orders (marketplace_id, purchase_date)",
+	"CREATE INDEX IF NOT EXISTS orders_channel ON orders (fulfillment_channel, purchase_date)",
+	"""
+	CREATE TABLE IF NOT EXISTS order_items (
+		order_id TEXT NOT NULL,
+		order_item_id TEXT NOT NULL,
+		position INTEGER NOT NULL,
+		data TEXT NOT NULL,
+		PRIMARY KEY (order_id, order_item_id)
+	)
+	""",
+)
+
+#: The SQL statement used to upsert an Order. The Order is only replaced
+#: if it is not older than the stored Order.
+_UPSERT_ORDER = """
+	INSERT OR REPLACE INTO orders (order_id, order_status, purchase_date, last_update_date, marketplace_id, fulfillment_channel, data)
+	SELECT ?, ?, ?, ?, ?, ?, ?
+	WHERE NOT EXISTS (SELECT 1 FROM orders WHERE order_id = ? AND last_update_date > ?)
+"""
+
+
+class OrderStore(SQLiteStore):
+	"""
+	The ``OrderStore`` class maintains a local SQLite store of Orders and
+	Order Items. Records are upserted in bulk transactions, and Orders are
+	indexed on status, purchase date, marketplace and fulfillment channel
+	so that operational queries are answered locally.
+	"""
+
+	def __init__(self, path=None):
+		"""
+		Initializes the ``OrderStore`` instance.
+
+		*path* (``str``) is the path of the SQLite database file. Default is
+		``None`` for ":memory:" to not persist the store.
+		"""
+		SQLiteStore.__init__(self, path, SCHEMA)
+
+	def count(self, statuses=None, marketplace_ids=None, fulfillment_channels=None, from_date=None, to_date=None):
+		"""
+		Counts the stored Orders that match the query. See *find()* for the
+		arguments.
+
+		Returns the number of matching Orders (``int``).
+		"""
+		where, params = _order_query(statuses, marketplace_ids, fulfillment_channels, from_date, to_date)
+		sql = "SELECT COUNT(*) FROM orders"
+		if where:
+			sql += " WHERE " + " AND ".join(where)
+
+		with self._lock:
+			return self._db.execute(sql, params).fetchone()[0]
+
+	def find(self, statuses=None, marketplace_ids=None, fulfillment_channels=None, from_date=None, to_date=None, limit=None):
+		"""
+		Finds the stored Orders that match the query.
+
+		*statuses* (**sequence**) is used to filter on OrderStatus
+		(``str``). Default is ``None`` to not filter on OrderStatus.
+
+		*marketplace_ids* (**sequence**) is used to filter on MarketplaceId
+		(``str``). Default is ``None`` to not filter on MarketplaceId.
+
+		*fulfillment_channels* (**sequence**) is used to filter on
+		FulfillmentChannel (``str``), "AFN" or "MFN". Default is ``None`` to
+		not filter on FulfillmentChannel.
+
+		*from_date* (``datetime`` or ``float``) is the start of the purchase
+		date range. Default is ``None`` for no start.
+
+		*to_date* (``datetime`` or ``float``) is the end of the purchase date
+		range. Default is ``None`` for no end.
+
+		*limit* (``int``) is the maximum number of Orders to return. Default
+		is ``None`` for no limit.
+
+		Returns the ``list`` of each matching Order (``dict``) ordered from
+		the most to least recently purchased.
+		"""
+		where, params = _order_query(statuses, marketplace_ids, fulfillment_channels, from_date, to_date)
+		sql = "SELECT data FROM orders"
+		if where:
+			sql += " WHERE " + " AND ".join(where)
+		sql += " ORDER BY purchase_date DESC"
+		if limit is not None:
+			sql += " LIMIT ?"
+			params.append(int(limit))
+
+		with self._lock:
+			rows = self._db.execute(sql, params).fetchall()
+		return [json.loads(row[0]) for row in rows]
+
+	def get_order(self, order_id):
+		"""
+		Gets the stored Order.
+
+		*order_id* (``str``) is the Amazon Order ID.
+
+		Returns the Order (``dict``) if found; otherwise, ``None``.
+		"""
+		with self._lock:
+			row = self._db.execute("SELECT data FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+		return json.loads(row[0]) if row else None
+
+	def get_order_items(self, order_id):
+		"""
+		Gets the stored Order Items of the Order.
+
+		*order_id* (``str``) is the Amazon Order ID.
+
+		Returns the ``list`` of each Order Item (``dict``) in the order they
+		were listed.
+		"""
+		with self._lock:
+			rows = self._db.execute("SELECT data FROM order_items WHERE order_id = ? ORDER BY position", (order_id,)).fetchall()
+		return [json.loads(row[0]) for row in rows]
+
+	def update_order_items(self, order_items, append=None):
+		"""
+		Upserts the Order Items of the specified Orders in one transaction.
+		The stored Order Items of each Order are replaced unless appending.
+
+		*order_items* (**iterable**) contains each ``tuple`` containing: the
+		Amazon Order ID (``str``), and the **sequence** of each Order Item
+		(``dict``) as returned by *amazonmws.orders.parse_order_items()*.
+		Unless appending, all of the Order Items of an Order must be
+		included.
+
+		*append* (``bool``) is whether the Order Items are added after the
+		stored Order Items of each Order (e.g., for the next page of Order
+		Items) instead of replacing them. Default is ``None`` for ``False``.
+
+		Returns the number of Order Items upserted (``int``).
+		"""
+		with self._lock, self._db:
+			count = 0
+			for order_id, items in order_items:
+				if append:
+					start = self._db.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM order_items WHERE order_id = ?", (order_id,)).fetchone()[0]
+				else:
+					start = 0
+					self._db.execute("DELETE FROM order_items WHERE order_id = ?", (order_id,))
+
+				rows = [(order_id, item['OrderItemId'], position, json.dumps(item, sort_keys=True)) for position, item in enumerate(items, start)]
+				self._db.executemany("INSERT OR REPLACE INTO order_items (order_id, order_item_id, position, data) VALUES (?, ?, ?, ?)", rows)
+				count += len(rows)
+
+		return count
+
+	def update_orders(self, orders):
+		"""
+		Upserts the specified Orders in one transaction. An Order is not
+		replaced by an older version of itself.
+
+		*orders* (**iterable**) contains each Order (``dict``) as returned by
+		*amazonmws.orders.parse_orders()*.
+
+		Returns the number of Orders processed (``int``).
+		"""
+		rows = []
+		for order in orders:
+			order_id = order['AmazonOrderId']
+			updated = index_date(order.get('LastUpdateDate'))
+			rows.append((
+				order_id,
+				order.get('OrderStatus') or None,
+				index_date(order.get('PurchaseDate')),
+				updated,
+				order.get('MarketplaceId') or None,
+				order.get('FulfillmentChannel') or None,
+				json.dumps(order, sort_keys=True),
+				order_id,
+				updated or '',
+			))
+
+		with self._lock, self._db:
+			self._db.executemany(_UPSERT_ORDER, rows)
+
+		return len(rows)
+
+	def update_response(self, data):
+		"""
+		Parses and upserts the Orders or Order Items from a ListOrders,
+		ListOrdersByNextToken, GetOrder, ListOrderItems or
+		ListOrderItemsByNextToken response. The Order Items of a
+		ListOrderItems response replace the stored Order Items of the Order,
+		and those of a ListOrderItemsByNextToken response are appended to
+		them, so the pages of an Order must be upserted in order.
+
+		*data* (``str``) is the response XML.
+
+		Returns the number of records upserted (``int``).
+		"""
+		root = parse_response(data)
+		items = [element_to_dict(elem) for elem in root.iter('OrderItem')]
+		if items:
+			order_id = root.findtext('.//AmazonOrderId')
+			if not order_id:
+				raise ValueError("data does not contain the AmazonOrderId of its Order Items.")
+			return self.update_order_items([(order_id, items)], append=root.tag == 'ListOrderItemsByNextTokenResponse')
+		return self.update_orders(element_to_dict(elem) for elem in root.iter('Order'))
+
+
+def _order_query(statuses, marketplace_ids, fulfillment_channels, from_date, to_date):
+	"""
+	Builds the WHERE clause of an Order query.
+
+	See *OrderStore.find()* for the arguments.
+
+	Returns a ``tuple`` containing: the ``list`` of each condition
+	(``str``), and the ``list`` of each parameter.
+	"""
+	where = []
+	params = []
+	for column, values in (
+		('order_status', statuses),
+		('marketplace_id', marketplace_ids),
+		('fulfillment_channel', fulfillment_channels),
+	):
+		if values is not None:
+			values = list(values)
+			where.append("{} IN ({})".format(column, ", ".join("?" * len(values))))
+			params.extend(values)
+
+	if from_date is not None:
+		where.append("purchase_date >= ?")
+		params.append(index_date(datetime_to_iso8601(from_date, name='from_date')))
+
+	if to_date is not None:
+		where.append("purchase_date <= ?")
+		params.append(index_date(datetime_to_iso8601(to_date, name='to_date')))
+
+	return where, params
@@ -0,0 +1,476 @@
+# coding: utf-8
+"""
+This module provides an incremental sync engine on top of the Amazon
+MWS Orders API which only fetches, and emits, the Orders that changed
+since the last sync.
+"""
+
+__created__ = "2026-10-19"
+__modified__ = "2026-10-19"
+
+import six # Python2/Python3 compatibility library.
+import datetime
+import threading
+from amazonmws.mws import MARKETPLACE_IDS
+from amazonmws.orders import Orders, parse_order_items, parse_orders
+from amazonmws.throttle import run_throttled
+from amazonmws.util import SQLiteStore, datetime_to_iso8601, index_date, iso8601_to_datetime
+
+#: The SQL statements used to create the sync state tables.
+SCHEMA = (
+	"""
+	CREATE TABLE IF NOT EXISTS order_watermarks (
+		seller_id TEXT NOT NULL,
+		marketplace_id TEXT NOT NULL,
+		last_updated TEXT NOT NULL,
+		PRIMARY KEY (seller_id, marketplace_id)
+	)
+	""",
+	"""
+	CREATE TABLE IF NOT EXISTS orders_seen (
+		seller_id TEXT NOT NULL,
+		order_id TEXT NOT NULL,
+		last_update_date TEXT NOT NULL,
+		PRIMARY KEY (seller_id, order_id)
+	)
+	""",
+	"CREATE INDEX IF NOT EXISTS orders_seen_date ON orders_seen (seller_id, last_update_date)",
+	"""
+	CREATE TABLE IF NOT EXISTS order_items_fetched (
+		seller_id TEXT NOT NULL,
+		order_id TEXT NOT NULL,
+		last_update_date TEXT NOT NULL,
+		PRIMARY KEY (seller_id, order_id)
+	)
+	""",
+)
+
+
+class OrderItemFetcher(SQLiteStore):
+	"""
+	The ``OrderItemFetcher`` class fetches the Order Items of many Orders
+	concurrently at the maximum rate allowed by the ListOrderItems quota.
+	The LastUpdateDate of each Order is recorded once its Order Items have
+	been fetched so that unchanged Orders are skipped next time.
+	"""
+
+	def __init__(self, orders, path=None, workers=None):
+		"""
+		Initializes the ``OrderItemFetcher`` instance.
+
+		*orders* (``Orders``) is the Orders API used to list Order Items.
+
+		*path* (``str``) is the path of the SQLite database file used to
+		persist the fetch state. Default is ``None`` for ":memory:" to not
+		persist it.
+
+		*workers* (``int``) is the number of Orders to fetch concurrently.
+		Default is ``None`` for the ListOrderItems quota.
+		"""
+		if not isinstance(orders, Orders):
+			raise TypeError("orders:{!r} is not an Orders.".format(orders))
+
+		self.orders = orders
+		"""
+		*orders* (``Orders``) is the Orders API used to list Order Items.
+		"""
+
+		self.workers = workers
+		"""
+		*workers* (``int``) is the number of Orders to fetch concurrently.
+		"""
+
+		SQLiteStore.__init__(self, path, SCHEMA)
+
+	def fetch(self, orders):
+		"""
+		Fetches the Order Items of the specified Orders.
+
+		*orders* (**iterable**) contains each Order. This can be either the
+		Order (``dict``) containing "AmazonOrderId" and "LastUpdateDate", or
+		the Amazon Order ID (``str``) to always fetch the Order Items. This
+		is consumed lazily.
+
+		Returns an iterator yielding a ``tuple`` containing: the Amazon Order
+		ID (``str``), the ``list`` of each Order Item (``dict``), and the
+		error (``Exception``) raised while fetching the Order Items or
+		``None``, in the order the fetches complete. Unchanged Orders are
+		not yielded. An Order is recorded as fetched once the caller resumes
+		the iterator after it is yielded.
+		"""
+		throttle = self.orders.get_throttle('ListOrderItems')
+		seller_id = self.orders.merchant_id
+
+		def changed():
+			for order in orders:
+				if isinstance(order, six.string_types):
+					yield order, None
+					continue
+
+				order_id = order['AmazonOrderId']
+				updated = index_date(order['LastUpdateDate'])
+				with self._lock:
+					row = self._db.execute("SELECT last_update_date FROM order_items_fetched WHERE seller_id = ? AND order_id = ?", (seller_id, order_id)).fetchone()
+				if not row or row[0] != updated:
+					yield order_id, updated
+
+		def fetch_items(item):
+			# This is called within the throttled call of the first page.
+			order_id, _updated = item
+			items, next_token, _order_id = parse_order_items(self.orders.ListOrderItems(AmazonOrderId=order_id))
+			while next_token:
+				page, next_token, _order_id = throttle.call(lambda: parse_order_items(self.orders.ListOrderItemsByNextToken(NextToken=next_token)))
+				items.extend(page)
+			return items
+
+		for (order_id, updated), items, error in run_throttled(fetch_items, changed(), throttle=throttle, workers=self.workers):
+			yield order_id, items, error
+
+			# The fetch is only recorded once the Order Items have been
+			# consumed so that they are fetched again if the caller stops.
+			if error is None and updated is not None:
+				with self._lock, self._db:
+					self._db.execute("INSERT OR REPLACE INTO order_items_fetched (seller_id, order_id, last_update_date) VALUES (?, ?, ?)", (seller_id, order_id, updated))
+
+
+class OrderSync(SQLiteStore):
+	"""
+	The ``OrderSync`` class incrementally syncs the Orders of a seller in
+	a marketplace. A LastUpdatedAfter watermark is persisted per seller
+	and marketplace so that each sync only lists the Orders updated since
+	the previous one (with some overlap to tolerate clock skew), and only
+	the new or changed Orders are emitted.
+	"""
+
+	def __init__(self, orders, marketplace_id, path=None, overlap=None, start_date=None):
+		"""
+		Initializes the ``OrderSync`` instance.
+
+		*orders* (``Orders``) is the Orders API used to list Orders.
+
+		*marketplace_id* (``str``) is the Amazon Marketplace ID to sync. This
+		can be any key or value from ``MARKETPLACE_IDS``.
+
+		*path* (``str``) is the path of the SQLite database file used to
+		persist the sync state. Default is ``None`` for ":memory:" to not
+		persist it.
+
+		*overlap* (``int`` or ``float``) is the number of seconds the
+		watermark is moved back by when syncing. Default is ``None`` for
+		300 (5 minutes).
+
+		*start_date* (``datetime`` or ``float``) is the LastUpdatedAfter
+		date used for the first sync. Default is ``None`` for 1 day ago.
+		"""
+		if not isinstance(orders, Orders):
+			raise TypeError("orders:{!r} is not an Orders.".format(orders))
+
+		marketplace_id = MARKETPLACE_IDS.get(marketplace_id, marketplace_id)
+		if not isinstance(marketplace_id, six.string_types):
+			raise TypeError("marketplace_id:{!r} is not a string.".format(marketplace_id))
+		elif not marketplace_id:
+			raise ValueError("marketplace_id:{!r} cannot be empty.".format(marketplace_id))
+
+		if overlap is None:
+			overlap = 300
+		elif not isinstance(overlap, (float,) + six.integer_types):
+			raise TypeError("overlap:{!r} is not a number.".format(overlap))
+
+		if start_date is not None:
+			start_date = iso8601_to_datetime(datetime_to_iso8601(start_date, name='start_date'))
+
+		self.marketplace_id = marketplace_id
+		"""
+		*marketplace_id* (``str``) is the Amazon Marketplace ID to sync.
+		"""
+
+		self.orders = orders
+		"""
+		*orders* (``Orders``) is the Orders API used to list Orders.
+		"""
+
+		self.overlap = overlap
+		"""
+		*overlap* (``int`` or ``float``) is the number of seconds the
+		watermark is moved back by when syncing.
+		"""
+
+		self.start_date = start_date
+		"""
+		*start_date* (``datetime``) is the LastUpdatedAfter date used for
+		the first sync.
+		"""
+
+		SQLiteStore.__init__(self, path, SCHEMA)
+
+	def filter_changed(self, orders):
+		"""
+		Filters out the Orders which have not changed since they were last
+		emitted.
+
+		*orders* (**sequence**) contains each Order (``dict``).
+
+		Returns the ``list`` of each new or changed Order (``dict``).
+		"""
+		if not orders:
+			return []
+
+		order_ids = [order['AmazonOrderId'] for order in orders]
+		sql = "SELECT order_id, last_update_date FROM orders_seen WHERE seller_id = ? AND order_id IN ({})".format(", ".join("?" * len(order_ids)))
+		with self._lock:
+			seen = dict(self._db.execute(sql, [self.orders.merchant_id] + order_ids).fetchall())
+
+		return [order for order in orders if seen.get(order['AmazonOrderId']) != index_date(order['LastUpdateDate'])]
+
+	def get_watermark(self):
+		"""
+		Gets the LastUpdatedAfter watermark.
+
+		Returns the date (``datetime``) all Orders have been synced up to, or
+		``None`` if the marketplace has not been synced yet.
+		"""
+		with self._lock:
+			row = self._db.execute("SELECT last_updated FROM order_watermarks WHERE seller_id = ? AND marketplace_id = ?", (self.orders.merchant_id, self.marketplace_id)).fetchone()
+		return iso8601_to_datetime(row[0]) if row else None
+
+	def mark_seen(self, orders):
+		"""
+		Records the specified Orders as emitted.
+
+		*orders* (**sequence**) contains each Order (``dict``).
+		"""
+		seller_id = self.orders.merchant_id
+		rows = [(seller_id, order['AmazonOrderId'], index_date(order['LastUpdateDate'])) for order in orders]
+		with self._lock, self._db:
+			self._db.executemany("INSERT OR REPLACE INTO orders_seen (seller_id, order_id, last_update_date) VALUES (?, ?, ?)", rows)
+
+	def set_watermark(self, watermark):
+		"""
+		Sets the LastUpdatedAfter watermark. The Orders seen before the
+		overlap of the new watermark are forgotten since they can no longer
+		be listed again unless they change.
+
+		*watermark* (``datetime`` or ``float``) is the date all Orders have
+		been synced up to.
+		"""
+		watermark = iso8601_to_datetime(datetime_to_iso8601(watermark, name='watermark'))
+		cutoff = watermark - datetime.timedelta(seconds=self.overlap)
+		with self._lock, self._db:
+			self._db.execute("INSERT OR REPLACE INTO order_watermarks (seller_id, marketplace_id, last_updated) VALUES (?, ?, ?)", (self.orders.merchant_id, self.marketplace_id, watermark.isoformat()))
+			self._db.execute("DELETE FROM orders_seen WHERE seller_id = ? AND last_update_date < ?", (self.orders.merchant_id, cutoff.strftime('%Y-%m-%dT%H:%M:%S.%f')))
+
+	def sync(self):
+		"""
+		Lists the Orders updated since the watermark, following the
+		NextToken to completion. The watermark is only advanced once all of
+		the Orders have been listed.
+
+		Returns an iterator yielding each new or changed Order (``dict``).
+		See *amazonmws.orders.parse_orders()*.
+		"""
+		watermark = self.get_watermark()
+		if watermark is not None:
+			from_date = watermark - datetime.timedelta(seconds=self.overlap)
+		elif self.start_date is not None:
+			from_date = self.start_date
+		else:
+			from_date = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+
+		throttle = self.orders.get_throttle('ListOrders')
+		page = throttle.call(lambda: parse_orders(self.orders.ListOrders(
+			LastUpdatedAfter=from_date,
+			MarketplaceId=[self.marketplace_id],
+		)))
+
+		new_watermark = None
+		latest = None
+		while True:
+			orders, next_token, last_updated_before = page
+			if new_watermark is None and last_updated_before:
+				new_watermark = iso8601_to_datetime(last_updated_before)
+
+			for order in orders:
+				updated = iso8601_to_datetime(order['LastUpdateDate'])
+				if latest is None or updated > latest:
+					latest = updated
+
+			changed = self.filter_changed(orders)
+			for order in changed:
+				yield order
+			self.mark_seen(changed)
+
+			if not next_token:
+				break
+			page = throttle.call(lambda: parse_orders(self.orders.ListOrdersByNextToken(NextToken=next_token)))
+
+		new_watermark = new_watermark or latest
+		if new_watermark is not None and (watermark is None or new_watermark > watermark):
+			self.set_watermark(new_watermark)
+
+
+def backfill_orders(orders, created_after, created_before=None, marketplace_id=None, window=None, min_window=None, split_pages=None, workers=None):
+	"""
+	Lists all of the Orders created within a date range. The range is
+	partitioned into windows whose NextToken chains are followed
+	concurrently within the ListOrders quota. A window which returns many
+	pages is split, and the rest of the window is listed in two halves
+	instead. Orders listed by more than one window are only emitted once.
+
+	*orders* (``Orders``) is the Orders API used to list Orders.
+
+	*created_after* (``datetime`` or ``float``) is the start of the range.
+
+	*created_before* (``datetime`` or ``float``) is the end of the range.
+	Default is ``None`` for 2 minutes ago (the latest date allowed by
+	Amazon).
+
+	*marketplace_id* (``str``) is the Amazon Marketplace ID to list. This
+	can be any key or value from ``MARKETPLACE_IDS``. Default is ``None``
+	for the default marketplaces of *orders*.
+
+	*window* (``int`` or ``float``) is the number of seconds spanned by each
+	initial window. Default is ``None`` for 604800 (7 days).
+
+	*min_window* (``int`` or ``float``) is the minimum number of seconds
+	spanned by a window. A window this small is never split. Default is
+	``None`` for 3600 (1 hour).
+
+	*split_pages* (``int``) is the number of pages a window can return
+	before it is split. Default is ``None`` for 5.
+
+	*workers* (``int``) is the number of windows to list concurrently.
+	Default is ``None`` for the ListOrders quota.
+
+	Returns an iterator yielding each Order (``dict``) in the order they
+	are listed. See *amazonmws.orders.parse_orders()*.
+	"""
+	if not isinstance(orders, Orders):
+		raise TypeError("orders:{!r} is not an Orders.".format(orders))
+
+	created_after = iso8601_to_datetime(datetime_to_iso8601(created_after, name='created_after'))
+	if created_before is None:
+		created_before = datetime.datetime.utcnow() - datetime.timedelta(minutes=2)
+	else:
+		created_before = iso8601_to_datetime(datetime_to_iso8601(created_before, name='created_before'))
+	if created_before <= created_after:
+		raise ValueError("created_before:{!r} must be after created_after:{!r}.".format(created_before, created_after))
+
+	if marketplace_id is not None:
+		marketplace_id = MARKETPLACE_IDS.get(marketplace_id, marketplace_id)
+
+	if window is None:
+		window = 604800
+	elif not isinstance(window, (float,) + six.integer_types):
+		raise TypeError("window:{!r} is not a number.".format(window))
+	elif window <= 0:
+		raise ValueError("window:{!r} must be greater than 0.".format(window))
+	window = datetime.timedelta(seconds=window)
+
+	if min_window is None:
+		min_window = 3600
+	elif not isinstance(min_window, (float,) + six.integer_types):
+		raise TypeError("min_window:{!r} is not a number.".format(min_window))
+	elif min_window <= 0:
+		raise ValueError("min_window:{!r} must be greater than 0.".format(min_window))
+	min_window = datetime.timedelta(seconds=min_window)
+
+	if split_pages is None:
+		split_pages = 5
+	elif not isinstance(split_pages, six.integer_types):
+		raise TypeError("split_pages:{!r} is not an integer.".format(split_pages))
+	elif split_pages < 1:
+		raise ValueError("split_pages:{!r} cannot be less than 1.".format(split_pages))
+
+	throttle = orders.get_throttle('ListOrders')
+	if workers is None:
+		workers = throttle.max_requests
+
+	windows = []
+	start = created_after
+	while start < created_before:
+		end = min(start + window, created_before)
+		windows.append((start, end))
+		start = end
+
+	tasks = six.moves.queue.Queue()
+	results = six.moves.queue.Queue()
+	state = {'pending': len(windows)}
+	state_lock = threading.Lock()
+	stop = threading.Event()
+
+	for item in windows:
+		tasks.put(item)
+
+	def list_window(start, end):
+		kwargs = {'CreatedAfter': start, 'CreatedBefore': end}
+		if marketplace_id is not None:
+			kwargs['MarketplaceId'] = [marketplace_id]
+
+		page = throttle.call(lambda: parse_orders(orders.ListOrders(**kwargs)))
+		pages = 1
+		while not stop.is_set():
+			found, next_token, _before = page
+			results.put((found, None))
+			if not next_token:
+				break
+
+			if pages >= split_pages:
+				# Too many pages. The Orders of a window are listed in order of
+				# creation, so keep the Orders already listed and only list
+				# the rest of the window (from the earliest Order of the last
+				# page) in two halves instead.
+				dates = [iso8601_to_datetime(order['PurchaseDate']) for order in found if order.get('PurchaseDate')]
+				resume = max(min(dates), start) if dates else start
+				if end - resume >= min_window * 2:
+					middle = resume + (end - resume) // 2
+					with state_lock:
+						state['pending'] += 2
+					tasks.put((resume, middle))
+					tasks.put((middle, end))
+					break
+
+			page = throttle.call(lambda: parse_orders(orders.ListOrdersByNextToken(NextToken=next_token)))
+			pages += 1
+
+	def work():
+		while True:
+			item = tasks.get()
+			if item is None:
+				break
+			try:
+				if not stop.is_set():
+					list_window(*item)
+			except Exception as e:
+				results.put((None, e))
+			finally:
+				with state_lock:
+					state['pending'] -= 1
+					finished = not state['pending']
+				if finished:
+					for _ in six.moves.range(workers):
+						tasks.put(None)
+					results.put((None, None))
+
+	threads = [threading.Thread(target=work) for _ in six.moves.range(workers)]
+	for thread in threads:
+		thread.daemon = True
+		thread.start()
+
+	def iter_orders():
+		seen = set()
+		try:
+			while True:
+				page, error = results.get()
+				if error is not None:
+					raise error
+				elif page is None:
+					break
+				for order in page:
+					order_id = order['AmazonOrderId']
+					if order_id not in seen:
+						seen.add(order_id)
+						yield order
+		finally:
+			stop.set()
+
+	return iter_orders()
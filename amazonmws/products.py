@@ -10,9 +10,20 @@ __modified__ = "2018-05-17"
 __modified_by___ = "Joshua D. Burns"
 
 import six # Python2/Python3 compatibility library.
+import collections
 import datetime
+import threading
+import time
 import amazonmws.mws
-from amazonmws.util import datetime_to_iso8601, is_sequence
+import amazonmws.throttle
+from amazonmws.mws import ENDPOINTS, MWSError, group_marketplaces, parse_response
+from amazonmws.util import datetime_to_iso8601, element_to_dict, is_sequence
+
+#: Maps each endpoint URL to its region key from ``ENDPOINTS``.
+_ENDPOINT_REGIONS = {endpoint: region for region, endpoint in six.iteritems(ENDPOINTS)}
+
+#: The clock used to measure cache ages.
+_clock = getattr(time, 'monotonic', time.time)
 
 #: Actions.
 ACTIONS = {
@@ -31,33 +42,71 @@ ACTIONS = {
 
 #: Maximum number of requests before being throttled.
 THROTTLE_MAX_REQUESTS = {
-	'list_matching': 20,
-	'get_products': 20,
-	'get_products_for_id': 20,
+	'ListMatchingProducts': 20,
+	'GetMatchingProduct': 20,
+	'GetMatchingProductForId': 20,
+	'GetCompetitivePricingForSKU': 20,
+	'GetCompetitivePricingForASIN': 20,
+	'GetLowestOfferListingsForSKU': 20,
+	'GetLowestOfferListingsForASIN': 20,
+	'GetMyPriceForSKU': 20,
+	'GetMyPriceForASIN': 20,
+	'GetProductCategoriesForSKU': 20,
+	'GetProductCategoriesForASIN': 20
+}
+
+#: The number of seconds it takes to restore 1 request from the quota.
+THROTTLE_RESTORE_RATES = {
+	'ListMatchingProducts': 5,
+	'GetMatchingProduct': 1 / 2,
+	'GetMatchingProductForId': 1 / 5,
+	'GetCompetitivePricingForSKU': 1 / 10,
+	'GetCompetitivePricingForASIN': 1 / 10,
+	'GetLowestOfferListingsForSKU': 1 / 10,
+	'GetLowestOfferListingsForASIN': 1 / 10,
+	'GetMyPriceForSKU': 1 / 10,
+	'GetMyPriceForASIN': 1 / 10,
+	'GetProductCategoriesForSKU': 5,
+	'GetProductCategoriesForASIN': 5
+}
+
+#: The actions whose quota is restored per requested item instead of per
+#: request.
+THROTTLE_PER_ITEM = frozenset((
+	'GetCompetitivePricingForASIN',
+	'GetCompetitivePricingForSKU',
+	'GetLowestOfferListingsForASIN',
+	'GetLowestOfferListingsForSKU',
+	'GetMyPriceForASIN',
+	'GetMyPriceForSKU',
+))
+
+#: The maximum number of IDs that can be requested by a single call.
+MAX_IDS = {
+	'get_products': 10,
+	'get_products_for_id': 5,
 	'get_competitive_pricing_for_sku': 20,
 	'get_competitive_pricing_for_asin': 20,
 	'get_lowest_listings_for_sku': 20,
 	'get_lowest_listings_for_asin': 20,
 	'get_my_price_for_sku': 20,
-	'get_my_price_for_asin': 20,
-	'get_categories_for_sku': 20,
-	'get_categories_for_asin': 20
+	'get_my_price_for_asin': 20
 }
 
-#: The number of seconds it takes to restore 1 request from the quota.
-THROTTLE_RESTORE_RATES = {
-	'list_matching': 5,
-	'get_products': 1 / 2,
-	'get_products_for_id': 1 / 5,
-	'get_competitive_pricing_for_sku': 1 / 10,
-	'get_competitive_pricing_for_asin': 1 / 10,
-	'get_lowest_listings_for_sku': 1 / 10,
-	'get_lowest_listings_for_asin': 1 / 10,
-	'get_my_price_for_sku': 1 / 10,
-	'get_my_price_for_asin': 1 / 10,
-	'get_categories_for_sku': 5,
-	'get_categories_for_asin': 5
-}
+#: The lookups which can be batched by ``ProductBatcher``.
+BATCH_ACTIONS = (
+	'get_competitive_pricing',
+	'get_lowest_listings',
+	'get_my_price',
+	'get_products'
+)
+
+#: The lookups which can be cached by ``PricingCache``.
+PRICING_ACTIONS = (
+	'get_competitive_pricing',
+	'get_lowest_listings',
+	'get_my_price'
+)
 
 #: ID types.
 ID_TYPES = {
@@ -148,7 +197,7 @@ class MWSProducts(amazonmws.mws.MWS):
 	*client_api_version* (``str``) is the version of this client API.
 	"""
 
-	products_api_version = '2011-07-01'
+	products_api_version = '2011-10-01'
 	"""
 	*products_api_version* (``str``) is the version of the MWS Products
 	API implemented.
@@ -159,6 +208,19 @@ class MWSProducts(amazonmws.mws.MWS):
 	*path* (``str``) is path all Sellers API requests are sent to.
 	"""
 
+	def for_region(self, region):
+		"""
+		Creates a Products API instance for a region using the same
+		credentials and agent.
+
+		*region* (``str``) is the region key from ``ENDPOINTS``.
+
+		Returns the Products API instance (``MWSProducts``).
+		"""
+		if region not in ENDPOINTS:
+			raise ValueError("region:{!r} is not a key from ENDPOINTS.".format(region))
+		return self.__class__(self.access_key, self.secret_key, self.merchant_id, region, agent=self.agent, user_agent=self.user_agent)
+
 	def get_categories(self, marketplace_id, id_type, id_, debug=None):
 		"""
 		Requests the categories for the specified marketplace product.
@@ -189,11 +251,12 @@ class MWSProducts(amazonmws.mws.MWS):
 			raise ValueError("id_:{!r} cannot be empty.".format(id_))
 
 		args = self.new_args()
+		args['MarketplaceId'] = marketplace_id
 		if id_type == 'ASIN':
-			args['Action'] = ACTIONS['get_my_price_for_asin']
+			args['Action'] = ACTIONS['get_categories_for_asin']
 			args['ASIN'] = id_
 		elif id_type == 'SellerSKU':
-			args['Actions'] = ACTIONS['get_my_price_for_sku']
+			args['Action'] = ACTIONS['get_categories_for_sku']
 			args['SellerSKU'] = id_
 		else:
 			raise ValueError("id_type:{!r} is not 'ASIN' or 'SellerSKU'.".format(id_type))
@@ -234,18 +297,42 @@ class MWSProducts(amazonmws.mws.MWS):
 			raise ValueError("id_list length:{} cannot be greater than 20.".format(len(id_list)))
 
 		args = self.new_args()
+		args['MarketplaceId'] = marketplace_id
 		args['IdType'] = id_type
 		if id_type == 'ASIN':
 			args['Action'] = ACTIONS['get_competitive_pricing_for_asin']
 			args.update({'ASINList.ASIN.{}'.format(i): asin for i, asin in enumerate(id_list, 1)})
 		elif id_type == 'SellerSKU':
-			args['Actions'] = ACTIONS['get_competitive_pricing_for_sku']
+			args['Action'] = ACTIONS['get_competitive_pricing_for_sku']
 			args.update({'SellerSKUList.SellerSKU.{}'.format(i): sku for i, sku in enumerate(id_list, 1)})
 		else:
 			raise ValueError("id_type:{!r} is not 'ASIN' or 'SellerSKU'.".format(id_type))
 
 		return self.send_request(args, path=self.path, debug=debug)
 
+	def get_competitive_pricing_bulk(self, marketplace_id, id_type, ids, workers=None, debug=None):
+		"""
+		Gets the competitive pricing for any number of marketplace products.
+		The IDs are split into calls of 20 IDs which are sent concurrently
+		within the quota of the action.
+
+		*marketplace_id* (``str``) is the ID of the Amazon Marketplace the
+		products belong to.
+
+		*id_type* (``str``) is the type of ID used. This can only be
+		"ASIN" or "SellerSKU".
+
+		*ids* (**iterable**) contains the ID (``str``) of each product to
+		get.
+
+		*workers* (``int``) is the number of calls to send concurrently.
+		Default is ``None`` for the quota of the action.
+
+		Returns a ``dict`` mapping each ID (``str``) to its result. See
+		*parse_product_results()*.
+		"""
+		return self._get_bulk('get_competitive_pricing', id_type, ids, lambda chunk: self.get_competitive_pricing(marketplace_id, id_type, chunk, debug=debug), workers)
+
 	def get_lowest_listings(self, marketplace_id, id_type, id_list, condition=None, exclude_me=None, debug=None):
 		"""
 		Requests the lowest offer listings for the specified marketplace
@@ -295,16 +382,17 @@ class MWSProducts(amazonmws.mws.MWS):
 				raise ValueError("condition:{!r} cannot be empty.".format(condition))
 
 		args = self.new_args()
+		args['MarketplaceId'] = marketplace_id
 		args['IdType'] = id_type
 		if id_type == 'ASIN':
 			if exclude_me is not None:
 				raise ValueError("exclude_me:{!r} can only be set when id_type:{!r} is 'SellerSKU'.".format(exclude_me, id_type))
-			args['Action'] = ACTIONS['get_lowest_listing_for_asin']
+			args['Action'] = ACTIONS['get_lowest_listings_for_asin']
 			args.update({'ASINList.ASIN.{}'.format(i): asin for i, asin in enumerate(id_list, 1)})
 		elif id_type == 'SellerSKU':
 			if exclude_me is not None:
 				args['ExcludeMe'] = 'true' if exclude_me else 'false'
-			args['Actions'] = ACTIONS['get_lowest_listing_for_sku']
+			args['Action'] = ACTIONS['get_lowest_listings_for_sku']
 			args.update({'SellerSKUList.SellerSKU.{}'.format(i): sku for i, sku in enumerate(id_list, 1)})
 		else:
 			raise ValueError("id_type:{!r} is not 'ASIN' or 'SellerSKU'.".format(id_type))
@@ -313,6 +401,25 @@ class MWSProducts(amazonmws.mws.MWS):
 
 		return self.send_request(args, path=self.path, debug=debug)
 
+	def get_lowest_listings_bulk(self, marketplace_id, id_type, ids, condition=None, exclude_me=None, workers=None, debug=None):
+		"""
+		Gets the lowest offer listings for any number of marketplace
+		products. The IDs are split into calls of 20 IDs which are sent
+		concurrently within the quota of the action.
+
+		*ids* (**iterable**) contains the ID (``str``) of each product to
+		get.
+
+		*workers* (``int``) is the number of calls to send concurrently.
+		Default is ``None`` for the quota of the action.
+
+		See *get_lowest_listings()* for the other arguments.
+
+		Returns a ``dict`` mapping each ID (``str``) to its result. See
+		*parse_product_results()*.
+		"""
+		return self._get_bulk('get_lowest_listings', id_type, ids, lambda chunk: self.get_lowest_listings(marketplace_id, id_type, chunk, condition=condition, exclude_me=exclude_me, debug=debug), workers)
+
 	def get_products(self, marketplace_id, id_type, id_list, debug=None):
 		"""
 		Requests the information for the specified marketplace products.
@@ -344,17 +451,78 @@ class MWSProducts(amazonmws.mws.MWS):
 		elif not id_list:
 			raise ValueError("id_list:{!r} cannot be empty.".format(id_list))
 
-		if len(id_list) > 5:
-			raise ValueError("id_list length:{} cannot be greater than 5.".format(len(id_list)))
+		max_ids = MAX_IDS['get_products'] if id_type == 'ASIN' else MAX_IDS['get_products_for_id']
+		if len(id_list) > max_ids:
+			raise ValueError("id_list length:{} cannot be greater than {}.".format(len(id_list), max_ids))
+
+		if id_type != 'ASIN':
+			return self.get_products_for_id(marketplace_id, id_type, id_list, debug=debug)
 
 		args = self.new_args()
-		if id_type == 'ASIN':
-			args['Action'] = ACTIONS['get_products']
-			args.update({'ASINList.ASIN.{}'.format(i): asin for i, asin in enumerate(id_list, 1)})
-		else:
-			args['IdType'] = id_type
-			args['Action'] = ACTIONS['get_products_for_id']
-			args.update({'IDList.ID.{}'.format(i): id_ for i, id_ in enumerate(id_list, 1)})
+		args['MarketplaceId'] = marketplace_id
+		args['Action'] = ACTIONS['get_products']
+		args.update({'ASINList.ASIN.{}'.format(i): asin for i, asin in enumerate(id_list, 1)})
+
+		return self.send_request(args, path=self.path, debug=debug)
+
+	def get_products_bulk(self, marketplace_id, id_type, ids, workers=None, debug=None):
+		"""
+		Gets the information for any number of marketplace products. The
+		IDs are split into calls of 10 ASINs, or 5 IDs of another type,
+		which are sent concurrently within the quota of the action.
+
+		*ids* (**iterable**) contains the ID (``str``) of each product to
+		get.
+
+		*workers* (``int``) is the number of calls to send concurrently.
+		Default is ``None`` for the quota of the action.
+
+		See *get_products()* for the other arguments.
+
+		Returns a ``dict`` mapping each ID (``str``) to its result. See
+		*parse_product_results()*.
+		"""
+		return self._get_bulk('get_products', id_type, ids, lambda chunk: self.get_products(marketplace_id, id_type, chunk, debug=debug), workers)
+
+	def get_products_for_id(self, marketplace_id, id_type, id_list, debug=None):
+		"""
+		Requests the products matching the specified IDs
+		(GetMatchingProductForId).
+
+		*marketplace_id* (``str``) is the ID of the Amazon Marketplace the
+		products are coming from.
+
+		*id_type* (``str``) is the type of ID used. This can be any key or
+		value from ``ID_TYPES``.
+
+		*id_list* (**sequence**) contains each ID (``str``). A maximum of 5
+		IDs can be requested at a single time.
+
+		Returns the response XML (``str``).
+		"""
+		if not isinstance(marketplace_id, six.string_types):
+			raise TypeError("marketplace_id:{!r} is not a str.".format(marketplace_id))
+		elif not marketplace_id:
+			raise ValueError("marketplace_id:{!r} cannot be empty.".format(marketplace_id))
+
+		id_type = ID_TYPES.get(id_type, id_type)
+		if not isinstance(id_type, six.string_types):
+			raise TypeError("id_type:{!r} is not a str.".format(id_type))
+		elif not id_type:
+			raise ValueError("id_type:{!r} cannot be empty.".format(id_type))
+
+		if not is_sequence(id_list):
+			raise TypeError("id_list:{!r} is not a sequence.".format(id_list))
+		elif not id_list:
+			raise ValueError("id_list:{!r} cannot be empty.".format(id_list))
+		elif len(id_list) > MAX_IDS['get_products_for_id']:
+			raise ValueError("id_list length:{} cannot be greater than {}.".format(len(id_list), MAX_IDS['get_products_for_id']))
+
+		args = self.new_args()
+		args['MarketplaceId'] = marketplace_id
+		args['Action'] = ACTIONS['get_products_for_id']
+		args['IdType'] = id_type
+		args.update({'IdList.Id.{}'.format(i): id_ for i, id_ in enumerate(id_list, 1)})
 
 		return self.send_request(args, path=self.path, debug=debug)
 
@@ -402,12 +570,13 @@ class MWSProducts(amazonmws.mws.MWS):
 				raise ValueError("condition:{!r} cannot be empty.".format(condition))
 
 		args = self.new_args()
+		args['MarketplaceId'] = marketplace_id
 		args['IdType'] = id_type
 		if id_type == 'ASIN':
 			args['Action'] = ACTIONS['get_my_price_for_asin']
 			args.update({'ASINList.ASIN.{}'.format(i): asin for i, asin in enumerate(id_list, 1)})
 		elif id_type == 'SellerSKU':
-			args['Actions'] = ACTIONS['get_my_price_for_sku']
+			args['Action'] = ACTIONS['get_my_price_for_sku']
 			args.update({'SellerSKUList.SellerSKU.{}'.format(i): sku for i, sku in enumerate(id_list, 1)})
 		else:
 			raise ValueError("id_type:{!r} is not 'ASIN' or 'SellerSKU'.".format(id_type))
@@ -416,6 +585,79 @@ class MWSProducts(amazonmws.mws.MWS):
 
 		return self.send_request(args, path=self.path, debug=debug)
 
+	def get_my_price_bulk(self, marketplace_id, id_type, ids, condition=None, workers=None, debug=None):
+		"""
+		Gets the seller's price for any number of marketplace products. The
+		IDs are split into calls of 20 IDs which are sent concurrently
+		within the quota of the action.
+
+		*ids* (**iterable**) contains the ID (``str``) of each product to
+		get.
+
+		*workers* (``int``) is the number of calls to send concurrently.
+		Default is ``None`` for the quota of the action.
+
+		See *get_my_price()* for the other arguments.
+
+		Returns a ``dict`` mapping each ID (``str``) to its result. See
+		*parse_product_results()*.
+		"""
+		return self._get_bulk('get_my_price', id_type, ids, lambda chunk: self.get_my_price(marketplace_id, id_type, chunk, condition=condition, debug=debug), workers)
+
+	def get_my_price_matrix(self, marketplaces, skus, condition=None, workers=None, debug=None):
+		"""
+		Gets the seller's price for the SKUs in any number of marketplaces.
+		The marketplaces are grouped by region, and each marketplace is
+		requested concurrently using the endpoint of its region (see
+		*get_my_price_bulk()*) so that each region is only limited by its
+		own quota.
+
+		*marketplaces* (**sequence**) contains each marketplace (``str``).
+		This can contain any keys or values from ``MARKETPLACE_IDS``.
+
+		*skus* (**iterable**) contains the SKU (``str``) of each product to
+		get.
+
+		*workers* (``int``) is the number of calls to send concurrently per
+		marketplace. Default is ``None`` for the quota of the action.
+
+		See *get_my_price()* for the other arguments.
+
+		Returns a ``dict`` mapping each Marketplace ID (``str``) to the
+		``dict`` mapping each SKU (``str``) to its result. See
+		*parse_product_results()*.
+		"""
+		if isinstance(marketplaces, six.string_types):
+			raise TypeError("marketplaces:{!r} is not a sequence.".format(marketplaces))
+
+		skus = list(skus)
+		region = _ENDPOINT_REGIONS.get(self.endpoint)
+		tasks = []
+		for task_region, marketplace_ids in sorted(six.iteritems(group_marketplaces(marketplaces))):
+			products = self if task_region == region else self.for_region(task_region)
+			tasks.extend((products, marketplace_id) for marketplace_id in marketplace_ids)
+
+		def get_prices(task):
+			products, marketplace_id = task
+			return products.get_my_price_bulk(marketplace_id, 'SellerSKU', skus, condition=condition, workers=workers, debug=debug)
+
+		matrix = {}
+		for (_products, marketplace_id), prices, error in amazonmws.throttle.run_throttled(get_prices, tasks, workers=len(tasks) or 1):
+			matrix[marketplace_id] = prices if error is None else {sku: error for sku in skus}
+
+		return matrix
+
+	def get_throttle(self, action):
+		"""
+		Gets the throttle shared by all requests for the specified action.
+
+		*action* (``str``) is the Products API action (e.g.,
+		"GetMyPriceForSKU") from ``THROTTLE_MAX_REQUESTS``.
+
+		Returns the throttle (``amazonmws.throttle.Throttle``).
+		"""
+		return amazonmws.throttle.get_throttle(self, action, THROTTLE_MAX_REQUESTS[action], THROTTLE_RESTORE_RATES[action])
+
 	def list_matching(self, marketplace_id, query, context, debug=None):
 		"""
 		Requests the marketplace products that match the query.
@@ -468,3 +710,798 @@ class MWSProducts(amazonmws.mws.MWS):
 			'Timestamp': datetime_to_iso8601(datetime.datetime.utcnow()),
 			'Version': self.products_api_version
 		}
+
+	def _get_bulk(self, action, id_type, ids, get_chunk, workers):
+		"""
+		Gets the results of any number of IDs by splitting them into calls
+		of the maximum number of IDs, and sending them concurrently within
+		the quota of the action.
+
+		*action* (``str``) is the base action key (e.g., "get_my_price").
+
+		*id_type* (``str``) is the type of ID used.
+
+		*ids* (**iterable**) contains the ID (``str``) of each product.
+
+		*get_chunk* (**callable**) is called with the ``list`` of IDs in a
+		chunk, and returns the response XML (``str``).
+
+		*workers* (``int``) is the number of calls to send concurrently.
+
+		Returns a ``dict`` mapping each ID (``str``) to its result. See
+		*parse_product_results()*.
+		"""
+		action = _action_key(action, id_type)
+
+		id_list = []
+		seen = set()
+		for i, id_ in enumerate(ids):
+			if not isinstance(id_, six.string_types):
+				raise TypeError("ids[{}]:{!r} is not a string.".format(i, id_))
+			if id_ not in seen:
+				seen.add(id_)
+				id_list.append(id_)
+
+		size = MAX_IDS[action]
+		chunks = [id_list[i:i + size] for i in six.moves.range(0, len(id_list), size)]
+
+		def get_results(chunk):
+			return parse_product_results(get_chunk(chunk))
+
+		results = {}
+		throttle = self.get_throttle(ACTIONS[action])
+		cost = len if ACTIONS[action] in THROTTLE_PER_ITEM else None
+		for chunk, found, error in amazonmws.throttle.run_throttled(get_results, chunks, throttle=throttle, workers=workers, cost=cost):
+			for id_ in chunk:
+				results[id_] = error if error is not None else found.get(id_)
+
+		return results
+
+
+class CategoryTree(object):
+	"""
+	The ``CategoryTree`` class memoizes product category lookups for a
+	marketplace. The categories of each response are merged into a shared
+	tree of category nodes, and each product is mapped to its leaf nodes
+	so that repeated lookups, and the ancestry of any category already
+	seen, are answered without sending requests.
+	"""
+
+	def __init__(self, products, marketplace_id, workers=None):
+		"""
+		Initializes the ``CategoryTree`` instance.
+
+		*products* (``MWSProducts``) is the Products API.
+
+		*marketplace_id* (``str``) is the ID of the Amazon Marketplace the
+		products belong to.
+
+		*workers* (``int``) is the number of calls sent concurrently when
+		fetching. Default is ``None`` for the quota of the action.
+		"""
+		if not isinstance(products, MWSProducts):
+			raise TypeError("products:{!r} is not an MWSProducts.".format(products))
+
+		if not isinstance(marketplace_id, six.string_types):
+			raise TypeError("marketplace_id:{!r} is not a str.".format(marketplace_id))
+		elif not marketplace_id:
+			raise ValueError("marketplace_id:{!r} cannot be empty.".format(marketplace_id))
+
+		self.marketplace_id = marketplace_id
+		"""
+		*marketplace_id* (``str``) is the ID of the Amazon Marketplace the
+		products belong to.
+		"""
+
+		self.products = products
+		"""
+		*products* (``MWSProducts``) is the Products API.
+		"""
+
+		self.workers = workers
+		"""
+		*workers* (``int``) is the number of calls sent concurrently when
+		fetching.
+		"""
+
+		self._children = {}
+		"""
+		*_children* (``dict``) maps the ID (``str``) of each category to the
+		``set`` of the ID (``str``) of each of its child categories.
+		"""
+
+		self._leaves = {}
+		"""
+		*_leaves* (``dict``) maps the ``tuple`` of ID type (``str``) and ID
+		(``str``) of each product looked up to the ``tuple`` of the ID
+		(``str``) of each of its leaf categories.
+		"""
+
+		self._lock = threading.Lock()
+		"""
+		*_lock* (``threading.Lock``) synchronizes access to *_children*,
+		*_leaves*, *_nodes* and *_pending*.
+		"""
+
+		self._nodes = {}
+		"""
+		*_nodes* (``dict``) maps the ID (``str``) of each category to a
+		``tuple`` containing: its name (``str``), and the ID (``str``) of its
+		parent category or ``None`` for a root category.
+		"""
+
+		self._pending = {}
+		"""
+		*_pending* (``dict``) maps the ``tuple`` of ID type and ID of each
+		product being fetched to its result
+		(``amazonmws.throttle.PendingResult``).
+		"""
+
+	def add(self, id_type, id_, data):
+		"""
+		Merges the categories from a GetProductCategoriesForASIN or
+		GetProductCategoriesForSKU response into the tree, and maps the
+		product to its leaf categories.
+
+		*id_type* (``str``) is the type of ID used, "ASIN" or "SellerSKU".
+
+		*id_* (``str``) is the ASIN or SKU of the product.
+
+		*data* (``str``) is the response XML.
+
+		Returns the ``tuple`` of the ID (``str``) of each leaf category of
+		the product.
+		"""
+		paths = parse_categories(data)
+		leaves = tuple(path[0][0] for path in paths if path)
+		with self._lock:
+			for path in paths:
+				for i, (category_id, name) in enumerate(path):
+					parent_id = path[i + 1][0] if i + 1 < len(path) else None
+					self._nodes[category_id] = (name, parent_id)
+					if parent_id is not None:
+						self._children.setdefault(parent_id, set()).add(category_id)
+			self._leaves[(id_type, id_)] = leaves
+		return leaves
+
+	def ancestry(self, category_id):
+		"""
+		Gets the ancestry of the category from the tree.
+
+		*category_id* (``str``) is the ID of the category.
+
+		Returns the ``list`` of each category (``dict``) from the root
+		category to the specified category (see *node()*), or ``None`` if
+		the category is not in the tree.
+		"""
+		path = []
+		with self._lock:
+			while category_id is not None and category_id in self._nodes:
+				path.append(self._node(category_id))
+				category_id = self._nodes[category_id][1]
+		path.reverse()
+		return path or None
+
+	def children(self, category_id):
+		"""
+		Gets the known child categories of the category from the tree.
+
+		*category_id* (``str``) is the ID of the category.
+
+		Returns the ``list`` of each child category (``dict``) seen so far
+		sorted by ID (see *node()*).
+		"""
+		with self._lock:
+			return [self._node(child_id) for child_id in sorted(self._children.get(category_id, ()))]
+
+	def clear(self):
+		"""
+		Removes all categories and product mappings.
+		"""
+		with self._lock:
+			self._children.clear()
+			self._leaves.clear()
+			self._nodes.clear()
+
+	def get(self, id_type, ids, refresh=None):
+		"""
+		Gets the leaf categories of the specified products. Products that
+		have not been looked up yet are fetched concurrently within the quota
+		of the action, and concurrent lookups of the same product share one
+		request.
+
+		*id_type* (``str``) is the type of ID used, "ASIN" or "SellerSKU".
+
+		*ids* (**iterable**) contains the ASIN or SKU (``str``) of each
+		product.
+
+		*refresh* (``bool``) is whether the products are fetched even if they
+		have already been looked up. Default is ``None`` for ``False``.
+
+		Returns a ``dict`` mapping each ID (``str``) to either the ``tuple``
+		of the ID (``str``) of each of its leaf categories (see
+		*ancestry()*), or the error (``Exception``) that occurred fetching
+		it.
+		"""
+		action = _action_key('get_categories', id_type)
+
+		id_list = list(ids)
+		for i, id_ in enumerate(id_list):
+			if not isinstance(id_, six.string_types):
+				raise TypeError("ids[{}]:{!r} is not a string.".format(i, id_))
+
+		results = {}
+		fetch = []
+		wait = []
+		with self._lock:
+			for id_ in id_list:
+				if id_ in results:
+					continue
+				key = (id_type, id_)
+				results[id_] = self._leaves.get(key)
+				if key in self._pending:
+					wait.append((id_, self._pending[key]))
+				elif refresh or results[id_] is None:
+					self._pending[key] = amazonmws.throttle.PendingResult()
+					fetch.append(id_)
+
+		def get_leaves(id_):
+			return self.add(id_type, id_, self.products.get_categories(self.marketplace_id, id_type, id_))
+
+		throttle = self.products.get_throttle(ACTIONS[action])
+		for id_, leaves, error in amazonmws.throttle.run_throttled(get_leaves, fetch, throttle=throttle, workers=self.workers):
+			with self._lock:
+				pending = self._pending.pop((id_type, id_))
+			if error is not None:
+				pending.set_error(error)
+				results[id_] = error
+			else:
+				pending.set_result(leaves)
+				results[id_] = leaves
+
+		for id_, pending in wait:
+			try:
+				results[id_] = pending.wait()
+			except Exception as e:
+				results[id_] = e
+
+		return results
+
+	def node(self, category_id):
+		"""
+		Gets the category from the tree.
+
+		*category_id* (``str``) is the ID of the category.
+
+		Returns the category (``dict``) containing: "id" (``str``), "name"
+		(``str``), and "parent_id" (``str``) or ``None`` for a root
+		category; or ``None`` if the category is not in the tree.
+		"""
+		with self._lock:
+			return self._node(category_id) if category_id in self._nodes else None
+
+	def _node(self, category_id):
+		"""
+		Gets the category from the tree. *_lock* must be held.
+
+		*category_id* (``str``) is the ID of the category.
+
+		Returns the category (``dict``). See *node()*.
+		"""
+		name, parent_id = self._nodes[category_id]
+		return {'id': category_id, 'name': name, 'parent_id': parent_id}
+
+
+class PricingCache(object):
+	"""
+	The ``PricingCache`` class caches pricing lookups in memory. Entries
+	are keyed by marketplace, ID type, ID and condition, expire after a
+	TTL, and the least recently used entries are evicted once the cache
+	is full. Within a grace period after expiring, the stale entry is
+	returned while it is refreshed in the background with the other stale
+	entries in batched calls. Concurrent lookups of the same missing entry
+	share one request.
+	"""
+
+	def __init__(self, products, action, ttl=None, grace=None, max_size=None, workers=None):
+		"""
+		Initializes the ``PricingCache`` instance.
+
+		*products* (``MWSProducts``) is the Products API.
+
+		*action* (``str``) is the lookup to cache: "get_competitive_pricing",
+		"get_lowest_listings" or "get_my_price".
+
+		*ttl* (``int`` or ``float``) is the number of seconds an entry is
+		fresh for. Default is ``None`` for 300 (5 minutes).
+
+		*grace* (``int`` or ``float``) is the number of seconds after
+		expiring an entry is still returned while it is refreshed. Default
+		is ``None`` for 60.
+
+		*max_size* (``int``) is the maximum number of entries. Default is
+		``None`` for 10000.
+
+		*workers* (``int``) is the number of calls sent concurrently when
+		fetching. Default is ``None`` for the quota of the action.
+		"""
+		if not isinstance(products, MWSProducts):
+			raise TypeError("products:{!r} is not an MWSProducts.".format(products))
+
+		if action not in PRICING_ACTIONS:
+			raise ValueError("action:{!r} is not one of {!r}.".format(action, PRICING_ACTIONS))
+
+		if ttl is None:
+			ttl = 300
+		elif not isinstance(ttl, (float,) + six.integer_types):
+			raise TypeError("ttl:{!r} is not a number.".format(ttl))
+
+		if grace is None:
+			grace = 60
+		elif not isinstance(grace, (float,) + six.integer_types):
+			raise TypeError("grace:{!r} is not a number.".format(grace))
+
+		if max_size is None:
+			max_size = 10000
+		elif not isinstance(max_size, six.integer_types):
+			raise TypeError("max_size:{!r} is not an integer.".format(max_size))
+		elif max_size < 1:
+			raise ValueError("max_size:{!r} cannot be less than 1.".format(max_size))
+
+		self.action = action
+		"""
+		*action* (``str``) is the lookup being cached.
+		"""
+
+		self.grace = grace
+		"""
+		*grace* (``int`` or ``float``) is the number of seconds after
+		expiring an entry is still returned while it is refreshed.
+		"""
+
+		self.max_size = max_size
+		"""
+		*max_size* (``int``) is the maximum number of entries.
+		"""
+
+		self.products = products
+		"""
+		*products* (``MWSProducts``) is the Products API.
+		"""
+
+		self.ttl = ttl
+		"""
+		*ttl* (``int`` or ``float``) is the number of seconds an entry is
+		fresh for.
+		"""
+
+		self.workers = workers
+		"""
+		*workers* (``int``) is the number of calls sent concurrently when
+		fetching.
+		"""
+
+		self._entries = collections.OrderedDict()
+		"""
+		*_entries* (``collections.OrderedDict``) maps the key (``tuple``) of
+		each entry to a ``tuple`` containing: when it was fetched
+		(``float``), and its result (``dict``). Entries are ordered from the
+		least to most recently used.
+		"""
+
+		self._lock = threading.Lock()
+		"""
+		*_lock* (``threading.Lock``) synchronizes access to *_entries*,
+		*_pending* and *_refreshing*.
+		"""
+
+		self._pending = {}
+		"""
+		*_pending* (``dict``) maps the key (``tuple``) of each entry being
+		fetched to its result (``amazonmws.throttle.PendingResult``).
+		"""
+
+		self._refreshing = set()
+		"""
+		*_refreshing* (``set``) contains the key (``tuple``) of each entry
+		being refreshed in the background.
+		"""
+
+	def clear(self):
+		"""
+		Removes all entries.
+		"""
+		with self._lock:
+			self._entries.clear()
+
+	def get(self, marketplace_id, id_type, ids, condition=None):
+		"""
+		Gets the pricing of the specified products. Fresh and stale entries
+		are returned from the cache. Missing and expired entries are fetched
+		in batched calls before returning.
+
+		*marketplace_id* (``str``) is the ID of the Amazon Marketplace the
+		products belong to.
+
+		*id_type* (``str``) is the type of ID used. This can only be
+		"ASIN" or "SellerSKU".
+
+		*ids* (**iterable**) contains the ID (``str``) of each product.
+
+		*condition* (``str``) optionally is the item condition of the lookup.
+		See *MWSProducts.get_lowest_listings()*. This is not supported by
+		"get_competitive_pricing". Default is ``None``.
+
+		Returns a ``dict`` mapping each ID (``str``) to its result. Errors
+		are returned but not cached. See *parse_product_results()*.
+		"""
+		if condition is not None and self.action == 'get_competitive_pricing':
+			raise ValueError("condition:{!r} is not supported by {!r}.".format(condition, self.action))
+
+		now = _clock()
+		results = {}
+		missing = []
+		stale = []
+		wait = []
+		with self._lock:
+			for id_ in ids:
+				key = (marketplace_id, id_type, id_, condition)
+				entry = self._entries.get(key)
+				age = now - entry[0] if entry is not None else None
+				if entry is None or age > self.ttl + self.grace:
+					if key in self._pending:
+						wait.append((id_, self._pending[key]))
+					else:
+						self._pending[key] = amazonmws.throttle.PendingResult()
+						missing.append(id_)
+					continue
+
+				# Mark the entry as most recently used.
+				del self._entries[key]
+				self._entries[key] = entry
+				results[id_] = entry[1]
+				if age > self.ttl and key not in self._refreshing:
+					self._refreshing.add(key)
+					stale.append(id_)
+
+		if stale:
+			thread = threading.Thread(target=self._refresh, args=(marketplace_id, id_type, stale, condition))
+			thread.daemon = True
+			thread.start()
+
+		if missing:
+			fetched = {}
+			error = None
+			try:
+				fetched = self._fetch(marketplace_id, id_type, missing, condition)
+			except Exception as e:
+				error = e
+				raise
+			finally:
+				with self._lock:
+					pending = [self._pending.pop((marketplace_id, id_type, id_, condition)) for id_ in missing]
+				for id_, result in zip(missing, pending):
+					if error is not None:
+						result.set_error(error)
+					else:
+						result.set_result(fetched.get(id_))
+			results.update(fetched)
+
+		for id_, pending in wait:
+			try:
+				results[id_] = pending.wait()
+			except Exception as e:
+				results[id_] = e
+
+		return results
+
+	def _fetch(self, marketplace_id, id_type, ids, condition):
+		"""
+		Fetches the pricing of the products, and caches the results.
+
+		*marketplace_id* (``str``) is the ID of the Amazon Marketplace.
+
+		*id_type* (``str``) is the type of ID used.
+
+		*ids* (``list``) contains the ID (``str``) of each product.
+
+		*condition* (``str``) is the item condition, or ``None``.
+
+		Returns a ``dict`` mapping each ID (``str``) to its result.
+		"""
+		kwargs = {'workers': self.workers}
+		if condition is not None:
+			kwargs['condition'] = condition
+		results = getattr(self.products, self.action + '_bulk')(marketplace_id, id_type, ids, **kwargs)
+
+		now = _clock()
+		with self._lock:
+			for id_, result in six.iteritems(results):
+				if isinstance(result, Exception):
+					continue
+				key = (marketplace_id, id_type, id_, condition)
+				self._entries.pop(key, None)
+				self._entries[key] = (now, result)
+			while len(self._entries) > self.max_size:
+				self._entries.popitem(last=False)
+
+		return results
+
+	def _refresh(self, marketplace_id, id_type, ids, condition):
+		"""
+		Refreshes the stale entries of the products in the background.
+
+		*marketplace_id* (``str``) is the ID of the Amazon Marketplace.
+
+		*id_type* (``str``) is the type of ID used.
+
+		*ids* (``list``) contains the ID (``str``) of each product.
+
+		*condition* (``str``) is the item condition, or ``None``.
+		"""
+		try:
+			self._fetch(marketplace_id, id_type, ids, condition)
+		except Exception:
+			# The stale entries are kept until they expire.
+			pass
+		finally:
+			with self._lock:
+				for id_ in ids:
+					self._refreshing.discard((marketplace_id, id_type, id_, condition))
+
+
+class ProductBatcher(object):
+	"""
+	The ``ProductBatcher`` class coalesces the single product lookups of
+	many threads into batched calls. Lookups are gathered over a short
+	window (or until a call is full), sent as one call, and the result of
+	each ID is returned to the threads waiting on it.
+	"""
+
+	def __init__(self, products, action, window=None):
+		"""
+		Initializes the ``ProductBatcher`` instance.
+
+		*products* (``MWSProducts``) is the Products API.
+
+		*action* (``str``) is the lookup to batch: "get_competitive_pricing",
+		"get_lowest_listings", "get_my_price" or "get_products".
+
+		*window* (``float``) is the number of seconds lookups are gathered
+		for before the call is sent. Default is ``None`` for 0.05.
+		"""
+		if not isinstance(products, MWSProducts):
+			raise TypeError("products:{!r} is not an MWSProducts.".format(products))
+
+		if action not in BATCH_ACTIONS:
+			raise ValueError("action:{!r} is not one of {!r}.".format(action, BATCH_ACTIONS))
+
+		if window is None:
+			window = 0.05
+		elif not isinstance(window, (float,) + six.integer_types):
+			raise TypeError("window:{!r} is not a number.".format(window))
+		elif window < 0:
+			raise ValueError("window:{!r} cannot be less than 0.".format(window))
+
+		self.action = action
+		"""
+		*action* (``str``) is the lookup being batched.
+		"""
+
+		self.products = products
+		"""
+		*products* (``MWSProducts``) is the Products API.
+		"""
+
+		self.window = window
+		"""
+		*window* (``float``) is the number of seconds lookups are gathered
+		for.
+		"""
+
+		self._batches = {}
+		"""
+		*_batches* (``dict``) maps the key (``tuple``) of each batch being
+		gathered to the ``dict`` mapping each ID (``str``) to its result
+		(``PendingResult``).
+		"""
+
+		self._lock = threading.Lock()
+		"""
+		*_lock* (``threading.Lock``) synchronizes access to *_batches*.
+		"""
+
+	def flush(self):
+		"""
+		Sends all of the batches being gathered immediately.
+		"""
+		with self._lock:
+			batches = list(six.iteritems(self._batches))
+			self._batches.clear()
+		for key, batch in batches:
+			self._send(key, batch)
+
+	def lookup(self, marketplace_id, id_type, id_, timeout=None, **kwargs):
+		"""
+		Looks up a product, waiting for its batch to be sent.
+
+		*timeout* (``float``) is the maximum number of seconds to wait.
+		Default is ``None`` to wait indefinitely.
+
+		See *submit()* for the other arguments.
+
+		Raises the error (``MWSError``) returned for the ID, or the error
+		raised by the call.
+
+		Returns the result (``dict``) of the ID, or ``None`` if Amazon did
+		not return it. See *parse_product_results()*.
+		"""
+		return self.submit(marketplace_id, id_type, id_, **kwargs).wait(timeout)
+
+	def submit(self, marketplace_id, id_type, id_, **kwargs):
+		"""
+		Adds a product to the batch being gathered without waiting for it.
+
+		*marketplace_id* (``str``) is the ID of the Amazon Marketplace the
+		product belongs to.
+
+		*id_type* (``str``) is the type of ID used.
+
+		*id_* (``str``) is the ID of the product.
+
+		*kwargs* contains any other arguments of the lookup (e.g.,
+		"condition"). Only lookups with the same arguments are batched
+		together.
+
+		Returns the pending result (``amazonmws.throttle.PendingResult``).
+		"""
+		if not isinstance(id_, six.string_types):
+			raise TypeError("id_:{!r} is not a string.".format(id_))
+		elif not id_:
+			raise ValueError("id_:{!r} cannot be empty.".format(id_))
+
+		# Validate the ID type before a batch is created for it.
+		max_ids = MAX_IDS[_action_key(self.action, id_type)]
+
+		key = (marketplace_id, id_type, tuple(sorted(six.iteritems(kwargs))))
+		full = None
+		with self._lock:
+			batch = self._batches.get(key)
+			if batch is None:
+				batch = self._batches[key] = {}
+				timer = threading.Timer(self.window, self._send_expired, (key, batch))
+				timer.daemon = True
+				timer.start()
+
+			pending = batch.get(id_)
+			if pending is None:
+				pending = batch[id_] = amazonmws.throttle.PendingResult()
+				if len(batch) >= max_ids:
+					full = self._batches.pop(key)
+
+		if full is not None:
+			thread = threading.Thread(target=self._send, args=(key, full))
+			thread.daemon = True
+			thread.start()
+
+		return pending
+
+	def _send(self, key, batch):
+		"""
+		Sends the batch, and finishes the result of each ID.
+
+		*key* (``tuple``) is the key of the batch.
+
+		*batch* (``dict``) maps each ID (``str``) to its result
+		(``PendingResult``).
+		"""
+		marketplace_id, id_type, kwargs = key
+		method = getattr(self.products, self.action)
+		kwargs = dict(kwargs)
+		try:
+			action = _action_key(self.action, id_type)
+			throttle = self.products.get_throttle(ACTIONS[action])
+			cost = len(batch) if ACTIONS[action] in THROTTLE_PER_ITEM else None
+			results = throttle.call(lambda: parse_product_results(method(marketplace_id, id_type, list(batch), **kwargs)), cost=cost)
+		except Exception as e:
+			for pending in six.itervalues(batch):
+				pending.set_error(e)
+			return
+
+		for id_, pending in six.iteritems(batch):
+			result = results.get(id_)
+			if isinstance(result, MWSError):
+				pending.set_error(result)
+			else:
+				pending.set_result(result)
+
+	def _send_expired(self, key, batch):
+		"""
+		Sends the batch once its window expires unless it was already sent.
+
+		*key* (``tuple``) is the key of the batch.
+
+		*batch* (``dict``) is the batch.
+		"""
+		with self._lock:
+			if self._batches.get(key) is not batch:
+				return
+			del self._batches[key]
+		self._send(key, batch)
+
+
+def parse_categories(data):
+	"""
+	Parses a GetProductCategoriesForASIN or GetProductCategoriesForSKU
+	response.
+
+	*data* (``str``) is the response XML.
+
+	Returns the ``list`` of each category path (``list``) of the product.
+	Each path contains a ``tuple`` for each category from the leaf to the
+	root category containing: the ID (``str``), and the name (``str``) of
+	the category.
+	"""
+	root = parse_response(data)
+	paths = []
+	for elem in root.iter('Self'):
+		path = []
+		while elem is not None:
+			path.append((elem.findtext('ProductCategoryId'), elem.findtext('ProductCategoryName')))
+			elem = elem.find('Parent')
+		paths.append(path)
+	return paths
+
+def parse_product_results(data):
+	"""
+	Parses the per-ID results of a GetMatchingProduct,
+	GetMatchingProductForId, GetCompetitivePricingForASIN/SKU,
+	GetLowestOfferListingsForASIN/SKU or GetMyPriceForASIN/SKU response.
+
+	*data* (``str``) is the response XML.
+
+	Returns a ``dict`` mapping each requested ID (``str``) to either its
+	result (``dict``) mapping each field (e.g., "Product" or "Products")
+	to its value (see *amazonmws.util.element_to_dict()*), or the error
+	(``MWSError``) Amazon returned for the ID.
+	"""
+	root = parse_response(data)
+	results = {}
+	for elem in root:
+		if not elem.tag.endswith('Result'):
+			continue
+
+		id_ = elem.get('ASIN') or elem.get('SellerSKU') or elem.get('Id')
+		if id_ is None:
+			continue
+
+		if elem.get('status', 'Success') == 'Success':
+			results[id_] = element_to_dict(elem)
+		else:
+			error = elem.find('Error')
+			results[id_] = MWSError(
+				error.findtext('Code') if error is not None else elem.get('status'),
+				error.findtext('Message') if error is not None else None,
+				type_=error.findtext('Type') if error is not None else None,
+			)
+
+	return results
+
+def _action_key(action, id_type):
+	"""
+	Gets the action key of a lookup for the ID type.
+
+	*action* (``str``) is the lookup (e.g., "get_my_price").
+
+	*id_type* (``str``) is the type of ID used.
+
+	Returns the action key (``str``) from ``ACTIONS``.
+	"""
+	id_type = ID_TYPES.get(id_type, id_type)
+	if action == 'get_products':
+		return action if id_type == 'ASIN' else 'get_products_for_id'
+	elif id_type == 'ASIN':
+		return action + '_for_asin'
+	elif id_type == 'SellerSKU':
+		return action + '_for_sku'
+	raise ValueError("id_type:{!r} is not 'ASIN' or 'SellerSKU'.".format(id_type))
@@ -0,0 +1,312 @@
+# coding: utf-8
+"""
+This module provides a local SQLite index of the Report metadata listed
+by the Amazon MWS Reports API so that Reports can be found without
+paging through GetReportList every time.
+"""
+
+__created__ = "2026-10-19"
+__modified__ = "2026-10-19"
+
+import six # Python2/Python3 compatibility library.
+import datetime
+from amazonmws.reports import REPORT_TYPES, MWSReports, parse_reports
+from amazonmws.util import SQLiteStore, datetime_to_iso8601, index_date, iso8601_to_datetime
+
+#: The SQL statements used to create the index tables.
+SCHEMA = (
+	"""
+	CREATE TABLE IF NOT EXISTS reports (
+		report_id TEXT PRIMARY KEY,
+		report_type TEXT NOT NULL,
+		request_id TEXT,
+		available_date TEXT NOT NULL,
+		acknowledged INTEGER NOT NULL DEFAULT 0
+	)
+	""",
+	"CREATE INDEX IF NOT EXISTS reports_type_date ON reports (report_type, available_date)",
+	"CREATE INDEX IF NOT EXISTS reports_ack_type_date ON reports (acknowledged, report_type, available_date)",
+	"CREATE INDEX IF NOT EXISTS reports_request ON reports (request_id)",
+	"""
+	CREATE TABLE IF NOT EXISTS sync_state (
+		name TEXT PRIMARY KEY,
+		value TEXT NOT NULL
+	)
+	""",
+)
+
+
+class ReportIndex(SQLiteStore):
+	"""
+	The ``ReportIndex`` class maintains a local SQLite index of Report
+	metadata (Report ID, type, Report Request ID, available date and
+	acknowledged state). The index is synced incrementally using the
+	latest available date seen as the AvailableFromDate watermark, and
+	queries are answered locally.
+	"""
+
+	def __init__(self, reports, path=None, overlap=None):
+		"""
+		Initializes the ``ReportIndex`` instance.
+
+		*reports* (``MWSReports``) is the Reports API used to sync the index.
+
+		*path* (``str``) is the path of the SQLite database file. Default is
+		``None`` for ":memory:" to not persist the index.
+
+		*overlap* (``int`` or ``float``) is the number of seconds the
+		watermark is moved back by when syncing to tolerate clock skew and
+		Reports becoming available out of order. Default is ``None`` for
+		300 (5 minutes).
+		"""
+		if not isinstance(reports, MWSReports):
+			raise TypeError("reports:{!r} is not an MWSReports.".format(reports))
+
+		if overlap is None:
+			overlap = 300
+		elif not isinstance(overlap, (float,) + six.integer_types):
+			raise TypeError("overlap:{!r} is not a number.".format(overlap))
+
+		self.overlap = overlap
+		"""
+		*overlap* (``int`` or ``float``) is the number of seconds the
+		watermark is moved back by when syncing.
+		"""
+
+		self.reports = reports
+		"""
+		*reports* (``MWSReports``) is the Reports API used to sync the index.
+		"""
+
+		SQLiteStore.__init__(self, path, SCHEMA)
+
+	def find(self, report_types=None, acknowledged=None, from_date=None, to_date=None, limit=None):
+		"""
+		Finds the indexed Reports that match the query.
+
+		*report_types* (**sequence**) is used to filter on Report Type
+		(``str``). This can contain any keys or values from
+		``REPORT_TYPES``. Default is ``None`` to not filter on Report Type.
+
+		*acknowledged* (``bool``) is used to filter on whether Reports have
+		been acknowledged (``True``), or not (``False``). Default is
+		``None`` to not filter on Acknowledged state.
+
+		*from_date* (``datetime`` or ``float``) is the start of the
+		available date range. Default is ``None`` for no start.
+
+		*to_date* (``datetime`` or ``float``) is the end of the available
+		date range. Default is ``None`` for no end.
+
+		*limit* (``int``) is the maximum number of Reports to return.
+		Default is ``None`` for no limit.
+
+		Returns the ``list`` of each matching Report (``dict``) ordered from
+		the most to least recently available. See *row_to_report()*.
+		"""
+		where = []
+		params = []
+
+		if report_types is not None:
+			report_types = [REPORT_TYPES.get(report_type, report_type) for report_type in report_types]
+			where.append("report_type IN ({})".format(", ".join("?" * len(report_types))))
+			params.extend(report_types)
+
+		if acknowledged is not None:
+			where.append("acknowledged = ?")
+			params.append(1 if acknowledged else 0)
+
+		if from_date is not None:
+			where.append("available_date >= ?")
+			params.append(index_date(datetime_to_iso8601(from_date, name='from_date')))
+
+		if to_date is not None:
+			where.append("available_date <= ?")
+			params.append(index_date(datetime_to_iso8601(to_date, name='to_date')))
+
+		sql = "SELECT report_id, report_type, request_id, available_date, acknowledged FROM reports"
+		if where:
+			sql += " WHERE " + " AND ".join(where)
+		sql += " ORDER BY available_date DESC"
+		if limit is not None:
+			sql += " LIMIT ?"
+			params.append(int(limit))
+
+		with self._lock:
+			rows = self._db.execute(sql, params).fetchall()
+		return [row_to_report(row) for row in rows]
+
+	def get_watermark(self, report_type=None):
+		"""
+		Gets the AvailableFromDate watermark.
+
+		*report_type* (``str``) is the Report Type to get the watermark of.
+		This can be any key or value from ``REPORT_TYPES``. Default is
+		``None`` for the watermark of full syncs.
+
+		Returns the latest available date (``datetime``) that has been
+		synced, or ``None`` if the index has not been synced yet.
+		"""
+		names = [_watermark_name(None)]
+		if report_type is not None:
+			names.append(_watermark_name(report_type))
+
+		with self._lock:
+			values = [row[0] for row in self._db.execute("SELECT value FROM sync_state WHERE name IN ({})".format(", ".join("?" * len(names))), names)]
+		return iso8601_to_datetime(max(values)) if values else None
+
+	def latest(self, report_type, acknowledged=None):
+		"""
+		Gets the most recently available Report of the specified type.
+
+		*report_type* (``str``) is the Report Type. This can be any key or
+		value from ``REPORT_TYPES``.
+
+		*acknowledged* (``bool``) is used to filter on whether the Report
+		has been acknowledged (``True``), or not (``False``). Default is
+		``None`` to not filter on Acknowledged state.
+
+		Returns the Report (``dict``) if found; otherwise, ``None``.
+		"""
+		reports = self.find(report_types=[report_type], acknowledged=acknowledged, limit=1)
+		return reports[0] if reports else None
+
+	def set_acknowledged(self, report_ids, acknowledged=True):
+		"""
+		Updates the local acknowledged state of the specified Reports. This
+		should be called after acknowledging Reports with Amazon so that the
+		index reflects it without having to be resynced.
+
+		*report_ids* (**iterable**) contains each Report ID (``str``).
+
+		*acknowledged* (``bool``) is whether the Reports are acknowledged.
+		Default is ``True``.
+		"""
+		flag = 1 if acknowledged else 0
+		with self._lock, self._db:
+			self._db.executemany("UPDATE reports SET acknowledged = ? WHERE report_id = ?", [(flag, report_id) for report_id in report_ids])
+
+	def set_watermark(self, watermark, report_types=None):
+		"""
+		Advances the AvailableFromDate watermark. A watermark is never moved
+		back.
+
+		*watermark* (``datetime`` or ``float``) is the latest available date
+		that has been synced.
+
+		*report_types* (**sequence**) contains each Report Type (``str``)
+		whose watermark is advanced. This can contain any keys or values
+		from ``REPORT_TYPES``. Default is ``None`` for the watermark of full
+		syncs.
+		"""
+		value = index_date(datetime_to_iso8601(watermark, name='watermark'))
+		names = [_watermark_name(report_type) for report_type in report_types] if report_types is not None else [_watermark_name(None)]
+		with self._lock, self._db:
+			self._db.executemany("INSERT OR REPLACE INTO sync_state (name, value) SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM sync_state WHERE name = ? AND value >= ?)", [(name, value, name, value) for name in names])
+
+	def sync(self, report_types=None, debug=None):
+		"""
+		Syncs the index with the Reports that became available since the
+		watermark. The pages are listed within the GetReportList quotas, and
+		the watermark is only advanced once all of the Reports have been
+		listed.
+
+		*report_types* (**sequence**) is used to only sync the specified
+		Report Types (``str``). This can contain any keys or values from
+		``REPORT_TYPES``. Default is ``None`` for all Report Types. A
+		watermark is kept for each Report Type synced this way so that
+		partial syncs do not skip the Reports of other types.
+
+		Returns the number of Reports synced (``int``).
+		"""
+		if report_types is None:
+			watermark = self.get_watermark()
+		else:
+			if isinstance(report_types, six.string_types):
+				raise TypeError("report_types:{!r} is not a sequence.".format(report_types))
+			report_types = [REPORT_TYPES.get(report_type, report_type) for report_type in report_types]
+			watermarks = [self.get_watermark(report_type) for report_type in report_types]
+			watermark = min(watermarks) if watermarks and None not in watermarks else None
+		from_date = watermark - datetime.timedelta(seconds=self.overlap) if watermark is not None else None
+
+		throttle = self.reports.get_throttle('GetReportList')
+		next_throttle = self.reports.get_throttle('GetReportListByNextToken')
+
+		count = 0
+		latest = None
+		infos, next_token = throttle.call(lambda: parse_reports(self.reports.get_report_list(max_count=100, report_types=report_types, from_date=from_date, debug=debug)))
+		while True:
+			count += self.update(infos)
+			for info in infos:
+				available_date = iso8601_to_datetime(info['AvailableDate'])
+				if latest is None or available_date > latest:
+					latest = available_date
+
+			if not next_token:
+				break
+			infos, next_token = next_throttle.call(lambda: parse_reports(self.reports.get_report_list_next(next_token, debug=debug)))
+
+		# The Reports are listed from the most to least recently available,
+		# so the watermark is only saved after the last page.
+		if latest is not None:
+			self.set_watermark(latest, report_types=report_types)
+
+		return count
+
+	def update(self, infos):
+		"""
+		Upserts the specified Reports into the index. This does not advance
+		the watermark (see *set_watermark()*).
+
+		*infos* (**sequence**) contains each ReportInfo (``dict``) as
+		returned by *amazonmws.reports.parse_reports()*.
+
+		Returns the number of Reports upserted (``int``).
+		"""
+		rows = []
+		for info in infos:
+			rows.append((
+				info['ReportId'],
+				info['ReportType'],
+				info.get('ReportRequestId') or None,
+				index_date(info['AvailableDate']),
+				1 if info.get('Acknowledged') == 'true' else 0,
+			))
+
+		with self._lock, self._db:
+			self._db.executemany("INSERT OR REPLACE INTO reports (report_id, report_type, request_id, available_date, acknowledged) VALUES (?, ?, ?, ?, ?)", rows)
+
+		return len(rows)
+
+
+def row_to_report(row):
+	"""
+	Converts the specified index row into a Report.
+
+	*row* (``tuple``) is the row.
+
+	Returns the Report (``dict``) containing: "ReportId" (``str``),
+	"ReportType" (``str``), "ReportRequestId" (``str``), "AvailableDate"
+	(``datetime``) and "Acknowledged" (``bool``).
+	"""
+	report_id, report_type, request_id, available_date, acknowledged = row
+	return {
+		'ReportId': report_id,
+		'ReportType': report_type,
+		'ReportRequestId': request_id,
+		'AvailableDate': iso8601_to_datetime(available_date),
+		'Acknowledged': bool(acknowledged),
+	}
+
+def _watermark_name(report_type):
+	"""
+	Gets the name of the sync state holding a watermark.
+
+	*report_type* (``str``) is the Report Type, or ``None`` for the
+	watermark of full syncs.
+
+	Returns the name (``str``).
+	"""
+	if report_type is None:
+		return 'available_from'
+	return 'available_from:' + REPORT_TYPES.get(report_type, report_type)
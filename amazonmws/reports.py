@@ -10,8 +10,18 @@ __modified_by___ = "Joshua D. Burns"
 
 import six # Python2/Python3 compatibility library.
 import datetime
+import decimal
+import threading
+import time
 import amazonmws.mws
-from amazonmws.util import datetime_to_iso8601, encode_string, is_sequence, marketplace_args
+from amazonmws.mws import parse_response
+from amazonmws.throttle import PendingResult, get_throttle, run_throttled
+from amazonmws.util import datetime_to_iso8601, element_to_dict, encode_string, is_sequence, iso8601_to_datetime, marketplace_args
+
+try:
+	import xml.etree.cElementTree as ElementTree
+except ImportError:
+	import xml.etree.ElementTree as ElementTree
 
 #: Report types.
 REPORT_TYPES = {
@@ -51,6 +61,38 @@ REPORT_SCHEDULES = {
 	'never': '_NEVER_',
 }
 
+#: Maximum number of requests before being throttled.
+THROTTLE_MAX_REQUESTS = {
+	'CancelReportRequests': 10,
+	'GetReport': 15,
+	'GetReportCount': 10,
+	'GetReportList': 10,
+	'GetReportListByNextToken': 30,
+	'GetReportRequestCount': 10,
+	'GetReportRequestList': 10,
+	'GetReportScheduleCount': 10,
+	'GetReportScheduleList': 10,
+	'ManageReportSchedule': 10,
+	'RequestReport': 15,
+	'UpdateReportAcknowledgements': 10,
+}
+
+#: The number of seconds it takes to restore 1 request from the quota.
+THROTTLE_RESTORE_RATES = {
+	'CancelReportRequests': 45,
+	'GetReport': 60,
+	'GetReportCount': 45,
+	'GetReportList': 60,
+	'GetReportListByNextToken': 2,
+	'GetReportRequestCount': 45,
+	'GetReportRequestList': 45,
+	'GetReportScheduleCount': 45,
+	'GetReportScheduleList': 45,
+	'ManageReportSchedule': 45,
+	'RequestReport': 60,
+	'UpdateReportAcknowledgements': 45,
+}
+
 #: Report processing statuses.
 REPORT_STATUSES = {
 	'cancelled': '_CANCELLED_',
@@ -198,11 +240,12 @@ class MWSReports(amazonmws.mws.MWS):
 		   Order Reports (not Listing Reports) being returned.
 		
 		*from_date* (``datetime`` or ``float``) is the start of the date
-		range to use for selecting Report Requests. Default is ``None`` for
-		90 days ago.
+		range to use for selecting Reports by available date. Default is
+		``None`` for 90 days ago.
 		
 		*to_date* (``datetime`` or ``float``) is the end of the date range
-		to use for selecting Report Requests. Default is ``None`` for now.
+		to use for selecting Reports by available date. Default is ``None``
+		for now.
 		
 		*marketplaces* (**sequence**) is the list of Amazon Marketplace IDs
 		(``str``). Default is ``None`` for all marketplaces.
@@ -229,10 +272,10 @@ class MWSReports(amazonmws.mws.MWS):
 			args['Acknowledged'] = 'true' if acknowledged else 'false'
 			
 		if from_date:
-			args['RequestedFromDate'] = from_date
+			args['AvailableFromDate'] = from_date
 			
 		if to_date:
-			args['RequestedToDate'] = to_date
+			args['AvailableToDate'] = to_date
 			
 		if marketplaces is not None:
 			args.update(marketplace_args(marketplaces, name='marketplaces'))
@@ -270,11 +313,12 @@ class MWSReports(amazonmws.mws.MWS):
 		   Order Reports (not Listing Reports) being returned.
 		
 		*from_date* (``datetime`` or ``float``) is the start of the date
-		range to use for selecting Report Requests. Default is ``None`` for
-		90 days ago.
+		range to use for selecting Reports by available date. Default is
+		``None`` for 90 days ago.
 		
 		*to_date* (``datetime`` or ``float``) is the end of the date range
-		to use for selecting Report Requests. Default is ``None`` for now.
+		to use for selecting Reports by available date. Default is ``None``
+		for now.
 		
 		*marketplaces* (**sequence**) is the list of Amazon Marketplace IDs
 		(``str``). Default is ``None`` for all marketplaces.
@@ -314,10 +358,10 @@ class MWSReports(amazonmws.mws.MWS):
 				args['Acknowledged'] = 'true' if acknowledged else 'false'
 				
 			if from_date:
-				args['RequestedFromDate'] = from_date
+				args['AvailableFromDate'] = from_date
 				
 			if to_date:
-				args['RequestedToDate'] = to_date
+				args['AvailableToDate'] = to_date
 				
 			if marketplaces is not None:
 				args.update(marketplace_args(marketplaces, name='marketplaces'))
@@ -338,7 +382,7 @@ class MWSReports(amazonmws.mws.MWS):
 			raise TypeError("next_token:{!r} is not a string.".format(next_token))
 		elif not next_token:
 			raise ValueError("next_token:{!r} cannot be empty.".format(next_token))
-		next_token = next_token.encode('ASCII')
+		next_token = encode_string(next_token, 'ASCII', name='next_token')
 			
 		# Build args.
 		args = self.new_args()
@@ -495,7 +539,7 @@ class MWSReports(amazonmws.mws.MWS):
 			raise TypeError("next_token:{!r} is not a str.".format(next_token))
 		elif not next_token:
 			raise ValueError("next_token:{!r} cannot be empty.".format(next_token))
-		next_token = next_token.encode('ASCII')
+		next_token = encode_string(next_token, 'ASCII', name='next_token')
 			
 		# Build args.
 		args = self.new_args()
@@ -505,6 +549,17 @@ class MWSReports(amazonmws.mws.MWS):
 		# Send request.
 		return self.send_request(args, debug=debug)
 	
+	def get_throttle(self, action):
+		"""
+		Gets the throttle shared by all requests for the specified action.
+
+		*action* (``str``) is the Reports API action (e.g., "GetReportList")
+		from ``THROTTLE_MAX_REQUESTS``.
+
+		Returns the throttle (``amazonmws.throttle.Throttle``).
+		"""
+		return get_throttle(self, action, THROTTLE_MAX_REQUESTS[action], THROTTLE_RESTORE_RATES[action])
+
 	def new_args(self):
 		"""
 		Returns a new set of default arguments (``dict``).
@@ -547,7 +602,7 @@ class MWSReports(amazonmws.mws.MWS):
 			raise TypeError("report_type:{!r} is not a string.".format(report_type))
 		elif not report_type:
 			raise ValueError("report_type:{!r} cannot be empty.".format(report_type))
-		report_type = report_type.encode('ASCII')
+		report_type = encode_string(report_type, 'ASCII', name='report_type')
 		
 		if start_date is not None:
 			start_date = datetime_to_iso8601(start_date, name='start_date')
@@ -594,7 +649,7 @@ class MWSReports(amazonmws.mws.MWS):
 		"""
 		if not is_sequence(reports):
 			raise TypeError("reports:{!r} is not a sequence.".format(reports))
-		elif len(reports) < 0 or 100 < len(reports):
+		elif len(reports) < 1 or 100 < len(reports):
 			raise ValueError("reports len:{!r} must be between 1 and 100 inclusive.".format(len(reports)))
 
 		# Build args.
@@ -622,24 +677,709 @@ class MWSReports(amazonmws.mws.MWS):
 
 		# Send Request.
 		return self.send_request(args, debug=debug)
+
+	def update_report_acknowledgements_bulk(self, reports, acknowledged=None, marketplaces=None, workers=None, debug=None):
+		"""
+		Updates the acknowledged status of any number of Reports. The
+		Reports are split into calls of 100 Report IDs which are sent
+		concurrently within the UpdateReportAcknowledgements quota.
+
+		*reports* (**iterable**) contains each Report ID (``str``) to
+		update.
+
+		*acknowledged* (**boolean**) is whether or not to mark the reports
+		passed as acknowledged. Default is ``None`` for ``True``.
+
+		*marketplaces* (**sequence**) is the list of Amazon Marketplace IDs
+		(``str``). Default is ``None`` for all marketplaces.
+
+		*workers* (``int``) is the number of calls to send concurrently.
+		Default is ``None`` for the request quota.
+
+		Returns a ``dict`` mapping each Report ID (``str``) to either the
+		updated ReportInfo (``dict``) returned by Amazon, ``None`` if Amazon
+		did not return the Report, or the error (``Exception``) raised by
+		the call containing the Report.
+		"""
+		report_ids = []
+		seen = set()
+		for report_id in reports:
+			if report_id not in seen:
+				seen.add(report_id)
+				report_ids.append(report_id)
+
+		chunks = [report_ids[i:i + 100] for i in six.moves.range(0, len(report_ids), 100)]
+		throttle = self.get_throttle('UpdateReportAcknowledgements')
+
+		def acknowledge(chunk):
+			response = self.update_report_acknowledgements(chunk, acknowledged=acknowledged, marketplaces=marketplaces, debug=debug)
+			return parse_reports(response)[0]
+
+		results = {}
+		for chunk, infos, error in run_throttled(acknowledge, chunks, throttle=throttle, workers=workers):
+			if error is not None:
+				for report_id in chunk:
+					results[report_id] = error
+			else:
+				found = {info.get('ReportId'): info for info in infos}
+				for report_id in chunk:
+					results[report_id] = found.get(report_id)
+
+		return results
 		
-	def manage_report_schedule(self):
-		# TODO
-		raise NotImplementedError()
-		
-	def get_report_schedule_count(self):
-		# TODO
-		raise NotImplementedError()
-		
-	def get_report_schedule_list(self):
-		# TODO
-		raise NotImplementedError()
+	def manage_report_schedule(self, report_type, schedule, scheduled_date=None, marketplaces=None, debug=None):
+		"""
+		Creates, updates, or deletes the Report Schedule for the specified
+		Report Type.
+
+		*report_type* (``str``) is the Report Type. This can be any key or
+		value from ``REPORT_TYPES``.
+
+		*schedule* (``str``) is how often the Report is generated. This can
+		be any key or value from ``REPORT_SCHEDULES``. Use "never" to delete
+		the Report Schedule.
+
+		*scheduled_date* (``datetime`` or ``float``) is when the next
+		Report is generated. Default is ``None`` for now.
+
+		*marketplaces* (**sequence**) is the list of Amazon Marketplace IDs
+		(``str``). Default is ``None`` for all marketplaces.
+
+		Returns the raw XML response (``str``).
+		"""
+		report_type = REPORT_TYPES.get(report_type, report_type)
+		if not isinstance(report_type, six.string_types):
+			raise TypeError("report_type:{!r} is not a string.".format(report_type))
+		elif not report_type:
+			raise ValueError("report_type:{!r} cannot be empty.".format(report_type))
+		report_type = encode_string(report_type, 'ASCII', name='report_type')
+
+		schedule = REPORT_SCHEDULES.get(schedule, schedule)
+		if not isinstance(schedule, six.string_types):
+			raise TypeError("schedule:{!r} is not a string.".format(schedule))
+		elif not schedule:
+			raise ValueError("schedule:{!r} cannot be empty.".format(schedule))
+		schedule = encode_string(schedule, 'ASCII', name='schedule')
+
+		if scheduled_date is not None:
+			scheduled_date = datetime_to_iso8601(scheduled_date, name='scheduled_date')
+
+		# Build args.
+		args = self.new_args()
+		args['Action'] = 'ManageReportSchedule'
+		args['ReportType'] = report_type
+		args['Schedule'] = schedule
+
+		if scheduled_date:
+			args['ScheduleDate'] = scheduled_date
+
+		if marketplaces is not None:
+			args.update(marketplace_args(marketplaces, name='marketplaces'))
+
+		# Send request.
+		return self.send_request(args, debug=debug)
 		
-	def get_report_schedule_list_next(self):
-		# TODO
-		raise NotImplementedError()
+	def get_report_schedule_count(self, report_types=None, marketplaces=None, debug=None):
+		"""
+		Gets the total number of Report Schedules that match the query.
+
+		*report_types* (**sequence**) is used to filter on Report Type
+		(``str``). This can contain any keys or values from
+		``REPORT_TYPES``. Default is ``None`` to not filter on Report Type.
+
+		*marketplaces* (**sequence**) is the list of Amazon Marketplace IDs
+		(``str``). Default is ``None`` for all marketplaces.
+
+		Returns the raw XML response (``str``).
+		"""
+		# Build args.
+		args = self.new_args()
+		args['Action'] = 'GetReportScheduleCount'
+
+		if report_types is not None:
+			args.update(report_type_args(report_types, name='report_types'))
+
+		if marketplaces is not None:
+			args.update(marketplace_args(marketplaces, name='marketplaces'))
+
+		# Send request.
+		return self.send_request(args, debug=debug)
 		
+	def get_report_schedule_list(self, report_types=None, marketplaces=None, debug=None):
+		"""
+		Lists the Report Schedules that match the query.
+
+		*report_types* (**sequence**) is used to filter on Report Type
+		(``str``). This can contain any keys or values from
+		``REPORT_TYPES``. Default is ``None`` to not filter on Report Type.
+
+		*marketplaces* (**sequence**) is the list of Amazon Marketplace IDs
+		(``str``). Default is ``None`` for all marketplaces.
+
+		Returns the raw XML response (``str``).
+		"""
+		# Build args.
+		args = self.new_args()
+		args['Action'] = 'GetReportScheduleList'
+
+		if report_types is not None:
+			args.update(report_type_args(report_types, name='report_types'))
+
+		if marketplaces is not None:
+			args.update(marketplace_args(marketplaces, name='marketplaces'))
+
+		# Send request.
+		return self.send_request(args, debug=debug)
 		
+	def get_report_schedule_list_next(self, next_token, debug=None):
+		"""
+		Requests the next batch of Report Schedules that match the original
+		Get Report Schedule List query.
+
+		*next_token* (``str``) is the token returned from the last request.
+
+		Returns the raw XML response (``str``).
+		"""
+		if not isinstance(next_token, six.string_types):
+			raise TypeError("next_token:{!r} is not a string.".format(next_token))
+		elif not next_token:
+			raise ValueError("next_token:{!r} cannot be empty.".format(next_token))
+		next_token = encode_string(next_token, 'ASCII', name='next_token')
+
+		# Build args.
+		args = self.new_args()
+		args['Action'] = 'GetReportScheduleListByNextToken'
+		args['NextToken'] = next_token
+
+		# Send request.
+		return self.send_request(args, debug=debug)
+
+
+class ReportRequestCache(object):
+	"""
+	The ``ReportRequestCache`` class is an opt-in layer in front of
+	*MWSReports.request_report()* used to avoid requesting duplicate
+	Reports. The RequestReport quota is very small, so identical requests
+	made within *max_age* seconds of each other reuse the first Report
+	Request instead of having Amazon generate the same Report again.
+	Concurrent identical requests are collapsed into a single call.
+	"""
+
+	def __init__(self, reports, max_age=None, check_remote=None):
+		"""
+		Initializes the ``ReportRequestCache`` instance.
+
+		*reports* (``MWSReports``) is the Reports API used to request
+		Reports.
+
+		*max_age* (``int`` or ``float``) is the number of seconds a Report
+		Request is considered fresh enough to be reused. Default is
+		``None`` for 900 (15 minutes).
+
+		*check_remote* (``bool``) is whether the Report Requests recently
+		submitted to Amazon (possibly by other processes) should be checked
+		for a match using *MWSReports.get_report_request_list()* before
+		requesting a new Report (``True``), or only the local index
+		(``False``). Default is ``None`` for ``False``.
+		"""
+		if not isinstance(reports, MWSReports):
+			raise TypeError("reports:{!r} is not an MWSReports.".format(reports))
+
+		if max_age is None:
+			max_age = 900
+		elif not isinstance(max_age, (float,) + six.integer_types):
+			raise TypeError("max_age:{!r} is not a number.".format(max_age))
+		elif max_age < 0:
+			raise ValueError("max_age:{!r} cannot be less than 0.".format(max_age))
+
+		self.check_remote = bool(check_remote)
+		"""
+		*check_remote* (``bool``) is whether recently submitted Report
+		Requests are checked with Amazon before requesting a new Report.
+		"""
+
+		self.max_age = max_age
+		"""
+		*max_age* (``int`` or ``float``) is the number of seconds a Report
+		Request is reused for.
+		"""
+
+		self.reports = reports
+		"""
+		*reports* (``MWSReports``) is the Reports API used to request
+		Reports.
+		"""
+
+		self._lock = threading.Lock()
+		"""
+		*_lock* (``threading.Lock``) synchronizes access to *_recent* and
+		*_pending*.
+		"""
+
+		self._pending = {}
+		"""
+		*_pending* (``dict``) maps the key (``tuple``) of each in-flight
+		request to its ``PendingResult``.
+		"""
+
+		self._recent = {}
+		"""
+		*_recent* (``dict``) maps the key (``tuple``) of each recent request
+		to a ``tuple`` containing: the time it was requested (``float``),
+		and the Report Request ID (``str``).
+		"""
+
+	def clear(self):
+		"""
+		Forgets all recent Report Requests.
+		"""
+		with self._lock:
+			self._recent.clear()
+
+	def find_remote(self, report_type, start_date=None, end_date=None, debug=None):
+		"""
+		Finds a matching Report Request submitted to Amazon within
+		*max_age* seconds.
+
+		*report_type* (``str``) is the Report Type.
+
+		*start_date* (``datetime`` or ``float``) is the start of the date
+		range used for selecting the data to report. Default is ``None`` to
+		match any start date.
+
+		*end_date* (``datetime`` or ``float``) is the end of the date range
+		used for selecting the data to report. Default is ``None`` to match
+		any end date.
+
+		Returns the most recently submitted matching Report Request
+		(``dict``) if one was found; otherwise, ``None``.
+		"""
+		report_type = REPORT_TYPES.get(report_type, report_type)
+		if start_date is not None:
+			start_date = iso8601_to_datetime(datetime_to_iso8601(start_date, name='start_date'))
+		if end_date is not None:
+			end_date = iso8601_to_datetime(datetime_to_iso8601(end_date, name='end_date'))
+
+		from_date = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.max_age)
+		response = self.reports.get_report_request_list(max_count=100, report_types=[report_type], from_date=from_date, debug=debug)
+
+		found = None
+		for info in parse_report_requests(response)[0]:
+			if info.get('ReportProcessingStatus') == REPORT_STATUSES['cancelled']:
+				continue
+			if start_date is not None and (not info.get('StartDate') or iso8601_to_datetime(info['StartDate']) != start_date):
+				continue
+			if end_date is not None and (not info.get('EndDate') or iso8601_to_datetime(info['EndDate']) != end_date):
+				continue
+			if found is None or info.get('SubmittedDate', '') > found.get('SubmittedDate', ''):
+				found = info
+		return found
+
+	def request_key(self, report_type, start_date=None, end_date=None, show_sales_channel=None, marketplaces=None):
+		"""
+		Generates the key used to identify identical Report Requests.
+
+		The arguments are the same as *MWSReports.request_report()*.
+
+		Returns the key (``tuple``).
+		"""
+		# The Report Type and Marketplace IDs may be given as encoded or
+		# native strings, so they are decoded for the key to match.
+		report_type = _native_string(REPORT_TYPES.get(report_type, report_type))
+		if start_date is not None:
+			start_date = datetime_to_iso8601(start_date, name='start_date')
+		if end_date is not None:
+			end_date = datetime_to_iso8601(end_date, name='end_date')
+		if show_sales_channel is not None:
+			show_sales_channel = bool(show_sales_channel)
+		if marketplaces is not None:
+			marketplaces = tuple(sorted(set(_native_string(marketplace) for marketplace in marketplaces)))
+		return (report_type, start_date, end_date, show_sales_channel, marketplaces)
+
+	def request_report(self, report_type, start_date=None, end_date=None, show_sales_channel=None, marketplaces=None, debug=None):
+		"""
+		Requests that the specified Report be created unless an identical
+		Report Request is recent or in-flight.
+
+		The arguments are the same as *MWSReports.request_report()*.
+
+		.. NOTE:: Amazon does not report the marketplaces of a Report
+		   Request, so Amazon is only checked for a match when
+		   *check_remote* is ``True`` and *marketplaces* is ``None``.
+
+		Returns the Report Request ID (``str``).
+		"""
+		key = self.request_key(report_type, start_date=start_date, end_date=end_date, show_sales_channel=show_sales_channel, marketplaces=marketplaces)
+
+		with self._lock:
+			now = time.time()
+			for old_key in [k for k, (t, _id) in six.iteritems(self._recent) if now - t > self.max_age]:
+				del self._recent[old_key]
+
+			recent = self._recent.get(key)
+			if recent is not None:
+				return recent[1]
+
+			pending = self._pending.get(key)
+			is_owner = pending is None
+			if is_owner:
+				pending = self._pending[key] = PendingResult()
+
+		if not is_owner:
+			# Wait for the identical in-flight request to finish.
+			return pending.wait()
+
+		try:
+			request_id = None
+			if self.check_remote and marketplaces is None:
+				info = self.find_remote(report_type, start_date=start_date, end_date=end_date, debug=debug)
+				if info is not None:
+					request_id = info['ReportRequestId']
+
+			if request_id is None:
+				response = self.reports.request_report(report_type, start_date=start_date, end_date=end_date, show_sales_channel=show_sales_channel, marketplaces=marketplaces, debug=debug)
+				infos = parse_report_requests(response)[0]
+				if not infos or not infos[0].get('ReportRequestId'):
+					raise ValueError("RequestReport response:{!r} does not contain a ReportRequestId.".format(response))
+				request_id = infos[0]['ReportRequestId']
+
+		except Exception as e:
+			with self._lock:
+				del self._pending[key]
+			pending.set_error(e)
+			raise
+
+		with self._lock:
+			self._recent[key] = (time.time(), request_id)
+			del self._pending[key]
+		pending.set_result(request_id)
+		return request_id
+
+
+class ReportScheduleManager(object):
+	"""
+	The ``ReportScheduleManager`` class maintains a locally cached view of
+	the Report Schedules, and reconciles them with a declared state using
+	the fewest calls possible. Scheduled Reports are generated by Amazon
+	without spending RequestReport quota or polling for the Report
+	Request.
+	"""
+
+	def __init__(self, reports, max_age=None, marketplaces=None):
+		"""
+		Initializes the ``ReportScheduleManager`` instance.
+
+		*reports* (``MWSReports``) is the Reports API used to manage the
+		Report Schedules.
+
+		*max_age* (``int`` or ``float``) is the number of seconds the cached
+		view is used before being refreshed. Default is ``None`` for 3600
+		(1 hour).
+
+		*marketplaces* (**sequence**) is the list of Amazon Marketplace IDs
+		(``str``) the schedules apply to. Default is ``None`` for all
+		marketplaces.
+		"""
+		if not isinstance(reports, MWSReports):
+			raise TypeError("reports:{!r} is not an MWSReports.".format(reports))
+
+		if max_age is None:
+			max_age = 3600
+		elif not isinstance(max_age, (float,) + six.integer_types):
+			raise TypeError("max_age:{!r} is not a number.".format(max_age))
+
+		self.marketplaces = marketplaces
+		"""
+		*marketplaces* (**sequence**) is the list of Amazon Marketplace IDs
+		(``str``) the schedules apply to.
+		"""
+
+		self.max_age = max_age
+		"""
+		*max_age* (``int`` or ``float``) is the number of seconds the cached
+		view is used for.
+		"""
+
+		self.reports = reports
+		"""
+		*reports* (``MWSReports``) is the Reports API used to manage the
+		Report Schedules.
+		"""
+
+		self._lock = threading.RLock()
+		"""
+		*_lock* (``threading.RLock``) synchronizes access to the cached
+		view.
+		"""
+
+		self._schedules = None
+		"""
+		*_schedules* (``dict``) is the cached view mapping Report Type
+		(``str``) to Report Schedule (``dict``).
+		"""
+
+		self._updated = None
+		"""
+		*_updated* (``float``) is when *_schedules* was last refreshed.
+		"""
+
+	def get_schedules(self, refresh=None, debug=None):
+		"""
+		Gets the Report Schedules.
+
+		*refresh* (``bool``) is whether the cached view should be refreshed
+		from Amazon regardless of its age (``True``), or not (``False``).
+		Default is ``None`` for ``False``.
+
+		Returns a ``dict`` mapping Report Type (``str``) to Report Schedule
+		(``dict``) containing the "ReportType", "Schedule" and
+		"ScheduledDate" fields (``str``).
+		"""
+		with self._lock:
+			if refresh or self._schedules is None or time.time() - self._updated > self.max_age:
+				schedules = {}
+				response = self.reports.get_report_schedule_list(marketplaces=self.marketplaces, debug=debug)
+				while True:
+					infos, next_token = parse_report_schedules(response)
+					for info in infos:
+						schedules[info['ReportType']] = info
+					if not next_token:
+						break
+					response = self.reports.get_report_schedule_list_next(next_token, debug=debug)
+
+				self._schedules = schedules
+				self._updated = time.time()
+
+			return dict(self._schedules)
+
+	def invalidate(self):
+		"""
+		Invalidates the cached view so that it is refreshed on next use.
+		"""
+		with self._lock:
+			self._schedules = None
+
+	def reconcile(self, desired, remove_others=None, debug=None):
+		"""
+		Brings the Report Schedules to the declared state. Only the Report
+		Schedules which differ are sent to Amazon.
+
+		*desired* (``dict``) maps each Report Type (``str``) to its Report
+		Schedule (``str``). These can be any keys or values from
+		``REPORT_TYPES`` and ``REPORT_SCHEDULES`` respectively.
+
+		*remove_others* (``bool``) is whether the Report Schedules of Report
+		Types not in *desired* should be deleted (``True``), or left alone
+		(``False``). Default is ``None`` for ``False``.
+
+		Returns a ``dict`` mapping each changed Report Type (``str``) to its
+		new Report Schedule (``str``).
+		"""
+		never = REPORT_SCHEDULES['never']
+		desired = {
+			REPORT_TYPES.get(report_type, report_type): REPORT_SCHEDULES.get(schedule, schedule)
+			for report_type, schedule in six.iteritems(desired)
+		}
+
+		with self._lock:
+			current = self.get_schedules(debug=debug)
+
+			changes = {}
+			for report_type, schedule in six.iteritems(desired):
+				info = current.get(report_type)
+				if (info['Schedule'] if info else never) != schedule:
+					changes[report_type] = schedule
+
+			if remove_others:
+				for report_type, info in six.iteritems(current):
+					if report_type not in desired and info['Schedule'] != never:
+						changes[report_type] = never
+
+			for report_type, schedule in sorted(six.iteritems(changes)):
+				response = self.reports.manage_report_schedule(report_type, schedule, marketplaces=self.marketplaces, debug=debug)
+				infos = parse_report_schedules(response)[0]
+				if schedule == never:
+					self._schedules.pop(report_type, None)
+				else:
+					self._schedules[report_type] = infos[0] if infos else {'ReportType': report_type, 'Schedule': schedule, 'ScheduledDate': None}
+
+		return changes
+
+
+def iter_settlement_report(source):
+	"""
+	Parses an XML Settlement Report (``REPORT_TYPES['settlement_xml']``)
+	incrementally. Each element is discarded once it has been parsed so
+	memory usage stays flat regardless of the size of the Report.
+
+	*source* (``str`` or ``file``) is either the path of the Report file,
+	or a ``file`` object supporting ``read()``.
+
+	Returns an iterator yielding one compact record (``dict``) per
+	settlement order, adjustment and fee. Each record contains "kind"
+	(``str``) which is one of "settlement" (the SettlementData header),
+	"order", "adjustment", "fee" (OtherFee), or "other" (OtherTransaction
+	and any other transactions), and "settlement_id" (``str``). Amounts
+	are ``decimal.Decimal``.
+
+	- An "order" or "adjustment" contains: "amazon_order_id",
+	  "merchant_order_id", "shipment_id" (orders only), "adjustment_id"
+	  (adjustments only), "marketplace", "fulfillment_id",
+	  "posted_date", "currency", and "items". Each item (``dict``)
+	  contains: "order_item_code", "sku", "quantity" (``int`` or
+	  ``None``), "adjustment_item_id" (adjustments only), "price",
+	  "fees", and "promotions", each of which map type (``str``) to
+	  amount.
+
+	- A "fee" contains: "fee_type", "posted_date", "amount", and
+	  "currency".
+
+	- An "other" contains: "other_kind" (the element tag), and either
+	  "transaction_type", "transaction_id", "posted_date", "amount",
+	  "currency" and "fees" for an OtherTransaction, or "data" (``dict``)
+	  for anything else.
+	"""
+	report = None
+	depth = 0
+	report_depth = None
+	namespaced = None
+	settlement_id = None
+
+	for event, elem in ElementTree.iterparse(source, events=('start', 'end')):
+		if event == 'start':
+			depth += 1
+			if report is None:
+				tag = elem.tag
+				if namespaced is None:
+					namespaced = tag[:1] == '{'
+				if namespaced:
+					tag = tag.rpartition('}')[2]
+				if tag == 'SettlementReport':
+					report = elem
+					report_depth = depth
+			continue
+
+		depth -= 1
+		if report is None:
+			continue
+		elif elem is report:
+			# End of the report.
+			report = None
+			continue
+		elif depth != report_depth:
+			continue
+
+		if namespaced:
+			for child in elem.iter():
+				child.tag = child.tag.rpartition('}')[2]
+
+		tag = elem.tag
+		if tag == 'Order':
+			record = _settlement_order(elem, 'order', 'Item', 'ItemPrice', 'ItemFees', 'Promotion')
+		elif tag == 'Adjustment':
+			record = _settlement_order(elem, 'adjustment', 'AdjustedItem', 'ItemPriceAdjustments', 'ItemFeeAdjustments', 'PromotionAdjustment')
+		elif tag == 'OtherFee':
+			amount, currency = _settlement_amount(elem.find('Amount'))
+			record = {
+				'kind': 'fee',
+				'fee_type': elem.findtext('Type'),
+				'posted_date': elem.findtext('PostedDate'),
+				'amount': amount,
+				'currency': currency,
+			}
+		elif tag == 'OtherTransaction':
+			amount, currency = _settlement_amount(elem.find('Amount'))
+			fees, _currency = _settlement_amounts(elem.find('Fees'), 'Fee')
+			record = {
+				'kind': 'other',
+				'other_kind': tag,
+				'transaction_type': elem.findtext('TransactionType'),
+				'transaction_id': elem.findtext('TransactionID'),
+				'posted_date': elem.findtext('PostedDate'),
+				'amount': amount,
+				'currency': currency,
+				'fees': fees,
+			}
+		elif tag == 'SettlementData':
+			amount, currency = _settlement_amount(elem.find('TotalAmount'))
+			settlement_id = elem.findtext('AmazonSettlementID')
+			record = {
+				'kind': 'settlement',
+				'total_amount': amount,
+				'currency': currency,
+				'start_date': elem.findtext('StartDate'),
+				'end_date': elem.findtext('EndDate'),
+				'deposit_date': elem.findtext('DepositDate'),
+			}
+		else:
+			record = {
+				'kind': 'other',
+				'other_kind': tag,
+				'data': element_to_dict(elem),
+			}
+
+		record['settlement_id'] = settlement_id
+
+		# Discard the parsed element.
+		report.clear()
+
+		yield record
+
+def parse_report_requests(data):
+	"""
+	Parses the Report Requests from a RequestReport, GetReportRequestList
+	or GetReportRequestListByNextToken response.
+
+	*data* (``str``) is the response XML.
+
+	Returns a ``tuple`` containing: the ``list`` of each Report Request
+	(``dict``) mapping each ReportRequestInfo field (e.g.,
+	"ReportRequestId", "ReportType", "StartDate", "EndDate",
+	"SubmittedDate", "ReportProcessingStatus") to its value (``str``), and
+	the next token (``str``) if there are more Report Requests; otherwise,
+	``None``.
+	"""
+	root = parse_response(data)
+	infos = [element_to_dict(elem) for elem in root.iter('ReportRequestInfo')]
+	next_token = root.findtext('.//NextToken') if root.findtext('.//HasNext') == 'true' else None
+	return infos, next_token or None
+
+def parse_report_schedules(data):
+	"""
+	Parses the Report Schedules from a ManageReportSchedule,
+	GetReportScheduleList or GetReportScheduleListByNextToken response.
+
+	*data* (``str``) is the response XML.
+
+	Returns a ``tuple`` containing: the ``list`` of each Report Schedule
+	(``dict``) mapping each ReportSchedule field ("ReportType",
+	"Schedule", "ScheduledDate") to its value (``str``), and the next
+	token (``str``) if there are more Report Schedules; otherwise,
+	``None``.
+	"""
+	root = parse_response(data)
+	infos = [element_to_dict(elem) for elem in root.iter('ReportSchedule')]
+	next_token = root.findtext('.//NextToken') if root.findtext('.//HasNext') == 'true' else None
+	return infos, next_token or None
+
+def parse_reports(data):
+	"""
+	Parses the Reports from a GetReportList or GetReportListByNextToken
+	response.
+
+	*data* (``str``) is the response XML.
+
+	Returns a ``tuple`` containing: the ``list`` of each Report (``dict``)
+	mapping each ReportInfo field (e.g., "ReportId", "ReportType",
+	"ReportRequestId", "AvailableDate", "Acknowledged") to its value
+	(``str``), and the next token (``str``) if there are more Reports;
+	otherwise, ``None``.
+	"""
+	root = parse_response(data)
+	infos = [element_to_dict(elem) for elem in root.iter('ReportInfo')]
+	next_token = root.findtext('.//NextToken') if root.findtext('.//HasNext') == 'true' else None
+	return infos, next_token or None
+
 def report_type_args(report_types, name=None):
 	"""
 	Converts the specified Report Types into their respective URL query
@@ -741,3 +1481,120 @@ def status_args(statuses, name=None):
 		args.append(('ReportProcessingStatusList.Status.{}'.format(i + 1), status))
 
 	return args
+
+def _native_string(value):
+	"""
+	Converts the specified string into the native string type.
+
+	*value* (**string**) is the string to convert.
+
+	Returns the native string (``str``) if *value* is encoded; otherwise,
+	*value* as is.
+	"""
+	if isinstance(value, six.binary_type) and not isinstance(value, str):
+		return value.decode('ASCII')
+	return value
+
+def _settlement_amount(elem):
+	"""
+	Parses a settlement amount.
+
+	*elem* (``xml.etree.ElementTree.Element``) is the amount element. This
+	can be ``None``.
+
+	Returns a ``tuple`` containing: the amount (``decimal.Decimal``) and
+	the currency (``str``); or ``None`` for each if *elem* is ``None``.
+	"""
+	if elem is None or not elem.text:
+		return None, None
+	return decimal.Decimal(elem.text.strip()), elem.get('currency')
+
+def _settlement_amounts(elem, tag):
+	"""
+	Parses the typed settlement amounts (e.g., price components or fees).
+
+	*elem* (``xml.etree.ElementTree.Element``) is the element containing
+	the amounts. This can be ``None``.
+
+	*tag* (``str``) is the tag of each typed amount (e.g., "Component" or
+	"Fee").
+
+	Returns a ``tuple`` containing: the ``dict`` mapping type (``str``) to
+	the sum of its amounts (``decimal.Decimal``), and the currency
+	(``str``) or ``None``.
+	"""
+	amounts = {}
+	currency = None
+	if elem is not None:
+		for child in elem.iter(tag):
+			amount, currency = _settlement_amount(child.find('Amount'))
+			if amount is not None:
+				type_ = child.findtext('Type')
+				amounts[type_] = amounts[type_] + amount if type_ in amounts else amount
+	return amounts, currency
+
+def _settlement_order(elem, kind, item_tag, price_tag, fees_tag, promotion_tag):
+	"""
+	Parses a settlement Order or Adjustment.
+
+	*elem* (``xml.etree.ElementTree.Element``) is the Order or Adjustment
+	element.
+
+	*kind* (``str``) is the record kind.
+
+	*item_tag* (``str``) is the tag of each item.
+
+	*price_tag* (``str``) is the tag containing the price components.
+
+	*fees_tag* (``str``) is the tag containing the fees.
+
+	*promotion_tag* (``str``) is the tag of each promotion.
+
+	Returns the record (``dict``).
+	"""
+	fulfillment = elem.find('Fulfillment')
+	if fulfillment is None:
+		fulfillment = elem
+
+	currency = None
+	items = []
+	for item in fulfillment.iter(item_tag):
+		price, price_currency = _settlement_amounts(item.find(price_tag), 'Component')
+		fees, fees_currency = _settlement_amounts(item.find(fees_tag), 'Fee')
+		promotions = {}
+		for promotion in item.iter(promotion_tag):
+			amount, promotion_currency = _settlement_amount(promotion.find('Amount'))
+			if amount is not None:
+				type_ = promotion.findtext('Type')
+				promotions[type_] = promotions[type_] + amount if type_ in promotions else amount
+				currency = currency or promotion_currency
+		currency = currency or price_currency or fees_currency
+
+		quantity = item.findtext('Quantity')
+		record = {
+			'order_item_code': item.findtext('AmazonOrderItemCode'),
+			'sku': item.findtext('SKU'),
+			'quantity': int(quantity) if quantity else None,
+			'price': price,
+			'fees': fees,
+			'promotions': promotions,
+		}
+		if kind == 'adjustment':
+			record['adjustment_item_id'] = item.findtext('MerchantAdjustmentItemID')
+		items.append(record)
+
+	record = {
+		'kind': kind,
+		'amazon_order_id': elem.findtext('AmazonOrderID'),
+		'merchant_order_id': elem.findtext('MerchantOrderID'),
+		'marketplace': elem.findtext('MarketplaceName'),
+		'fulfillment_id': fulfillment.findtext('MerchantFulfillmentID'),
+		'posted_date': fulfillment.findtext('PostedDate'),
+		'currency': currency,
+		'items': items,
+	}
+	if kind == 'adjustment':
+		record['adjustment_id'] = elem.findtext('AdjustmentID')
+	else:
+		record['shipment_id'] = elem.findtext('ShipmentID')
+	return record
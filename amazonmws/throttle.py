@@ -0,0 +1,576 @@
+# coding: utf-8
+"""
+This module provides client side throttling for the Amazon MWS API so
+that many requests can be sent concurrently without exceeding the
+request quota of an action.
+"""
+
+__created__ = "2026-10-19"
+__modified__ = "2026-10-19"
+
+import six # Python2/Python3 compatibility library.
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from amazonmws.mws import IMWSAgent, MWSAgent, MWSError, parse_response
+
+#: The arguments excluded from the key of a request by
+#: ``SingleflightAgent`` because they differ between identical requests.
+SINGLEFLIGHT_EXCLUDE_ARGS = frozenset(('Signature', 'SignatureMethod', 'SignatureVersion', 'Timestamp'))
+
+#: The clock used to measure throttling intervals.
+_clock = getattr(time, 'monotonic', time.time)
+
+#: The shared throttles.
+_throttles = {}
+
+#: Synchronizes access to ``_throttles``.
+_throttles_lock = threading.Lock()
+
+
+class PendingResult(object):
+	"""
+	The ``PendingResult`` class is used to share the result of an
+	in-flight request with all of the threads waiting on it.
+	"""
+
+	def __init__(self):
+		"""
+		Initializes the ``PendingResult`` instance.
+		"""
+
+		self.error = None
+		"""
+		*error* (``Exception``) is the error raised by the request.
+		"""
+
+		self.event = threading.Event()
+		"""
+		*event* (``threading.Event``) is set once the request finishes.
+		"""
+
+		self.result = None
+		"""
+		*result* is the result of the request.
+		"""
+
+	def set_error(self, error):
+		"""
+		Finishes the request with an error.
+
+		*error* (``Exception``) is the error raised by the request.
+		"""
+		self.error = error
+		self.event.set()
+
+	def set_result(self, result):
+		"""
+		Finishes the request with a result.
+
+		*result* is the result of the request.
+		"""
+		self.result = result
+		self.event.set()
+
+	def wait(self, timeout=None):
+		"""
+		Waits for the request to finish.
+
+		*timeout* (``float``) is the maximum number of seconds to wait.
+		Default is ``None`` to wait indefinitely.
+
+		Raises the error of the request if it failed, or ``RuntimeError`` if
+		the timeout expired.
+
+		Returns the result of the request.
+		"""
+		if not self.event.wait(timeout):
+			raise RuntimeError("Timed out after {} seconds waiting for the request.".format(timeout))
+		if self.error is not None:
+			raise self.error
+		return self.result
+
+
+class SingleflightAgent(IMWSAgent):
+	"""
+	The ``SingleflightAgent`` class wraps an agent so that only one of
+	any identical requests is in flight at a time. Threads sending a
+	request identical to one in flight wait for it and share its response
+	instead of sending their own.
+	"""
+
+	def __init__(self, agent=None, actions=None):
+		"""
+		Initializes the ``SingleflightAgent`` instance.
+
+		*agent* (``IMWSAgent``) is the agent which actually sends the
+		requests. Default is ``None`` for a new ``MWSAgent``.
+
+		*actions* (**sequence**) optionally contains each action (``str``)
+		whose requests are coalesced. Default is ``None`` for every action.
+
+		.. NOTE:: Requests with a body (e.g., SubmitFeed) are never
+		   coalesced.
+		"""
+		if agent is None:
+			agent = MWSAgent()
+		elif not isinstance(agent, IMWSAgent):
+			raise TypeError("agent:{!r} is not an IMWSAgent.".format(agent))
+
+		if actions is not None:
+			if isinstance(actions, six.string_types):
+				raise TypeError("actions:{!r} is not a sequence.".format(actions))
+			actions = frozenset(actions)
+
+		self.actions = actions
+		"""
+		*actions* (``frozenset``) contains each action (``str``) whose
+		requests are coalesced, or is ``None`` for every action.
+		"""
+
+		self.agent = agent
+		"""
+		*agent* (``IMWSAgent``) is the agent which actually sends the
+		requests.
+		"""
+
+		self._lock = threading.Lock()
+		"""
+		*_lock* (``threading.Lock``) synchronizes access to *_pending*.
+		"""
+
+		self._pending = {}
+		"""
+		*_pending* (``dict``) maps the key (``tuple``) of each request in
+		flight to its result (``PendingResult``).
+		"""
+
+	def request(self, mws, path, args, body, content_type, debug=None):
+		"""
+		Performs the request unless an identical request is in flight, in
+		which case its response is returned instead.
+
+		See *IMWSAgent.request()* for the arguments.
+
+		Returns the response body (``str``).
+		"""
+		key = self.request_key(mws, path, args) if body is None else None
+		if key is None:
+			return self.agent.request(mws, path, args, body, content_type, debug=debug)
+
+		with self._lock:
+			pending = self._pending.get(key)
+			owner = pending is None
+			if owner:
+				pending = self._pending[key] = PendingResult()
+
+		if not owner:
+			return pending.wait()
+
+		try:
+			pending.set_result(self.agent.request(mws, path, args, body, content_type, debug=debug))
+		except Exception as e:
+			pending.set_error(e)
+			raise
+		finally:
+			with self._lock:
+				del self._pending[key]
+
+		return pending.result
+
+	def request_key(self, mws, path, args):
+		"""
+		Generates the canonical key of a request. Arguments which differ
+		between identical requests (see ``SINGLEFLIGHT_EXCLUDE_ARGS``) are
+		excluded.
+
+		*mws* (``MWS``) is the MWS instance.
+
+		*path* (``str``) is the request path.
+
+		*args* contains the query parameters. See *MWS.send_request()*.
+
+		Returns the key (``tuple``), or ``None`` if the request should not
+		be coalesced.
+		"""
+		items = []
+		action = None
+		for arg_key, value in (six.iteritems(args) if isinstance(args, dict) else args):
+			if arg_key in SINGLEFLIGHT_EXCLUDE_ARGS:
+				continue
+			elif arg_key == 'Action':
+				action = value
+			if not isinstance(value, six.string_types) and isinstance(value, (list, tuple)):
+				value = tuple(value)
+			items.append((arg_key, value))
+
+		if self.actions is not None and action not in self.actions:
+			return None
+
+		items.sort(key=lambda item: (item[0], repr(item[1])))
+		return (mws.endpoint, path, mws.access_key, mws.merchant_id, tuple(items))
+
+
+class Throttle(object):
+	"""
+	The ``Throttle`` class implements the leaky bucket algorithm used by
+	Amazon MWS to throttle requests. Up to *max_requests* can be sent in a
+	burst after which one request is restored every *restore_rate*
+	seconds.
+	"""
+
+	def __init__(self, max_requests, restore_rate):
+		"""
+		Initializes the ``Throttle`` instance.
+
+		*max_requests* (``int``) is the maximum number of requests that can
+		be sent in a burst (the request quota).
+
+		*restore_rate* (``int`` or ``float``) is the number of seconds it
+		takes to restore 1 request to the quota.
+		"""
+		if not isinstance(max_requests, six.integer_types):
+			raise TypeError("max_requests:{!r} is not an integer.".format(max_requests))
+		elif max_requests < 1:
+			raise ValueError("max_requests:{!r} cannot be less than 1.".format(max_requests))
+
+		if not isinstance(restore_rate, (float,) + six.integer_types):
+			raise TypeError("restore_rate:{!r} is not a number.".format(restore_rate))
+		elif restore_rate < 0:
+			raise ValueError("restore_rate:{!r} cannot be less than 0.".format(restore_rate))
+
+		self.max_requests = max_requests
+		"""
+		*max_requests* (``int``) is the maximum number of requests that can
+		be sent in a burst.
+		"""
+
+		self.restore_rate = restore_rate
+		"""
+		*restore_rate* (``float``) is the number of seconds it takes to
+		restore 1 request.
+		"""
+
+		self._lock = threading.Lock()
+		"""
+		*_lock* (``threading.Lock``) synchronizes access to *_tokens* and
+		*_updated*.
+		"""
+
+		self._tokens = float(max_requests)
+		"""
+		*_tokens* (``float``) is the number of requests currently available.
+		"""
+
+		self._updated = _clock()
+		"""
+		*_updated* (``float``) is when *_tokens* was last updated.
+		"""
+
+	def _refill(self, now):
+		"""
+		Restores the requests available since the last update.
+
+		.. NOTE:: *_lock* must be held.
+
+		*now* (``float``) is the current time.
+		"""
+		if self.restore_rate:
+			self._tokens = min(float(self.max_requests), self._tokens + (now - self._updated) / self.restore_rate)
+		else:
+			self._tokens = float(self.max_requests)
+		self._updated = now
+
+	def acquire(self, cost=None):
+		"""
+		Waits until the requests are available and takes them from the
+		quota.
+
+		*cost* (``int``) is the number of requests to take. Amazon restores
+		the quota of some actions (e.g., GetMyPriceForSKU) per item instead
+		of per request, so a request for several items takes one request
+		per item. This is limited to *max_requests*. Default is ``None``
+		for 1.
+		"""
+		if cost is None:
+			cost = 1
+		elif not isinstance(cost, six.integer_types):
+			raise TypeError("cost:{!r} is not an integer.".format(cost))
+		elif cost < 1:
+			raise ValueError("cost:{!r} cannot be less than 1.".format(cost))
+		cost = min(cost, self.max_requests)
+
+		while True:
+			with self._lock:
+				self._refill(_clock())
+				if self._tokens >= cost:
+					self._tokens -= cost
+					return
+				delay = (cost - self._tokens) * self.restore_rate
+			time.sleep(delay)
+
+	def drain(self):
+		"""
+		Empties the quota. This should be called when Amazon responds with
+		a "RequestThrottled" error so that subsequent requests wait for the
+		quota to be restored.
+		"""
+		with self._lock:
+			self._tokens = 0.0
+			self._updated = _clock()
+
+	def call(self, func, args=None, kwargs=None, retries=None, cost=None):
+		"""
+		Calls the function once a request is available. If Amazon responds
+		with a "RequestThrottled" error, the quota is emptied and the call
+		is retried. The error is detected whether *func* raises it as an
+		``MWSError`` or returns the error response XML (as *MWS.send_request()*
+		does).
+
+		*func* (**callable**) is the function to call. It should send
+		exactly one request.
+
+		*args* (**sequence**) optionally contains the positional arguments
+		to call *func* with.
+
+		*kwargs* (``dict``) optionally contains the keyword arguments to
+		call *func* with.
+
+		*retries* (``int``) is the number of times the call is retried.
+		Default is ``None`` for 3.
+
+		*cost* (``int``) is the number of requests the call takes from the
+		quota. See *acquire()*. Default is ``None`` for 1.
+
+		Raises ``MWSError`` if Amazon still responds with a
+		"RequestThrottled" error after the last retry.
+
+		Returns the result of *func*.
+		"""
+		if retries is None:
+			retries = 3
+
+		attempt = 0
+		while True:
+			self.acquire(cost)
+			try:
+				result = func(*(args or ()), **(kwargs or {}))
+				_raise_throttled(result)
+				return result
+			except MWSError as e:
+				if e.code != 'RequestThrottled' or attempt >= retries:
+					raise
+				attempt += 1
+				self.drain()
+
+
+def get_throttle(mws, action, max_requests, restore_rate):
+	"""
+	Gets the throttle shared by all requests for the specified action.
+	Amazon MWS throttles each action per seller and endpoint, so the
+	same throttle is returned for every ``MWS`` instance using the same
+	Merchant ID and endpoint.
+
+	*mws* (``MWS``) is the MWS instance.
+
+	*action* (``str``) is the action being throttled.
+
+	*max_requests* (``int``) is the maximum number of requests that can be
+	sent in a burst.
+
+	*restore_rate* (``int`` or ``float``) is the number of seconds it
+	takes to restore 1 request.
+
+	Returns the throttle (``Throttle``).
+	"""
+	key = (mws.endpoint, mws.merchant_id, action)
+	with _throttles_lock:
+		throttle = _throttles.get(key)
+		if throttle is None:
+			throttle = _throttles[key] = Throttle(max_requests, restore_rate)
+		return throttle
+
+def merge_iterators(iterables, buffer_size=None):
+	"""
+	Consumes the iterables concurrently, each in its own thread, and
+	merges their items into one iterator.
+
+	*iterables* (**sequence**) contains each iterable to consume.
+
+	*buffer_size* (``int``) is the maximum number of items buffered before
+	the threads wait for them to be consumed. Default is ``None`` for 100.
+
+	Returns an iterator yielding each item in the order they are produced.
+	If an iterable raises an error, it is raised by the iterator.
+	"""
+	if buffer_size is None:
+		buffer_size = 100
+	elif not isinstance(buffer_size, six.integer_types):
+		raise TypeError("buffer_size:{!r} is not an integer.".format(buffer_size))
+	elif buffer_size < 1:
+		raise ValueError("buffer_size:{!r} cannot be less than 1.".format(buffer_size))
+
+	results = six.moves.queue.Queue(buffer_size)
+	stop = threading.Event()
+	done = object()
+
+	def put(value):
+		# Do not block forever once the merged iterator is closed.
+		while not stop.is_set():
+			try:
+				results.put(value, timeout=0.1)
+				return True
+			except six.moves.queue.Full:
+				pass
+		return False
+
+	def work(iterable):
+		error = None
+		try:
+			for item in iterable:
+				if not put((item, None)):
+					break
+		except Exception as e:
+			error = e
+		finally:
+			put((done, error))
+
+	threads = [threading.Thread(target=work, args=(iterable,)) for iterable in iterables]
+	for thread in threads:
+		thread.daemon = True
+		thread.start()
+
+	def iter_results():
+		try:
+			running = len(threads)
+			while running:
+				item, error = results.get()
+				if item is done:
+					if error is not None:
+						raise error
+					running -= 1
+				else:
+					yield item
+		finally:
+			stop.set()
+
+	return iter_results()
+
+def run_throttled(func, items, throttle=None, workers=None, retries=None, cost=None):
+	"""
+	Calls the function for each item concurrently using a pool of worker
+	threads, waiting on the throttle before each call.
+
+	*func* (**callable**) is the function to call. It is called with one
+	item at a time, and should send exactly one request.
+
+	*items* (**iterable**) contains each item. This is consumed lazily.
+
+	*throttle* (``Throttle``) optionally is the throttle to wait on before
+	each call. Default is ``None`` for no throttling.
+
+	*workers* (``int``) is the number of worker threads. Default is
+	``None`` for the *max_requests* of *throttle*, or 4 if there is no
+	throttle.
+
+	*retries* (``int``) is the number of times a call is retried after
+	Amazon responds with a "RequestThrottled" error. Default is ``None``
+	for 3.
+
+	*cost* (**callable**) is optionally called with each item to get the
+	number of requests (``int``) its call takes from the quota of
+	*throttle*. See *Throttle.acquire()*. Default is ``None`` for 1.
+
+	Returns an iterator yielding a ``tuple`` containing: the item, the
+	result of *func*, and the error (``Exception``) raised by *func* or
+	``None``, in the order the calls complete.
+	"""
+	if workers is None:
+		workers = throttle.max_requests if throttle is not None else 4
+	elif not isinstance(workers, six.integer_types):
+		raise TypeError("workers:{!r} is not an integer.".format(workers))
+	elif workers < 1:
+		raise ValueError("workers:{!r} cannot be less than 1.".format(workers))
+
+	if retries is None:
+		retries = 3
+
+	items = iter(items)
+	items_lock = threading.Lock()
+	results = six.moves.queue.Queue()
+	stop = threading.Event()
+	done = object()
+
+	def work():
+		error = None
+		try:
+			while not stop.is_set():
+				with items_lock:
+					try:
+						item = next(items)
+					except StopIteration:
+						break
+
+				try:
+					if throttle is not None:
+						result = throttle.call(func, (item,), retries=retries, cost=cost(item) if cost is not None else None)
+					else:
+						result = func(item)
+				except Exception as e:
+					results.put((item, None, e))
+				else:
+					results.put((item, result, None))
+
+		except Exception as e:
+			# The items iterator failed.
+			error = e
+		finally:
+			results.put((done, None, error))
+
+	threads = [threading.Thread(target=work) for _ in six.moves.range(workers)]
+	for thread in threads:
+		thread.daemon = True
+		thread.start()
+
+	def iter_results():
+		try:
+			running = len(threads)
+			while running:
+				item, result, error = results.get()
+				if item is done:
+					if error is not None:
+						raise error
+					running -= 1
+				else:
+					yield item, result, error
+		finally:
+			stop.set()
+
+	return iter_results()
+
+def _raise_throttled(result):
+	"""
+	Raises the error of a "RequestThrottled" error response.
+
+	*result* is the result of a throttled call. Only a response XML
+	(``str``) is checked.
+
+	Raises ``MWSError`` if *result* is a "RequestThrottled" error
+	response.
+	"""
+	if isinstance(result, six.binary_type):
+		markers = (b'<ErrorResponse', b'RequestThrottled')
+	elif isinstance(result, six.text_type):
+		markers = (u'<ErrorResponse', u'RequestThrottled')
+	else:
+		return
+
+	if all(marker in result for marker in markers):
+		try:
+			parse_response(result)
+		except ElementTree.ParseError:
+			# This is not a response XML (e.g., a flat file report).
+			pass
+		except MWSError as e:
+			if e.code == 'RequestThrottled':
+				raise
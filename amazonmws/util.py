@@ -10,8 +10,73 @@ __modified__ = "2016-04-05"
 __modified_by___ = "Joshua D. Burns"
 
 import six # Python2/Python3 compatibility library.
-import collections
 import datetime
+import re
+import sqlite3
+import threading
+import xml.etree.ElementTree as ElementTree
+
+try:
+	from collections.abc import Sequence
+except ImportError:
+	# Python 2.
+	from collections import Sequence
+
+ISO8601_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.(\d+))?)?)?\s*(Z|[+-]\d{2}:?\d{2})?$")
+"""
+*ISO8601_RE* (``re.RegexObject``) is used by *iso8601_to_datetime()*
+to parse the ISO 8601 dates returned by Amazon MWS.
+"""
+
+class SQLiteStore(object):
+	"""
+	The ``SQLiteStore`` class is the base class of the classes which
+	persist their state in a SQLite database. The connection is shared by
+	all threads, and access to it is synchronized by a lock.
+	"""
+
+	def __init__(self, path, schema):
+		"""
+		Initializes the ``SQLiteStore`` instance.
+
+		*path* (``str``) is the path of the SQLite database file. This can
+		be ``None`` for ":memory:" to not persist the database.
+
+		*schema* (**sequence**) contains each SQL statement (``str``) used to
+		create the tables. These must be idempotent (e.g., "CREATE TABLE IF
+		NOT EXISTS").
+		"""
+		if path is None:
+			path = ':memory:'
+		elif not isinstance(path, six.string_types):
+			raise TypeError("path:{!r} is not a string.".format(path))
+
+		self.path = path
+		"""
+		*path* (``str``) is the path of the SQLite database file.
+		"""
+
+		self._db = sqlite3.connect(path, check_same_thread=False)
+		"""
+		*_db* (``sqlite3.Connection``) is the database.
+		"""
+
+		self._lock = threading.RLock()
+		"""
+		*_lock* (``threading.RLock``) synchronizes access to *_db*.
+		"""
+
+		with self._lock, self._db:
+			for sql in schema:
+				self._db.execute(sql)
+
+	def close(self):
+		"""
+		Closes the database.
+		"""
+		with self._lock:
+			self._db.close()
+
 
 def datetime_to_iso8601(dt, name=None):
 	"""
@@ -39,6 +104,34 @@ def datetime_to_iso8601(dt, name=None):
 		datestr += '+00:00'
 	return datestr
 
+def element_to_dict(elem):
+	"""
+	Converts the specified XML element into a ``dict``.
+
+	*elem* (``xml.etree.ElementTree.Element``) is the element to convert.
+
+	Returns the ``dict`` mapping each child tag (``str``) to either its
+	text (``str``) if it is a leaf, or its converted ``dict`` otherwise.
+	A tag which is repeated maps to a ``list`` of each value. Attributes
+	are ignored.
+	"""
+	result = {}
+	for child in elem:
+		if len(child):
+			value = element_to_dict(child)
+		else:
+			value = child.text.strip() if child.text else ''
+		tag = child.tag
+		if tag in result:
+			prev = result[tag]
+			if isinstance(prev, list):
+				prev.append(value)
+			else:
+				result[tag] = [prev, value]
+		else:
+			result[tag] = value
+	return result
+
 def encode_string(value, encoding, name=None):
 	"""
 	Encodes the specified string.
@@ -58,6 +151,20 @@ def encode_string(value, encoding, name=None):
 			raise UnicodeDecodeError(e.encoding, e.object, e.start, e.end, e.reason + " for {}".format(name))
 		raise
 
+def index_date(value):
+	"""
+	Normalizes the specified ISO 8601 date so that dates stored in SQLite
+	sort chronologically.
+
+	*value* (``str``) is the ISO 8601 date.
+
+	Returns the UTC date (``str``) formatted as
+	"YYYY-MM-DDTHH:MM:SS.ffffff", or ``None`` if *value* is empty.
+	"""
+	if not value:
+		return None
+	return iso8601_to_datetime(value).strftime('%Y-%m-%dT%H:%M:%S.%f')
+
 def is_sequence(obj):
 	"""
 	Determines whether the specified object is a sequence.
@@ -68,7 +175,36 @@ def is_sequence(obj):
 
 	Returns whether the specified object is a sequence (``bool``).
 	"""
-	return isinstance(obj, collections.Sequence) and not isinstance(obj, six.string_types)
+	return isinstance(obj, Sequence) and not isinstance(obj, six.string_types)
+
+def iso8601_to_datetime(value, name=None):
+	"""
+	Parses an ISO 8601 string as returned by Amazon MWS.
+
+	*value* (**string**) is the ISO 8601 formatted date (e.g.,
+	"2012-05-03T15:00:13.000Z" or "2009-02-20T02:10:35+00:00").
+
+	*name* (``str``) is the name to use when an error occurs.
+
+	Returns the **naive** ``datetime`` relative to UTC.
+	"""
+	if not isinstance(value, six.string_types):
+		raise TypeError("{}:{!r} is not a string.".format(name or 'value', value))
+
+	match = ISO8601_RE.match(value.strip())
+	if match is None:
+		raise ValueError("{}:{!r} is not an ISO 8601 date.".format(name or 'value', value))
+
+	year, month, day, hour, minute, second, fraction, zone = match.groups()
+	micro = int((fraction + '000000')[:6]) if fraction else 0
+	dt = datetime.datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0), micro)
+
+	if zone and zone != 'Z':
+		zone = zone.replace(':', '')
+		offset = datetime.timedelta(hours=int(zone[1:3]), minutes=int(zone[3:5]))
+		dt = dt - offset if zone[0] == '+' else dt + offset
+
+	return dt
 
 def marketplace_args(marketplaces, name=None):
 	"""
@@ -104,6 +240,23 @@ def marketplace_args(marketplaces, name=None):
 
 	return args
 
+def parse_xml(data):
+	"""
+	Parses the specified XML document, stripping all namespaces from the
+	element tags so that Amazon MWS responses can be searched using their
+	plain tag names.
+
+	*data* (``str``) is the XML document.
+
+	Returns the root element (``xml.etree.ElementTree.Element``).
+	"""
+	root = ElementTree.fromstring(data)
+	for elem in root.iter():
+		tag = elem.tag
+		if isinstance(tag, six.string_types) and tag[:1] == '{':
+			elem.tag = tag.split('}', 1)[1]
+	return root
+
 def validate_dict(value, name=None, keys=None):
 	"""
 	Validates the specified dictionary.
@@ -26,4 +26,7 @@ setup(
 	install_requires=[
 		"six"
 	],
+	extras_require={
+		"buybox": ["numpy"]
+	},
 )